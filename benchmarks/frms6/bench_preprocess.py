@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+'''
+Benchmark for pre-processing FRMS6 frames
+
+Compares the previous pre-processing, which converted the raw frames into a
+float buffer and did dark frame subtraction, folding, gain map and un-binning
+as separate passes over the whole stack, with the fused preprocess_frames
+kernel. Also reads a quarter of each frame with a signal crop.
+'''
+
+import time
+
+import numpy as np
+
+from libertem.io.dataset.frms6 import preprocess_frames
+
+RAW_FRAME = (264, 1024)
+STACKHEIGHT = 16
+BIN_FACTOR = 2
+REPEATS = 20
+
+
+def separate_passes(raw, dark_frame, gain_map, out):
+    raw_buffer = raw.astype(np.float32)
+    raw_buffer -= dark_frame
+    half_width = out.shape[2]
+    half_height = out.shape[1] // 2
+    lp = raw_buffer[..., :half_width]
+    rp = raw_buffer[..., half_width:][:, ::-1, ::-1]
+    gain_half = gain_map.shape[0] // 2
+    lp *= gain_map[:gain_half]
+    rp *= gain_map[gain_half:]
+    lp = lp.repeat(BIN_FACTOR, axis=1)
+    rp = rp.repeat(BIN_FACTOR, axis=1)
+    out[:, :half_height] = lp
+    out[:, half_height:] = rp
+
+
+def bench(fn, repeats=REPEATS):
+    deltas = []
+    for i in range(repeats):
+        t1 = time.perf_counter()
+        fn()
+        deltas.append(time.perf_counter() - t1)
+    return min(deltas)
+
+
+def main():
+    h, w = RAW_FRAME
+    raw = np.random.randint(0, 4096, size=(STACKHEIGHT, h, w)).astype(np.uint16)
+    dark_frame = np.random.random(RAW_FRAME).astype(np.float32) * 16
+    gain_map = np.random.random((2 * h, w // 2)) + 0.5
+    out = np.zeros((STACKHEIGHT, 2 * h * BIN_FACTOR, w // 2), dtype=np.float32)
+    crop = np.zeros((STACKHEIGHT, h * BIN_FACTOR, w // 4), dtype=np.float32)
+
+    # compile:
+    preprocess_frames(raw, dark_frame, gain_map, BIN_FACTOR, (0, 0), out)
+
+    cases = [
+        ("separate passes", lambda: separate_passes(raw, dark_frame, gain_map, out)),
+        ("fused", lambda: preprocess_frames(raw, dark_frame, gain_map, BIN_FACTOR, (0, 0), out)),
+        ("fused, cropped", lambda: preprocess_frames(
+            raw, dark_frame, gain_map, BIN_FACTOR, (h // 2, w // 8), crop
+        )),
+    ]
+    for name, fn in cases:
+        t = bench(fn)
+        print("%16s: %7.2f ms per stack of %d frames" % (name, t * 1000, STACKHEIGHT))
+
+
+if __name__ == "__main__":
+    main()
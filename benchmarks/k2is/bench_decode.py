@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+'''
+Benchmark for decoding K2IS sector data
+
+Compares decoding block by block, calling decode_uint12_le from nested
+Python loops over blocks and frames (as Sector.read_stacked used to do),
+with decoding all blocks of a sector for a whole stack of frames in one call to
+decode_stack, with and without multiple threads.
+'''
+
+import os
+import time
+import tempfile
+
+import numpy as np
+
+from libertem.io.dataset.k2is import (
+    decode_uint12_le, decode_stack, BLOCK_SIZE, HEADER_SIZE, DATA_SIZE, BLOCK_SHAPE,
+    BLOCKS_PER_SECTOR_PER_FRAME, Sector,
+)
+
+NUM_FRAMES = 256
+STACKHEIGHT = 16
+DTYPE = "float32"
+
+
+def per_block(inp, stack_buf):
+    blocks = []
+    for outer_frame in range(0, NUM_FRAMES, STACKHEIGHT):
+        for blockidx in range(BLOCKS_PER_SECTOR_PER_FRAME):
+            offset = (
+                outer_frame * BLOCK_SIZE * BLOCKS_PER_SECTOR_PER_FRAME
+                + blockidx * BLOCK_SIZE
+            )
+            for frame in range(STACKHEIGHT):
+                block_offset = offset + frame * BLOCK_SIZE * BLOCKS_PER_SECTOR_PER_FRAME
+                input_start = block_offset + HEADER_SIZE
+                input_end = block_offset + HEADER_SIZE + DATA_SIZE
+                decode_uint12_le(
+                    inp=inp[input_start:input_end],
+                    out=stack_buf[blockidx, frame],
+                )
+    return blocks
+
+
+def batched(inp, stack_buf, parallel):
+    blocks = np.arange(BLOCKS_PER_SECTOR_PER_FRAME, dtype=np.int64)
+    for outer_frame in range(0, NUM_FRAMES, STACKHEIGHT):
+        decode_stack(
+            inp=inp,
+            out=stack_buf,
+            first_offset=outer_frame * BLOCK_SIZE * BLOCKS_PER_SECTOR_PER_FRAME,
+            blocks=blocks,
+            parallel=parallel,
+        )
+
+
+def read_stacked(path, parallel):
+    with Sector(path, idx=0) as sector:
+        for tile in sector.read_stacked(start_at_frame=0, num_frames=NUM_FRAMES,
+                                        stackheight=STACKHEIGHT, dtype=DTYPE,
+                                        parallel=parallel):
+            pass
+
+
+def bench(fn, *args, repeats=3):
+    fn(*args)  # warmup, includes numba compilation
+    t0 = time.perf_counter()
+    for i in range(repeats):
+        fn(*args)
+    return (time.perf_counter() - t0) / repeats
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "sector.bin")
+        data = np.random.randint(
+            0, 256, size=(NUM_FRAMES * BLOCKS_PER_SECTOR_PER_FRAME + 1) * BLOCK_SIZE,
+            dtype=np.uint8,
+        )
+        data.tofile(path)
+        stack_buf = np.zeros(
+            (BLOCKS_PER_SECTOR_PER_FRAME, STACKHEIGHT, BLOCK_SHAPE[0] * BLOCK_SHAPE[1]),
+            dtype=DTYPE,
+        )
+        mb = NUM_FRAMES * BLOCKS_PER_SECTOR_PER_FRAME * BLOCK_SIZE / 1024 / 1024
+        results = [
+            ("per block", bench(per_block, data, stack_buf)),
+            ("batched", bench(batched, data, stack_buf, False)),
+            ("batched, parallel", bench(batched, data, stack_buf, True)),
+            ("read_stacked", bench(read_stacked, path, False)),
+            ("read_stacked, parallel", bench(read_stacked, path, True)),
+        ]
+        for name, t in results:
+            print("%-24s %.3fs (%.1f MB/s)" % (name, t, mb / t))
+
+
+if __name__ == "__main__":
+    main()
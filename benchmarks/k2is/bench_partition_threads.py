@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+'''
+Benchmark for reading a K2IS partition with sectors decoded in parallel threads
+
+Writes the eight sector files of a synthetic dataset and reads all of its frames
+as one partition, with 1 to 8 threads, each of which reads and decodes one
+sector at a time. Files are written fresh, so they will usually be read from the
+page cache; point TMPDIR to the storage you want to measure and drop the caches
+between runs for cold reads. Scaling is limited by the number of CPU cores.
+'''
+
+import os
+import time
+import tempfile
+
+import numpy as np
+
+from libertem.common import Slice, Shape
+from libertem.io.dataset.base import DataSetMeta
+from libertem.io.dataset.k2is import (
+    Sector, K2ISPartition, release_mappings, BLOCK_SIZE, BLOCKS_PER_SECTOR_PER_FRAME,
+    NUM_SECTORS, SECTOR_SIZE,
+)
+
+NUM_FRAMES = 128
+THREADS = (1, 2, 4, 8)
+
+
+def read_partition(paths, num_threads):
+    sig_shape = (SECTOR_SIZE[0], NUM_SECTORS * SECTOR_SIZE[1])
+    meta = DataSetMeta(
+        shape=Shape((NUM_FRAMES,) + sig_shape, sig_dims=2),
+        raw_shape=Shape((NUM_FRAMES,) + sig_shape, sig_dims=2),
+        dtype="uint16",
+    )
+    partition = K2ISPartition(
+        meta=meta,
+        partition_slice=Slice(origin=(0, 0, 0), shape=meta.raw_shape),
+        sectors=[Sector(path, idx=idx) for idx, path in enumerate(paths)],
+        start_frame=0,
+        num_frames=NUM_FRAMES,
+        num_threads=num_threads,
+    )
+    for tile in partition.get_tiles():
+        pass
+
+
+def bench(fn, *args, repeats=3):
+    fn(*args)  # warmup, includes numba compilation
+    deltas = []
+    for i in range(repeats):
+        t0 = time.perf_counter()
+        fn(*args)
+        deltas.append(time.perf_counter() - t0)
+    return min(deltas)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        paths = []
+        for idx in range(NUM_SECTORS):
+            path = os.path.join(tmpdir, "sector_%d.bin" % idx)
+            data = np.random.randint(
+                0, 256, size=(NUM_FRAMES * BLOCKS_PER_SECTOR_PER_FRAME + 1) * BLOCK_SIZE,
+                dtype=np.uint8,
+            )
+            data.tofile(path)
+            paths.append(path)
+        mb = NUM_SECTORS * NUM_FRAMES * BLOCKS_PER_SECTOR_PER_FRAME * BLOCK_SIZE / 1024 / 1024
+        print("%d CPU cores" % os.cpu_count())
+        for num_threads in THREADS:
+            t = bench(read_partition, paths, num_threads)
+            print("%d threads: %.3fs (%.1f MB/s)" % (num_threads, t, mb / t))
+        release_mappings()
+
+
+if __name__ == "__main__":
+    main()
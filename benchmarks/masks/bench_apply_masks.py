@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+'''
+Benchmark for applying masks to tiles in ApplyMasksTask
+
+Compares the previous implementation, which calculated data @ masks and then
+deinterleaved the (frames, masks) result with strided slices and np.stack, with
+the current one, which calculates data @ masks into a re-used buffer and
+accumulates a transposed view of it, which is already in the (masks, frames) layout
+of the partition result. Calculating masks.T @ data.T directly is also included for
+comparison, as it gives the right layout without the transpose.
+'''
+
+import time
+
+import numpy as np
+
+from libertem.common import Slice, Shape
+from libertem.io.dataset.base import DataTile, Partition, DataSetMeta
+from libertem.job.masks import MaskContainer, ApplyMasksTask
+
+SCAN_SIZE = (64, 256)
+SIG_SHAPE = (128, 128)
+STACKHEIGHT = 16
+DTYPE = "float32"
+
+
+def make_partition():
+    shape = Shape(SCAN_SIZE + SIG_SHAPE, sig_dims=2)
+    meta = DataSetMeta(shape=shape, raw_shape=shape, dtype=DTYPE)
+    pslice = Slice(origin=(0, 0, 0, 0), shape=shape)
+    return Partition(meta=meta, partition_slice=pslice)
+
+
+def make_tiles(partition):
+    tileshape = (1, STACKHEIGHT) + SIG_SHAPE
+    data = np.random.random(tileshape).astype(DTYPE)
+    return [
+        DataTile(data=data, tile_slice=tile_slice)
+        for tile_slice in partition.slice.subslices(tileshape)
+    ]
+
+
+def make_task(partition, num_masks):
+    factories = [
+        (lambda i=i: np.random.random(SIG_SHAPE))
+        for i in range(num_masks)
+    ]
+    masks = MaskContainer(mask_factories=factories, dtype=np.dtype(DTYPE), use_sparse=False)
+    return ApplyMasksTask(partition=partition, idx=0, masks=masks, use_torch=False)
+
+
+def deinterleave(partition, tiles, task):
+    """
+    the previous implementation, for comparison
+    """
+    num_masks = len(task.masks)
+    part = np.zeros((num_masks,) + tuple(partition.shape.nav), dtype=DTYPE)
+    for data_tile in tiles:
+        data = data_tile.flat_data
+        masks = task.masks[data_tile]
+        result = data.dot(masks)
+        dest_slice = data_tile.tile_slice.shift(partition.slice)
+        deinterleaved = np.stack(
+            [result.ravel()[idx::num_masks]
+             for idx in range(num_masks)],
+            axis=0,
+        )
+        reshaped = deinterleaved.reshape((num_masks,) + tuple(dest_slice.shape.nav))
+        part[(Ellipsis,) + dest_slice.get(nav_only=True)] += reshaped
+    return part
+
+
+def transposed_product(partition, tiles, task):
+    num_masks = len(task.masks)
+    part = np.zeros((num_masks,) + tuple(partition.shape.nav), dtype=DTYPE)
+    for data_tile in tiles:
+        data = data_tile.flat_data
+        masks = task.masks[data_tile]
+        result = masks.T.dot(data.T)
+        dest_slice = data_tile.tile_slice.shift(partition.slice)
+        reshaped = result.reshape((num_masks,) + tuple(dest_slice.shape.nav))
+        part[(Ellipsis,) + dest_slice.get(nav_only=True)] += reshaped
+    return part
+
+
+def current(partition, tiles, task):
+    task.init_result()
+    for data_tile in tiles:
+        task.process_tile(data_tile)
+    return task.get_result_tiles()[0].data
+
+
+def bench(fn, partition, tiles, task, repeats=5):
+    # warm up the mask cache:
+    fn(partition, tiles, task)
+    deltas = []
+    for i in range(repeats):
+        t1 = time.perf_counter()
+        fn(partition, tiles, task)
+        deltas.append(time.perf_counter() - t1)
+    return min(deltas)
+
+
+def main():
+    partition = make_partition()
+    tiles = make_tiles(partition)
+    for num_masks in (1, 3, 16):
+        task = make_task(partition, num_masks)
+        assert np.allclose(
+            deinterleave(partition, tiles, task),
+            current(partition, tiles, task),
+            rtol=1e-4,
+        )
+        t_old = bench(deinterleave, partition, tiles, task)
+        t_transposed = bench(transposed_product, partition, tiles, task)
+        t_new = bench(current, partition, tiles, task)
+        print(
+            "%2d masks: deinterleave %.3fs, masks.T @ data.T %.3fs, "
+            "current %.3fs (%.2fx)" % (
+                num_masks, t_old, t_transposed, t_new, t_old / t_new,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+
+'''
+Benchmark for opening and reading MIB datasets made of many single-frame files
+
+Writes a dataset with one file per frame and measures how long
+``MIBDataSet.initialize`` takes when reading the headers with one thread,
+with multiple threads, and with a valid header index. Then reads the whole
+dataset, which groups many files into each partition. The files are usually
+in the page cache, so the header read times are a lower bound for network
+file systems or cold caches.
+
+Usage: bench_open_many_files.py [num_files] [num_threads]
+'''
+
+import os
+import sys
+import time
+import glob
+import tempfile
+
+import numpy as np
+
+from libertem.io.dataset.mib import MIBDataSet
+
+FRAME_SHAPE = (256, 256)
+HEADER_SIZE = 384
+
+
+def write_dataset(dirname, num_files):
+    frame = np.random.randint(0, 4096, size=FRAME_SHAPE).astype(">u2").tobytes()
+    for idx in range(num_files):
+        header = "MQ1,%06d,%05d,01,%04d,%04d,U16,   1x1,01" % (
+            idx + 1, HEADER_SIZE, FRAME_SHAPE[1], FRAME_SHAPE[0],
+        )
+        with open(os.path.join(dirname, "default%d.mib" % (idx + 1)), "wb") as f:
+            f.write(header.encode("ascii").ljust(HEADER_SIZE, b"\0"))
+            f.write(frame)
+
+
+def remove_index(dirname):
+    for path in glob.glob(os.path.join(dirname, ".*.json")):
+        os.remove(path)
+
+
+def open_ds(dirname, num_files, num_threads):
+    ds = MIBDataSet(
+        path=os.path.join(dirname, "default1.mib"),
+        tileshape=(1, 8) + FRAME_SHAPE,
+        scan_size=(1, num_files),
+        num_threads=num_threads,
+    )
+    t0 = time.perf_counter()
+    ds.initialize()
+    return ds, time.perf_counter() - t0
+
+
+def main():
+    num_files = int(sys.argv[1]) if len(sys.argv) > 1 else 4096
+    num_threads = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    with tempfile.TemporaryDirectory() as dirname:
+        write_dataset(dirname, num_files)
+
+        remove_index(dirname)
+        ds, t = open_ds(dirname, num_files, num_threads=1)
+        print("initialize, 1 thread:    %.3fs" % t)
+
+        remove_index(dirname)
+        ds, t = open_ds(dirname, num_files, num_threads=num_threads)
+        print("initialize, %d threads: %.3fs" % (num_threads, t))
+
+        ds, t = open_ds(dirname, num_files, num_threads=num_threads)
+        print("initialize, with index:  %.3fs" % t)
+
+        t0 = time.perf_counter()
+        partitions = list(ds.get_partitions())
+        for p in partitions:
+            for tile in p.get_tiles():
+                pass
+        t = time.perf_counter() - t0
+        print("read %d files in %d partitions: %.3fs" % (num_files, len(partitions), t))
+
+
+if __name__ == "__main__":
+    main()
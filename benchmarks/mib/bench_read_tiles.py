@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+
+'''
+Benchmark for reading tiles from a MIB file with many frames
+
+Compares copying each tile into a buffer, as MIB partitions used to do, with
+yielding strided views into the memory map of the file, and reports the time
+for reading all tiles of the dataset and summing them, as a consumer would.
+The file is usually in the page cache.
+
+Usage: bench_read_tiles.py [num_frames]
+'''
+
+import os
+import sys
+import time
+import tempfile
+
+import numpy as np
+
+from libertem.io.dataset.mib import MIBDataSet, MIBFileSet
+
+FRAME_SHAPE = (256, 256)
+HEADER_SIZE = 384
+
+
+def write_file(path, num_frames):
+    frame = np.random.randint(0, 4096, size=FRAME_SHAPE).astype(">u2").tobytes()
+    with open(path, "wb") as f:
+        for idx in range(num_frames):
+            header = "MQ1,%06d,%05d,01,%04d,%04d,U16,   1x1,01" % (
+                idx + 1, HEADER_SIZE, FRAME_SHAPE[1], FRAME_SHAPE[0],
+            )
+            f.write(header.encode("ascii").ljust(HEADER_SIZE, b"\0"))
+            f.write(frame)
+
+
+def read_all(ds):
+    t0 = time.perf_counter()
+    for p in ds.get_partitions():
+        for tile in p.get_tiles():
+            tile.data.sum()
+    return time.perf_counter() - t0
+
+
+def main():
+    num_frames = int(sys.argv[1]) if len(sys.argv) > 1 else 1024
+    with tempfile.TemporaryDirectory() as dirname:
+        path = os.path.join(dirname, "default1.mib")
+        write_file(path, num_frames)
+        ds = MIBDataSet(
+            path=path, tileshape=(1, 8) + FRAME_SHAPE, scan_size=(1, num_frames),
+        ).initialize()
+        read_all(ds)  # warm up the page cache
+
+        get_view = MIBFileSet.get_view
+        MIBFileSet.get_view = lambda self, *args, **kwargs: None
+        try:
+            t_copy = min(read_all(ds) for i in range(3))
+        finally:
+            MIBFileSet.get_view = get_view
+        t_view = min(read_all(ds) for i in range(3))
+        print("copy: %.3fs, view: %.3fs" % (t_copy, t_view))
+
+
+if __name__ == "__main__":
+    main()
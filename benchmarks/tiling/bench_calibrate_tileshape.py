@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+'''
+Calibration benchmark for the automatic tileshape selection
+
+For each consumer (mask dot product, sum, per-frame UDF), runs the
+computation of that consumer over in-memory data cut into tiles of
+different sizes, from a fraction of the L2 cache to a multiple of the
+L3 cache, and reports the throughput. The fastest tile size per consumer
+is stored in the calibration file (see libertem.io.tiling), keyed by host
+name, and is used instead of the estimate from the cache sizes whenever a
+dataset is opened without a tileshape.
+
+Usage: bench_calibrate_tileshape.py [--dry-run]
+'''
+
+import sys
+import time
+
+import numpy as np
+
+from libertem.io.tiling import (
+    get_cache_sizes, get_target_size, save_calibration, get_calibration_path,
+)
+
+FRAME_SHAPE = (128, 128)
+NUM_FRAMES = 4096
+NUM_MASKS = 4
+DTYPE = "float32"
+
+
+def mask_consumer(tile, masks, result):
+    result += tile.dot(masks).sum(axis=0)
+
+
+def sum_consumer(tile, masks, result):
+    result += tile.sum(axis=0)
+
+
+def udf_consumer(tile, masks, result):
+    for frame in tile:
+        result += frame
+
+
+CONSUMERS = {
+    "mask": mask_consumer,
+    "sum": sum_consumer,
+    "udf": udf_consumer,
+}
+
+
+def candidate_sizes():
+    cache_sizes = get_cache_sizes()
+    sizes = set()
+    size = cache_sizes["L2"] // 8
+    while size <= cache_sizes["L3"] * 2:
+        sizes.add(size)
+        size *= 2
+    for consumer in CONSUMERS:
+        sizes.add(get_target_size(consumer, calibration={}))
+    return sorted(sizes)
+
+
+def bench(consumer, data, masks, target_size, repeats=3):
+    frame_bytes = data[0].nbytes
+    stackheight = max(1, target_size // frame_bytes)
+    result_shape = (NUM_MASKS,) if consumer is mask_consumer else (data.shape[1],)
+    deltas = []
+    for i in range(repeats):
+        result = np.zeros(result_shape, dtype=DTYPE)
+        t1 = time.perf_counter()
+        for start in range(0, data.shape[0], stackheight):
+            consumer(data[start:start + stackheight], masks, result)
+        deltas.append(time.perf_counter() - t1)
+    return min(deltas)
+
+
+def main(dry_run=False):
+    sig_size = FRAME_SHAPE[0] * FRAME_SHAPE[1]
+    data = np.random.random((NUM_FRAMES, sig_size)).astype(DTYPE)
+    masks = np.random.random((sig_size, NUM_MASKS)).astype(DTYPE)
+    print("cache sizes: %r" % (get_cache_sizes(),))
+    best = {}
+    for name, consumer in CONSUMERS.items():
+        results = []
+        for target_size in candidate_sizes():
+            t = bench(consumer, data, masks, target_size)
+            results.append((t, target_size))
+            print("%4s %8d KiB: %.1f MB/s" % (
+                name, target_size // 1024, data.nbytes / t / 1024 / 1024
+            ))
+        best[name] = min(results)[1]
+        print("%4s best: %d KiB" % (name, best[name] // 1024))
+    if dry_run:
+        return
+    save_calibration(best)
+    print("saved to %s" % get_calibration_path())
+
+
+if __name__ == "__main__":
+    main(dry_run="--dry-run" in sys.argv[1:])
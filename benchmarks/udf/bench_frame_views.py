@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+
+'''
+Benchmark for creating per-frame views into UDF result buffers
+
+UDFTask needs a view into each kind="nav" result buffer for every frame it processes.
+This compares calling `BufferWrapper.get_view_for_frame` for each frame, which needs
+to find the position of the tile in the partition for each call, with getting the views
+for all frames of a tile at once via `BufferWrapper.get_frame_views_for_tile`, which
+only does this once per tile and then uses plain integer indexing.
+'''
+
+import time
+
+import numpy as np
+
+from libertem.common import Slice, Shape
+from libertem.common.buffers import BufferWrapper
+from libertem.io.dataset.base import DataTile, Partition, DataSetMeta
+
+SCAN_SIZE = (512, 512)
+SIG_SHAPE = (4, 4)
+# one partition = 64 rows of the scan
+PARTITION_ROWS = 64
+# one tile = 16 frames of a row
+STACKHEIGHT = 16
+
+
+def make_partition():
+    shape = Shape(SCAN_SIZE + SIG_SHAPE, sig_dims=2)
+    meta = DataSetMeta(shape=shape, raw_shape=shape, dtype="float32")
+    pslice = Slice(
+        origin=(0, 0, 0, 0),
+        shape=Shape((PARTITION_ROWS, SCAN_SIZE[1]) + SIG_SHAPE, sig_dims=2),
+    )
+    return Partition(meta=meta, partition_slice=pslice)
+
+
+def make_tiles(partition):
+    tileshape = (1, STACKHEIGHT) + SIG_SHAPE
+    data = np.zeros(tileshape, dtype="float32")
+    return [
+        DataTile(data=data, tile_slice=tile_slice)
+        for tile_slice in partition.slice.subslices(tileshape)
+    ]
+
+
+def make_buffers(partition):
+    buffers = {
+        'intensity': BufferWrapper(kind="nav", dtype="float32"),
+        'coords': BufferWrapper(kind="nav", extra_shape=(2,), dtype="float32"),
+    }
+    for buf in buffers.values():
+        buf.set_shape_partition(partition)
+        buf.allocate()
+    return buffers
+
+
+def _unravel_view_for_frame(buf, partition, tile, frame_idx):
+    """
+    the previous implementation of `BufferWrapper.get_view_for_frame`, for comparison
+    """
+    tile_slice = tile.tile_slice.shift(partition.slice)
+    start_of_tile = np.ravel_multi_index(
+        tile_slice.origin[:-tile_slice.shape.sig.dims],
+        tuple(partition.shape.nav),
+    )
+    result_idx = np.unravel_index(start_of_tile + frame_idx, partition.shape.nav)
+    if len(buf._extra_shape) > 0:
+        return buf.data[result_idx]
+    else:
+        return buf.data[result_idx + (np.newaxis,)]
+
+
+def views_unravel(partition, tiles, buffers):
+    for tile in tiles:
+        for frame_idx in range(tile.tile_slice.shape.nav.size):
+            for buf in buffers.values():
+                _unravel_view_for_frame(buf, partition=partition, tile=tile, frame_idx=frame_idx)
+
+
+def views_per_frame(partition, tiles, buffers):
+    for tile in tiles:
+        for frame_idx in range(tile.tile_slice.shape.nav.size):
+            for buf in buffers.values():
+                buf.get_view_for_frame(partition=partition, tile=tile, frame_idx=frame_idx)
+
+
+def views_per_tile(partition, tiles, buffers):
+    for tile in tiles:
+        frame_views = [
+            buf.get_frame_views_for_tile(partition=partition, tile=tile)
+            for buf in buffers.values()
+        ]
+        for frame_idx in range(tile.tile_slice.shape.nav.size):
+            for views in frame_views:
+                views[frame_idx]
+
+
+def bench(fn, repeats=3):
+    partition = make_partition()
+    tiles = make_tiles(partition)
+    buffers = make_buffers(partition)
+    deltas = []
+    for i in range(repeats):
+        t1 = time.perf_counter()
+        fn(partition, tiles, buffers)
+        deltas.append(time.perf_counter() - t1)
+    # scale from one partition to the whole scan:
+    num_partitions = SCAN_SIZE[0] // PARTITION_ROWS
+    return min(deltas) * num_partitions
+
+
+def main():
+    num_frames = SCAN_SIZE[0] * SCAN_SIZE[1]
+    for name, fn in [("unravel_index (previous)", views_unravel),
+                     ("get_view_for_frame", views_per_frame),
+                     ("get_frame_views_for_tile", views_per_tile)]:
+        t = bench(fn)
+        print("%-26s %.3fs for %dx%d scan (%.2fµs per frame)" % (
+            name, t, SCAN_SIZE[0], SCAN_SIZE[1], t / num_frames * 1e6
+        ))
+
+
+if __name__ == "__main__":
+    main()
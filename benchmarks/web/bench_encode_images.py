@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+
+'''
+Benchmark for encoding result images for the web client
+
+Visualizes a 1024x1024 result, like the center of mass of a large scan, and
+encodes it with the previous PNG encoding (RGB conversion and default
+compression level) and with each of the wire formats the server offers,
+reporting the time per image and the encoded size.
+
+Usage: bench_encode_images.py
+'''
+
+import time
+
+import numpy as np
+
+from libertem.viz import encode_image, visualize_simple
+from libertem.web.encoding import IMAGE_FORMATS
+
+SHAPE = (1024, 1024)
+
+
+def bench(fn, visualized, repeats=5):
+    deltas = []
+    for i in range(repeats):
+        t1 = time.perf_counter()
+        encoded = fn(visualized)
+        deltas.append(time.perf_counter() - t1)
+    return min(deltas), len(encoded)
+
+
+def main():
+    y, x = np.mgrid[0:SHAPE[0], 0:SHAPE[1]]
+    data = np.sin(x / 50) * np.cos(y / 70) + np.random.normal(scale=0.05, size=SHAPE)
+    visualized = visualize_simple(data)
+    encoders = {"png (previous)": lambda v: encode_image(v).getvalue()}
+    encoders.update(IMAGE_FORMATS)
+    for name, fn in encoders.items():
+        t, size = bench(fn, visualized)
+        print("%16s: %7.1f ms, %6d KiB" % (name, t * 1000, size // 1024))
+
+
+if __name__ == "__main__":
+    main()
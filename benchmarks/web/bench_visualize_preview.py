@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+
+'''
+Benchmark for visualizing the previews of a long running job
+
+Fills a 1024x1024 result in blocks of 16 scan rows, like partitions finishing
+one after the other, and visualizes it after each block, once with
+``visualize_simple`` and once with an ``IncrementalVisualizer``, which is told
+which rows changed. Reports the total time for all previews.
+
+Usage: bench_visualize_preview.py
+'''
+
+import time
+
+import numpy as np
+
+from libertem.viz import visualize_simple, IncrementalVisualizer
+
+SHAPE = (1024, 1024)
+ROWS_PER_UPDATE = 16
+
+
+def run(visualize):
+    y, x = np.mgrid[0:SHAPE[0], 0:SHAPE[1]]
+    full = (np.sin(x / 50) * np.cos(y / 70) + 2).astype(np.float32)
+    data = np.zeros(SHAPE, dtype=np.float32)
+    t1 = time.perf_counter()
+    for start in range(0, SHAPE[0], ROWS_PER_UPDATE):
+        data[start:start + ROWS_PER_UPDATE] = full[start:start + ROWS_PER_UPDATE]
+        visualize(data, np.arange(start, start + ROWS_PER_UPDATE))
+    return time.perf_counter() - t1
+
+
+def main():
+    num_updates = SHAPE[0] // ROWS_PER_UPDATE
+    incremental = IncrementalVisualizer()
+    for name, visualize in [
+        ("visualize_simple", lambda data, dirty_rows: visualize_simple(data)),
+        ("incremental", lambda data, dirty_rows: incremental.update(data, dirty_rows)),
+    ]:
+        t = run(visualize)
+        print("%16s: %7.1f ms for %d updates" % (name, t * 1000, num_updates))
+
+
+if __name__ == "__main__":
+    main()
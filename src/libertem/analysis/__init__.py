@@ -5,6 +5,7 @@ from .ring import RingMaskAnalysis
 from .point import PointMaskAnalysis
 from .masks import MasksAnalysis
 from .raw import PickFrameAnalysis
+from .fused import FusedAnalysis
 
 __all__ = [
     'SumAnalysis',
@@ -14,4 +15,5 @@ __all__ = [
     'PointMaskAnalysis',
     'MasksAnalysis',
     'PickFrameAnalysis',
+    'FusedAnalysis',
 ]
@@ -1,6 +1,8 @@
 import numpy as np
 
-from libertem.viz import encode_image, visualize_simple, CMAP_CIRCULAR_DEFAULT
+from libertem.viz import (
+    encode_image, visualize_simple, IncrementalVisualizer, CMAP_CIRCULAR_DEFAULT,
+)
 
 
 class AnalysisResult(object):
@@ -54,6 +56,10 @@ class BaseAnalysis(object):
         self.dataset = dataset
         self.parameters = self.get_parameters(parameters)
         self.parameters.update(parameters)
+        # while previews of a running job are made, one visualizer per result key,
+        # see ``get_preview_results``:
+        self._visualizers = None
+        self._dirty_rows = None
 
     def get_results(self, job_results):
         """
@@ -78,6 +84,62 @@ class BaseAnalysis(object):
         """
         raise NotImplementedError()
 
+    def get_preview_results(self, job_results, dirty_rows=None):
+        """
+        Like ``get_results``, for the partial results of a running job. The images
+        are only colored again where the result changed since the previous preview,
+        see :class:`~libertem.viz.IncrementalVisualizer`. Call ``end_preview`` once
+        the job is done.
+
+        Parameters
+        ----------
+        job_results : list of :class:`~numpy.ndarray`
+            raw results from the job, reduced so far
+
+        dirty_rows : numpy.ndarray or None
+            indices of the rows of the navigation grid that changed since the
+            previous preview, or None if they are not known
+        """
+        if self._visualizers is None:
+            self._visualizers = {}
+        self._dirty_rows = dirty_rows
+        try:
+            return self.get_results(job_results)
+        finally:
+            self._dirty_rows = None
+
+    def end_preview(self):
+        """
+        Free the state kept for ``get_preview_results``
+        """
+        self._visualizers = None
+
+    def visualize(self, key, data, colormap=None, per_frame=True):
+        """
+        Visualize ``data``, the current version of the result with ``key``
+
+        Parameters
+        ----------
+        per_frame : bool
+            if each value of ``data`` only depends on the frame at the same position
+            of the navigation grid, so only the changed rows need to be colored
+            again in previews
+
+        Returns
+        -------
+        numpy.ndarray
+            uint8 RGBA image
+        """
+        if self._visualizers is None:
+            return visualize_simple(data, colormap=colormap)
+        dirty_rows = self._dirty_rows
+        if not per_frame or np.shape(data) != tuple(self.dataset.shape.nav):
+            dirty_rows = None
+        if key not in self._visualizers:
+            self._visualizers[key] = IncrementalVisualizer(colormap=colormap)
+        # the buffer of the visualizer is updated in place by the next call:
+        return self._visualizers[key].update(data, dirty_rows=dirty_rows).copy()
+
     def get_complex_results(self, job_result, key_prefix, title, desc):
         magn = np.abs(job_result)
         angle = np.angle(job_result)
@@ -86,28 +148,28 @@ class BaseAnalysis(object):
             # for compatability, the magnitude has key=key_prefix
             AnalysisResult(
                 raw_data=magn,
-                visualized=visualize_simple(magn),
+                visualized=self.visualize(key_prefix, magn),
                 key=key_prefix,
                 title="%s [magn]" % title,
                 desc="%s [magn]" % desc,
             ),
             AnalysisResult(
                 raw_data=job_result.real,
-                visualized=visualize_simple(job_result.real),
+                visualized=self.visualize("%s_real" % key_prefix, job_result.real),
                 key="%s_real" % key_prefix,
                 title="%s [real]" % title,
                 desc="%s [real]" % desc,
             ),
             AnalysisResult(
                 raw_data=job_result.imag,
-                visualized=visualize_simple(job_result.imag),
+                visualized=self.visualize("%s_imag" % key_prefix, job_result.imag),
                 key="%s_imag" % key_prefix,
                 title="%s [imag]" % title,
                 desc="%s [imag]" % desc,
             ),
             AnalysisResult(
                 raw_data=angle,
-                visualized=visualize_simple(angle),
+                visualized=self.visualize("%s_angle" % key_prefix, angle),
                 key="%s_angle" % key_prefix,
                 title="%s [angle]" % title,
                 desc="%s [angle]" % desc,
@@ -4,7 +4,7 @@ import logging
 import numpy as np
 
 from libertem import masks
-from libertem.viz import CMAP_CIRCULAR_DEFAULT, visualize_simple
+from libertem.viz import CMAP_CIRCULAR_DEFAULT
 from .base import AnalysisResult, AnalysisResultSet
 from .masks import BaseMasksAnalysis
 
@@ -39,30 +39,32 @@ class COMAnalysis(BaseMasksAnalysis):
             y_real, y_imag = np.real(y_centers), np.imag(y_centers)
 
             return AnalysisResultSet([
-                AnalysisResult(raw_data=x_real, visualized=visualize_simple(x_real),
+                AnalysisResult(raw_data=x_real, visualized=self.visualize("x_real", x_real),
                        key="x_real", title="x [real]", desc="x component of the center"),
-                AnalysisResult(raw_data=y_real, visualized=visualize_simple(y_real),
+                AnalysisResult(raw_data=y_real, visualized=self.visualize("y_real", y_real),
                        key="y_real", title="y [real]", desc="y component of the center"),
-                AnalysisResult(raw_data=x_imag, visualized=visualize_simple(x_imag),
+                AnalysisResult(raw_data=x_imag, visualized=self.visualize("x_imag", x_imag),
                        key="x_imag", title="x [imag]", desc="x component of the center"),
-                AnalysisResult(raw_data=y_imag, visualized=visualize_simple(y_imag),
+                AnalysisResult(raw_data=y_imag, visualized=self.visualize("y_imag", y_imag),
                        key="y_imag", title="y [imag]", desc="y component of the center"),
             ])
         else:
             f = CMAP_CIRCULAR_DEFAULT.rgb_from_vector((y_centers, x_centers))
             d = divergence([x_centers, y_centers])
             m = np.sqrt(x_centers**2 + y_centers**2)
+            # the divergence also changes in the rows next to changed frames:
+            d_visualized = self.visualize("divergence", d, per_frame=False)
 
             return AnalysisResultSet([
                 AnalysisResult(raw_data=(x_centers, y_centers), visualized=f,
                        key="field", title="field", desc="cubehelix colorwheel visualization"),
-                AnalysisResult(raw_data=m, visualized=visualize_simple(m),
+                AnalysisResult(raw_data=m, visualized=self.visualize("magnitude", m),
                        key="magnitude", title="magnitude", desc="magnitude of the vector field"),
-                AnalysisResult(raw_data=d, visualized=visualize_simple(d),
+                AnalysisResult(raw_data=d, visualized=d_visualized,
                        key="divergence", title="divergence", desc="divergence of the vector field"),
-                AnalysisResult(raw_data=x_centers, visualized=visualize_simple(x_centers),
+                AnalysisResult(raw_data=x_centers, visualized=self.visualize("x", x_centers),
                        key="x", title="x", desc="x component of the center"),
-                AnalysisResult(raw_data=y_centers, visualized=visualize_simple(y_centers),
+                AnalysisResult(raw_data=y_centers, visualized=self.visualize("y", y_centers),
                        key="y", title="y", desc="y component of the center"),
             ])
 
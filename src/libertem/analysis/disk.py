@@ -1,5 +1,4 @@
 from libertem import masks
-from libertem.viz import visualize_simple
 from .base import AnalysisResult, AnalysisResultSet
 from .masks import BaseMasksAnalysis
 
@@ -21,7 +20,7 @@ class DiskMaskAnalysis(BaseMasksAnalysis):
         return AnalysisResultSet([
             AnalysisResult(
                 raw_data=data.reshape(shape),
-                visualized=visualize_simple(data.reshape(shape)),
+                visualized=self.visualize("intensity", data.reshape(shape)),
                 key="intensity",
                 title="intensity",
                 desc="intensity of the integration over the selected disk"),
@@ -0,0 +1,43 @@
+from libertem.job.fused import FusedJob
+from .base import BaseAnalysis, AnalysisResultSet
+
+
+class FusedAnalysis(BaseAnalysis):
+    """
+    Run several analyses on the same dataset in a single pass over the data.
+    The results of all analyses are concatenated, in the order of `analyses`.
+    """
+
+    def __init__(self, dataset, analyses):
+        super().__init__(dataset=dataset, parameters={})
+        self.analyses = analyses
+
+    def get_job(self):
+        return FusedJob(jobs=[
+            analysis.get_job()
+            for analysis in self.analyses
+        ])
+
+    def get_results(self, job_results):
+        return AnalysisResultSet([
+            result
+            for result_set in self.get_results_per_analysis(job_results)
+            for result in result_set
+        ])
+
+    def get_results_per_analysis(self, job_results):
+        return [
+            analysis.get_results(job_result)
+            for analysis, job_result in zip(self.analyses, job_results)
+        ]
+
+    def get_preview_results(self, job_results, dirty_rows=None):
+        return AnalysisResultSet([
+            result
+            for analysis, job_result in zip(self.analyses, job_results)
+            for result in analysis.get_preview_results(job_result, dirty_rows)
+        ])
+
+    def end_preview(self):
+        for analysis in self.analyses:
+            analysis.end_preview()
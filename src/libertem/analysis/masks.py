@@ -1,5 +1,4 @@
 import numpy as np
-from libertem.viz import visualize_simple
 from .base import BaseAnalysis, AnalysisResultSet, AnalysisResult
 from libertem.job.masks import ApplyMasksJob
 
@@ -8,7 +7,8 @@ class BaseMasksAnalysis(BaseAnalysis):
     """
     Base class for any masks-based analysis; you only need to implement
     ``get_results`` and ``get_mask_factories``.
-    Overwrite  ``get_use_sparse`` to return True to calculate with sparse mask matrices.
+    Overwrite  ``get_use_sparse`` to return True to calculate with sparse mask matrices,
+    or "auto" to choose the backend for each mask automatically.
     """
 
     @property
@@ -23,9 +23,27 @@ class BaseMasksAnalysis(BaseAnalysis):
         job = ApplyMasksJob(
             dataset=self.dataset,
             mask_factories=mask_factories,
-            use_sparse=use_sparse)
+            use_sparse=use_sparse,
+            mask_cache_key=self.get_mask_cache_key())
         return job
 
+    def get_mask_cache_key(self):
+        """
+        Identifies the masks of this analysis, so they can be re-used by the workers
+        when the analysis is run again with the same parameters. The masks are
+        not cached across jobs if this returns None.
+        """
+        key = (
+            type(self).__name__,
+            tuple(self.dataset.shape.sig),
+            tuple(sorted(self.parameters.items())),
+        )
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
     def get_mask_factories(self):
         raise NotImplementedError()
 
@@ -37,6 +55,10 @@ class MasksAnalysis(BaseMasksAnalysis):
     def get_mask_factories(self):
         return self.parameters['factories']
 
+    def get_mask_cache_key(self):
+        # the factories are given by the user, so we can only identify them by identity:
+        return None
+
     def get_use_sparse(self):
         return self.parameters['use_sparse']
 
@@ -57,7 +79,7 @@ class MasksAnalysis(BaseMasksAnalysis):
         return AnalysisResultSet([
             AnalysisResult(
                 raw_data=mask_result.reshape(shape),
-                visualized=visualize_simple(mask_result.reshape(shape)),
+                visualized=self.visualize("mask_%d" % i, mask_result.reshape(shape)),
                 key="mask_%d" % i,
                 title="mask %d" % i,
                 desc="integrated intensity for mask %d" % i)
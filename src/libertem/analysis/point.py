@@ -1,5 +1,4 @@
 import scipy.sparse as sp
-from libertem.viz import visualize_simple
 from .base import AnalysisResult, AnalysisResultSet
 from .masks import BaseMasksAnalysis
 
@@ -18,7 +17,7 @@ class PointMaskAnalysis(BaseMasksAnalysis):
                 )
             )
         return AnalysisResultSet([
-            AnalysisResult(raw_data=data, visualized=visualize_simple(data),
+            AnalysisResult(raw_data=data, visualized=self.visualize("intensity", data),
                            key="intensity", title="intensity",
                            desc="intensity of the integration over the selected point"),
         ])
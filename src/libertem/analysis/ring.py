@@ -1,5 +1,4 @@
 from libertem import masks
-from libertem.viz import visualize_simple
 from .base import AnalysisResult, AnalysisResultSet
 from .masks import BaseMasksAnalysis
 
@@ -20,7 +19,7 @@ class RingMaskAnalysis(BaseMasksAnalysis):
         return AnalysisResultSet([
             AnalysisResult(
                 raw_data=data,
-                visualized=visualize_simple(data),
+                visualized=self.visualize("intensity", data),
                 key="intensity",
                 title="intensity",
                 desc="intensity of the integration over the selected ring"),
@@ -1,4 +1,3 @@
-from libertem.viz import visualize_simple
 from libertem.job.sum import SumFramesJob
 from .base import BaseAnalysis, AnalysisResult, AnalysisResultSet
 
@@ -18,6 +17,7 @@ class SumAnalysis(BaseAnalysis):
                 )
             )
         return AnalysisResultSet([
-            AnalysisResult(raw_data=job_results, visualized=visualize_simple(job_results),
+            AnalysisResult(raw_data=job_results,
+                   visualized=self.visualize("intensity", job_results),
                    key="intensity", title="intensity", desc="sum of all frames"),
         ])
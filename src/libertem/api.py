@@ -1,5 +1,6 @@
-from typing import Union, Tuple
+from typing import Union, Tuple, Iterable
 from types import MappingProxyType
+import time
 import uuid
 
 import psutil
@@ -8,7 +9,8 @@ from libertem.io.dataset import load, filetypes
 from libertem.io.dataset.base import DataSet
 from libertem.job.masks import ApplyMasksJob
 from libertem.job.raw import PickFrameJob
-from libertem.job.base import Job
+from libertem.job.base import Job, iter_progressive_passes
+from libertem.job.fused import FusedJob
 from libertem.common import Slice, Shape
 from libertem.executor.dask import DaskJobExecutor
 from libertem.analysis.raw import PickFrameAnalysis
@@ -22,6 +24,84 @@ from libertem.analysis.base import BaseAnalysis
 from libertem.udf import make_udf_tasks, merge_assign
 
 
+class PartialResult(object):
+    """
+    Yielded by :meth:`Context.run_iter` while a job is running
+
+    Attributes
+    ----------
+    result
+        the result reduced from the partitions done so far; for a `Job`, the
+        result buffer, which is updated in place while the job continues to run,
+        for an `Analysis`, its results
+    partitions_done : int
+        number of partitions that are reduced into ``result``
+    num_partitions : int
+        total number of partitions of the job
+    """
+    def __init__(self, result, partitions_done, num_partitions):
+        self.result = result
+        self.partitions_done = partitions_done
+        self.num_partitions = num_partitions
+
+    @property
+    def progress(self):
+        """
+        the fraction of partitions done, between 0 and 1
+        """
+        if self.num_partitions == 0:
+            return 1.0
+        return self.partitions_done / self.num_partitions
+
+    @property
+    def done(self):
+        return self.partitions_done >= self.num_partitions
+
+    def __repr__(self):
+        return "<PartialResult %d/%d>" % (self.partitions_done, self.num_partitions)
+
+
+class ProgressiveResult(object):
+    """
+    Yielded by :meth:`Context.run_progressive` after each pass over the data
+
+    Attributes
+    ----------
+    result
+        the result estimated from the frames done so far (see :meth:`Job.estimate_result`),
+        or the complete result after the last pass; for an `Analysis`, its results
+    frames_done : int
+        number of frames processed so far
+    num_frames : int
+        total number of frames of the dataset
+    stride : int
+        all frames on the grid with this stride along the navigation axes are done
+    """
+    def __init__(self, result, frames_done, num_frames, stride):
+        self.result = result
+        self.frames_done = frames_done
+        self.num_frames = num_frames
+        self.stride = stride
+
+    @property
+    def progress(self):
+        """
+        the fraction of frames done, between 0 and 1
+        """
+        if self.num_frames == 0:
+            return 1.0
+        return self.frames_done / self.num_frames
+
+    @property
+    def done(self):
+        return self.frames_done >= self.num_frames
+
+    def __repr__(self):
+        return "<ProgressiveResult stride=%d %d/%d>" % (
+            self.stride, self.frames_done, self.num_frames
+        )
+
+
 class Context:
     """
     Context is the main entry point of the LiberTEM API. It contains
@@ -33,6 +113,10 @@ class Context:
         """
         Create a new context. In the background, this creates a suitable
         executor and spins up a local Dask cluster.
+
+        On a single workstation, passing
+        ``executor=libertem.executor.processpool.ProcessPoolJobExecutor()``
+        avoids the startup time of the Dask cluster.
         """
         if executor is None:
             executor = self._create_local_executor()
@@ -71,7 +155,7 @@ class Context:
 
     load.__doc__ = load.__doc__ % {"types": ", ".join(filetypes.keys())}
 
-    def create_mask_job(self, factories, dataset, use_sparse=None):
+    def create_mask_job(self, factories, dataset, use_sparse=None, roi=None):
         """
         Create a low-level mask application job. Each factory function should, when called,
         return a numpy array with the same shape as frames in the dataset (so dataset.shape.sig).
@@ -91,6 +175,14 @@ class Context:
             multiplication
             * True: Convert all masks to sparse matrices.
             * False: Convert all masks to dense matrices.
+            * "auto": Estimate the cost of dense and sparse matrix multiplication from \
+            the number of non-zero entries of each mask and the number of frames per tile, \
+            and apply each mask with the cheaper backend. The decision is recorded in \
+            ``job.diagnostics["mask_backend"]`` after running the job.
+        roi
+            boolean mask of shape ``dataset.shape.nav``, to only apply the masks to the
+            selected frames; the result is zero for the other frames. None (default)
+            selects all frames.
 
         Examples
         --------
@@ -107,7 +199,7 @@ class Context:
         >>> result = ctx.run(job)
         """
         return ApplyMasksJob(
-            dataset=dataset, mask_factories=factories, use_sparse=use_sparse
+            dataset=dataset, mask_factories=factories, use_sparse=use_sparse, roi=roi,
         )
 
     def create_mask_analysis(self, factories, dataset, use_sparse=None):
@@ -134,6 +226,9 @@ class Context:
             multiplication
             * True: Convert all masks to sparse matrices.
             * False: Convert all masks to dense matrices.
+            * "auto": Estimate the cost of dense and sparse matrix multiplication from \
+            the number of non-zero entries of each mask and the number of frames per tile, \
+            and apply each mask with the cheaper backend.
 
         Examples
         --------
@@ -380,15 +475,246 @@ class Context:
         else:
             job_to_run = job
 
-        out = job_to_run.get_result_buffer()
-        for tiles in self.executor.run_job(job_to_run):
-            for tile in tiles:
-                tile.reduce_into_result(out)
+        if self._use_shared_result(job_to_run):
+            out = self._run_shared(job_to_run)
+        else:
+            out = job_to_run.get_result_buffer()
+            for tiles in self.executor.run_job(job_to_run):
+                for tile in tiles:
+                    tile.reduce_into_result(out)
+                    job_to_run.collect_diagnostics(tile)
         if analysis is not None:
             return analysis.get_results(out)
         return out
 
-    def run_udf(self, dataset, fn, make_buffers, init=None, merge=merge_assign):
+    def run_iter(self, job: Union[Job, BaseAnalysis], min_interval: float = 0.0):
+        """
+        Run the given `Job` or `Analysis`, and yield the partially reduced result
+        as partitions complete. The last :class:`PartialResult` contains the complete
+        result. Stop iterating to cancel the job.
+
+        Parameters
+        ----------
+        job
+            the job or analysis to run
+        min_interval
+            minimum time in seconds between two partial results; results of partitions
+            that complete in between are reduced, but not yielded. The complete
+            result is always yielded.
+
+        Yields
+        ------
+        PartialResult
+            with the ``result`` reduced so far and the ``progress`` of the job
+
+        Examples
+        --------
+        >>> ctx = Context()
+        >>> ds = ctx.load("...")
+        >>> for partial in ctx.run_iter(ctx.create_sum_analysis(dataset=ds), min_interval=1):
+        ...     print("%.0f%% done" % (partial.progress * 100))
+        >>> result = partial.result
+        """
+        analysis = None
+        if hasattr(job, "get_job"):
+            analysis = job
+            job_to_run = analysis.get_job()
+        else:
+            job_to_run = job
+
+        use_shared = self._use_shared_result(job_to_run)
+        if use_shared:
+            job_to_run.make_shared_result()
+        else:
+            out = job_to_run.get_result_buffer()
+
+        def _make_partial(partitions_done, num_partitions):
+            result = job_to_run.get_shared_result() if use_shared else out
+            if analysis is not None:
+                result = analysis.get_results(result)
+            return PartialResult(
+                result=result,
+                partitions_done=partitions_done,
+                num_partitions=num_partitions,
+            )
+
+        # created only once, as the executor may adjust the partitioning, and jobs
+        # with a roi skip the partitions without selected frames, so we count the tasks:
+        tasks = self.executor.get_tasks(job_to_run)
+        num_partitions = len(tasks)
+        results = self.executor.run_job(job_to_run, tasks=tasks)
+        partitions_done = 0
+        last_yield = time.monotonic()
+        finished = False
+        try:
+            for tiles in results:
+                for tile in tiles:
+                    if not use_shared:
+                        tile.reduce_into_result(out)
+                    job_to_run.collect_diagnostics(tile)
+                partitions_done += 1
+                if partitions_done >= num_partitions:
+                    break
+                if time.monotonic() - last_yield < min_interval:
+                    continue
+                yield _make_partial(partitions_done, num_partitions)
+                last_yield = time.monotonic()
+            for tiles in results:
+                # in case there were more results than expected:
+                for tile in tiles:
+                    if not use_shared:
+                        tile.reduce_into_result(out)
+                    job_to_run.collect_diagnostics(tile)
+                partitions_done += 1
+            finished = True
+            yield _make_partial(partitions_done, max(partitions_done, num_partitions))
+        finally:
+            if not finished:
+                self.executor.cancel(job_to_run)
+            results.close()
+            if use_shared:
+                job_to_run.close_shared_result()
+
+    def run_progressive(self, job: Union[Job, BaseAnalysis], strides=(8, 4, 2, 1)):
+        """
+        Run the given `Job` or `Analysis` in coarse-to-fine passes over the navigation
+        grid, for showing a preview of the result long before the whole dataset is processed.
+        The first pass processes every 8th frame along each navigation axis, the next
+        ones every 4th and 2nd frame, and the last one all frames that are left. Each
+        frame is only read and processed once. Stop iterating to skip the remaining passes.
+
+        Jobs that can't be restricted to a region of interest (see ``Job.supports_roi``)
+        are run in a single pass.
+
+        Parameters
+        ----------
+        job
+            the job or analysis to run
+        strides
+            the stride of each pass, from coarse to fine
+
+        Yields
+        ------
+        ProgressiveResult
+            after each pass, with the ``result`` estimated from the frames done so far,
+            for example upsampled to the full navigation shape. The last one contains
+            the complete result.
+
+        Examples
+        --------
+        >>> ctx = Context()
+        >>> ds = ctx.load("...")
+        >>> analysis = ctx.create_ring_analysis(dataset=ds)
+        >>> for partial in ctx.run_progressive(analysis):
+        ...     show(partial.result.intensity.visualized)
+        """
+        analysis = None
+        if hasattr(job, "get_job"):
+            analysis = job
+            job_to_run = analysis.get_job()
+        else:
+            job_to_run = job
+
+        nav_shape = tuple(job_to_run.dataset.shape.nav)
+        out = job_to_run.get_result_buffer()
+        done = np.zeros(nav_shape, dtype=bool)
+        passes = iter_progressive_passes(job_to_run, strides)
+        try:
+            for stride, roi in passes:
+                self._run_into(job_to_run, out)
+                if roi is None:
+                    done[:] = True
+                else:
+                    done |= roi
+                if done.all():
+                    result = out
+                else:
+                    result = job_to_run.estimate_result(out, done, stride)
+                if analysis is not None:
+                    result = analysis.get_results(result)
+                yield ProgressiveResult(
+                    result=result,
+                    frames_done=int(np.count_nonzero(done)),
+                    num_frames=done.size,
+                    stride=stride,
+                )
+        finally:
+            # reset the roi of the job, also if we are stopped early:
+            passes.close()
+
+    def _run_into(self, job, out):
+        """
+        run ``job``, reducing its results into ``out``
+        """
+        if self._use_shared_result(job):
+            out += self._run_shared(job)
+            return
+        for tiles in self.executor.run_job(job):
+            for tile in tiles:
+                tile.reduce_into_result(out)
+                job.collect_diagnostics(tile)
+
+    def _use_shared_result(self, job):
+        return (
+            getattr(self.executor, "supports_shared_result", False)
+            and job.supports_shared_result
+        )
+
+    def _run_shared(self, job):
+        """
+        run ``job`` with the tasks reducing their results into a shared
+        memory buffer directly, so only small tokens are sent back
+        """
+        job.make_shared_result()
+        try:
+            for tiles in self.executor.run_job(job):
+                for tile in tiles:
+                    job.collect_diagnostics(tile)
+            return job.get_shared_result()
+        finally:
+            job.close_shared_result()
+
+    def run_many(self, jobs: Iterable[Union[Job, BaseAnalysis]]) -> list:
+        """
+        Run the given `Job` or `Analysis` instances in a single pass over the data,
+        and return their results. All jobs need to work on the same dataset.
+
+        Instead of reading each partition once per job, each tile is read and decoded
+        only once and then passed on to all jobs, which can save a lot of I/O and decoding
+        time when running multiple analyses on the same dataset.
+
+        Parameters
+        ----------
+        jobs
+            the jobs or analyses to run
+
+        Returns
+        -------
+        list
+            the results, in the same order as `jobs`, as they would have been returned
+            from `run`
+
+        Examples
+        --------
+        >>> ctx = Context()
+        >>> ds = ctx.load("...")
+        >>> sum_result, com_result = ctx.run_many([
+        ...     ctx.create_sum_analysis(dataset=ds),
+        ...     ctx.create_com_analysis(dataset=ds),
+        ... ])
+        """
+        jobs = list(jobs)
+        jobs_to_run = [
+            job.get_job() if hasattr(job, "get_job") else job
+            for job in jobs
+        ]
+        outs = self.run(FusedJob(jobs=jobs_to_run))
+        return [
+            job.get_results(out) if hasattr(job, "get_job") else out
+            for job, out in zip(jobs, outs)
+        ]
+
+    def run_udf(self, dataset, fn, make_buffers, init=None, merge=merge_assign, roi=None):
         """
         Run `fn` on `dataset`.
 
@@ -410,10 +736,21 @@ class Context:
             Additionally, it needs to have a parameter for each buffer created in make_buffers,
             and also for each variable returned from the init function.
 
+            If `fn` accepts a `tile` keyword argument instead of `frame`, it is called once per
+            tile with a stack of frames of shape (num_frames,) + sig_shape. In this case, the
+            views on kind="nav" buffers contain one entry per frame of the stack, so you can
+            process all frames of the tile with vectorized operations.
+
         merge
             A function merging a partial result into the final result buffer. By default it just
             performs assignment.
 
+        roi
+            boolean mask of shape ``dataset.shape.nav``, to only run `fn` on the selected
+            frames. Only the partitions containing selected frames are processed, and only
+            the tiles containing selected frames are read. The kind="nav" buffers are left
+            at zero for the other frames.
+
 
         Example
         -------
@@ -438,6 +775,11 @@ class Context:
         >>>     fn=my_frame_fn,
         >>>     make_buffers=my_buffers,
         >>> )
+
+        The same, processing a whole tile at once:
+
+        >>> def my_tile_fn(tile, pixelsum):
+        >>>     pixelsum[:] = np.sum(tile, axis=(1, 2))
         """
         result_buffers = make_buffers()
         for buf in result_buffers.values():
@@ -445,7 +787,7 @@ class Context:
             buf.allocate()
         cancel_id = str(uuid.uuid4())
 
-        tasks = make_udf_tasks(dataset, fn, init, make_buffers)
+        tasks = make_udf_tasks(dataset, fn, init, make_buffers, roi=roi)
 
         for partition_result_buffers, partition in self.executor.run_tasks(tasks, cancel_id):
             buffer_views = {}
@@ -1,5 +1,215 @@
+import threading
+import contextlib
+
 import numpy as np
 
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    # Python < 3.8, see SharedResultBuffer.is_available
+    shared_memory = None
+
+
+class AllocationCounter(object):
+    """
+    Counts the allocations made by a :class:`BufferPool` while it is active,
+    see :meth:`BufferPool.count_allocations`.
+    """
+    def __init__(self):
+        self.count = 0
+        self.nbytes = 0
+
+
+class BufferPool(object):
+    """
+    Pool of re-usable numpy arrays, keyed by shape and dtype.
+
+    Readers check out a buffer for as long as they need it, usually for the
+    duration of a ``get_tiles`` call or for a single tile at the border
+    of a partition, and then return it to the pool. After the first partition,
+    reading tiles doesn't need to allocate any memory.
+
+    Buffers are handed out exclusively, so the pool can be shared between threads.
+
+    Parameters
+    ----------
+    max_free_per_key : int
+        number of unused buffers to keep for each shape/dtype combination
+    """
+    def __init__(self, max_free_per_key=4):
+        self.max_free_per_key = max_free_per_key
+        self.allocations = 0
+        self._free = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def get(self, shape, dtype):
+        """
+        Check out a buffer; it is uninitialized, and may contain data from a previous use.
+        """
+        shape = tuple(shape)
+        dtype = np.dtype(dtype)
+        with self._lock:
+            free = self._free.get((shape, dtype))
+            if free:
+                return free.pop()
+            self.allocations += 1
+        buf = np.empty(shape, dtype=dtype)
+        counter = self.current_counter()
+        if counter is not None:
+            counter.count += 1
+            counter.nbytes += buf.nbytes
+        return buf
+
+    def put(self, buf):
+        """
+        Return a buffer to the pool
+        """
+        key = (buf.shape, buf.dtype)
+        with self._lock:
+            free = self._free.setdefault(key, [])
+            if len(free) < self.max_free_per_key:
+                free.append(buf)
+
+    @contextlib.contextmanager
+    def buffer(self, shape, dtype):
+        """
+        Check out a buffer for the duration of the with-block.
+        """
+        buf = self.get(shape, dtype)
+        try:
+            yield buf
+        finally:
+            self.put(buf)
+
+    def current_counter(self):
+        return getattr(self._local, "counter", None)
+
+    @contextlib.contextmanager
+    def count_allocations(self, counter=None):
+        """
+        Count allocations made from the current thread in the with-block, using
+        a new or the given :class:`AllocationCounter`.
+        """
+        if counter is None:
+            counter = AllocationCounter()
+        previous = self.current_counter()
+        self._local.counter = counter
+        try:
+            yield counter
+        finally:
+            self._local.counter = previous
+
+    def clear(self):
+        with self._lock:
+            self._free = {}
+
+
+# shared by all readers in this (worker) process:
+tile_buffer_pool = BufferPool()
+
+
+class SharedResultBuffer(object):
+    """
+    A result buffer in shared memory, allocated by the client, that tasks running
+    in other processes on the same machine write their results into directly.
+
+    Only the name of the shared memory segment, the shape and the dtype are pickled,
+    so sending it along with each task is cheap.
+
+    Parameters
+    ----------
+    name : str
+        name of the shared memory segment
+
+    shape : tuple of int
+        shape of the whole buffer
+
+    dtype : numpy.dtype
+        dtype of the buffer
+
+    index : int or None
+        restrict this buffer to ``array[index]``, see :meth:`for_index`
+    """
+    def __init__(self, name, shape, dtype, index=None):
+        self.name = name
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.index = index
+        self._shm = None
+
+    @classmethod
+    def is_available(cls):
+        """
+        shared memory segments are only supported on Python 3.8 and newer
+        """
+        return shared_memory is not None
+
+    @classmethod
+    def create(cls, shape, dtype):
+        """
+        Allocate a new, zeroed, shared memory segment. Call :meth:`close` to free it.
+        """
+        if not cls.is_available():
+            raise RuntimeError("shared result buffers need Python 3.8 or newer")
+        nbytes = max(1, int(np.prod(shape, dtype=np.int64)) * np.dtype(dtype).itemsize)
+        shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        buf = cls(name=shm.name, shape=shape, dtype=dtype)
+        buf._shm = shm
+        buf.get_array()[:] = 0
+        return buf
+
+    def for_index(self, index):
+        """
+        the same buffer, restricted to ``array[index]``
+        """
+        return SharedResultBuffer(name=self.name, shape=self.shape, dtype=self.dtype, index=index)
+
+    def get_array(self):
+        """
+        the buffer as numpy array, only valid in the process that created the buffer
+        """
+        arr = np.ndarray(self.shape, dtype=self.dtype, buffer=self._shm.buf)
+        if self.index is not None:
+            return arr[self.index]
+        return arr
+
+    def reduce_tiles(self, result_tiles):
+        """
+        Map the buffer into this process, for example in a worker, reduce
+        ``result_tiles`` into it, and unmap it again.
+        """
+        shm = shared_memory.SharedMemory(name=self.name)
+        arr = np.ndarray(self.shape, dtype=self.dtype, buffer=shm.buf)
+        if self.index is not None:
+            arr = arr[self.index]
+        for tile in result_tiles:
+            tile.reduce_into_result(arr)
+        # the mapping can only be closed if no views on it are left:
+        del arr
+        shm.close()
+
+    def close(self):
+        """
+        free the shared memory segment; only call this in the process that created it
+        """
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def __getstate__(self):
+        return {
+            "name": self.name,
+            "shape": self.shape,
+            "dtype": self.dtype,
+            "index": self.index,
+        }
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._shm = None
+
 
 class BufferWrapper(object):
     """
@@ -33,6 +243,7 @@ class BufferWrapper(object):
         self._dtype = np.dtype(dtype)
         self._data = None
         self._shape = None
+        self._frame_source = None
 
     def set_shape_partition(self, partition):
         self._shape = self._shape_for_kind(self._kind, partition.shape)
@@ -54,6 +265,10 @@ class BufferWrapper(object):
     def data(self):
         return self._data
 
+    @property
+    def kind(self):
+        return self._kind
+
     def allocate(self):
         """
         allocate a new buffer, in the shape previously set
@@ -63,6 +278,7 @@ class BufferWrapper(object):
         assert self._shape is not None
         assert self._data is None
         self._data = np.zeros(self._shape, dtype=self._dtype)
+        self._frame_source = None
 
     def set_buffer(self, buf):
         """
@@ -75,6 +291,7 @@ class BufferWrapper(object):
         assert buf.shape == self._shape
         assert buf.dtype == self._dtype
         self._data = buf
+        self._frame_source = None
 
     def has_data(self):
         return self._data is not None
@@ -87,22 +304,68 @@ class BufferWrapper(object):
         elif self._kind == "single":
             return self._data
 
+    def _get_start_of_tile(self, partition, tile):
+        """
+        index of the first frame of `tile` in the flattened nav dimensions of `partition`
+        """
+        ref_slice = partition.slice
+        tile_slice = tile.tile_slice.shift(ref_slice)
+        return np.ravel_multi_index(
+            tile_slice.origin[:-tile_slice.shape.sig.dims],
+            tuple(partition.shape.nav),
+        )
+
+    def _get_frame_source(self):
+        """
+        For kind="nav" buffers, get the data as a flat, per-frame indexed array
+        of shape (number of frames, 1) or (number of frames,) + extra_shape.
+        Indexing it with a partition-local frame index gives the same view as
+        `get_view_for_frame`, without any index arithmetic.
+        """
+        if self._frame_source is None:
+            frame_shape = self._extra_shape or (1,)
+            source = self._data.reshape((-1,) + frame_shape)
+            # make sure we didn't create a copy, as writes into it need to
+            # end up in our buffer:
+            assert np.may_share_memory(source, self._data)
+            self._frame_source = source
+        return self._frame_source
+
+    def get_view_for_tile(self, partition, tile):
+        """
+        Get a view for all frames of `tile`. For kind="nav" buffers, the
+        view has the shape (number of frames in tile,) + extra_shape, so it
+        matches `tile.flat_nav` in the first dimension.
+        """
+        if self._kind == "sig":
+            return self._data[partition.slice.get(sig_only=True)]
+        elif self._kind == "nav":
+            start_of_tile = self._get_start_of_tile(partition, tile)
+            num_frames = tile.tile_slice.shape.nav.size
+            flat_data = self._data.reshape((-1,) + self._extra_shape)
+            return flat_data[start_of_tile:start_of_tile + num_frames]
+        elif self._kind == "single":
+            return self._data
+
+    def get_frame_views_for_tile(self, partition, tile):
+        """
+        Get a sequence of views, one for each frame of `tile`, that can be indexed
+        with the tile-local frame index. This only needs to do index calculations once
+        per tile, so it should be preferred over calling `get_view_for_frame` for each frame.
+        """
+        num_frames = tile.tile_slice.shape.nav.size
+        if self._kind == "nav":
+            start_of_tile = self._get_start_of_tile(partition, tile)
+            return self._get_frame_source()[start_of_tile:start_of_tile + num_frames]
+        view = self.get_view_for_frame(partition, tile, frame_idx=0)
+        return [view] * num_frames
+
     def get_view_for_frame(self, partition, tile, frame_idx):
         if self._kind == "sig":
             return self._data[partition.slice.get(sig_only=True)]
         elif self._kind == "nav":
-            ref_slice = partition.slice
-            tile_slice = tile.tile_slice.shift(ref_slice)
-            start_of_tile = np.ravel_multi_index(
-                tile_slice.origin[:-tile_slice.shape.sig.dims],
-                tuple(partition.shape.nav),
-            )
-            result_idx = np.unravel_index(start_of_tile + frame_idx,
-                                          partition.shape.nav)
-            # shape: (1,) + self._extra_shape
-            if len(self._extra_shape) > 0:
-                return self._data[result_idx]
-            else:
-                return self._data[result_idx + (np.newaxis,)]
+            start_of_tile = self._get_start_of_tile(partition, tile)
+            # shape: (1,) or self._extra_shape
+            return self._get_frame_source()[start_of_tile + frame_idx]
         elif self._kind == "single":
             return self._data
@@ -0,0 +1,207 @@
+"""
+Helpers for restricting a computation to a region of interest (ROI), a boolean
+mask over the navigation axes of a dataset that selects the frames to process.
+"""
+import numpy as np
+
+from .slice import Slice
+from .shape import Shape
+
+# selected frames that are at most this many frames apart are read using a single
+# crop, as each crop has some overhead in the reader (opening files, seeking):
+MAX_GAP = 16
+
+
+def get_raw_roi(roi, dataset):
+    """
+    Convert ``roi`` to the navigation shape of ``dataset.raw_shape``, which is
+    the coordinate system of partitions and of job results
+
+    Parameters
+    ----------
+    roi : numpy.ndarray or None
+        boolean mask of shape ``dataset.shape.nav`` or ``dataset.raw_shape.nav``
+
+    dataset : DataSet
+        the dataset the roi applies to
+
+    Returns
+    -------
+    numpy.ndarray or None
+        boolean mask of shape ``dataset.raw_shape.nav``, or None if ``roi`` is None
+    """
+    if roi is None:
+        return None
+    roi = np.asarray(roi, dtype=bool)
+    nav_shape = tuple(dataset.shape.nav)
+    raw_nav_shape = tuple(dataset.raw_shape.nav)
+    if roi.shape not in (nav_shape, raw_nav_shape):
+        raise ValueError("roi should have shape %s, has %s" % (nav_shape, roi.shape))
+    # some formats don't know the exact number of frames in advance, so the sizes of
+    # shape.nav and raw_shape.nav can differ, in which case frames are matched up in order:
+    flat_roi = roi.reshape((-1,))
+    raw_size = int(np.prod(raw_nav_shape, dtype=np.int64))
+    raw_roi = np.zeros(raw_size, dtype=bool)
+    num_frames = min(raw_size, flat_roi.size)
+    raw_roi[:num_frames] = flat_roi[:num_frames]
+    return raw_roi.reshape(raw_nav_shape)
+
+
+def get_partition_roi(raw_roi, partition):
+    """
+    The part of ``raw_roi`` that covers ``partition``
+    """
+    return raw_roi[partition.slice.get(nav_only=True)]
+
+
+def _get_runs(flat_roi, max_gap):
+    """
+    (start, stop) of the runs of selected frames in ``flat_roi``, where runs that
+    are separated by at most ``max_gap`` frames are merged
+    """
+    selected = np.flatnonzero(flat_roi)
+    if selected.size == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(selected) > max_gap + 1)
+    starts = np.concatenate([selected[:1], selected[breaks + 1]])
+    stops = np.concatenate([selected[breaks] + 1, selected[-1:] + 1])
+    return list(zip(starts.tolist(), stops.tolist()))
+
+
+def _run_to_boxes(start, stop, shape):
+    """
+    Split the flat index range [start, stop) of an array of ``shape`` into
+    rectangular boxes, given as (origin, shape) tuples
+    """
+    if len(shape) == 1:
+        return [((start,), (stop - start,))]
+    inner_size = int(np.prod(shape[1:], dtype=np.int64))
+    first_row, first_offset = divmod(start, inner_size)
+    last_row, last_offset = divmod(stop, inner_size)
+
+    def _in_row(row, start, stop):
+        return [
+            ((row,) + origin, (1,) + box_shape)
+            for origin, box_shape in _run_to_boxes(start, stop, shape[1:])
+        ]
+
+    if first_row == last_row:
+        return _in_row(first_row, first_offset, last_offset)
+    boxes = []
+    if first_offset > 0:
+        boxes.extend(_in_row(first_row, first_offset, inner_size))
+        first_row += 1
+    if last_row > first_row:
+        boxes.append((
+            (first_row,) + (0,) * (len(shape) - 1),
+            (last_row - first_row,) + tuple(shape[1:]),
+        ))
+    if last_offset > 0:
+        boxes.extend(_in_row(last_row, 0, last_offset))
+    return boxes
+
+
+def get_crops(partition_roi, partition, max_gap=MAX_GAP):
+    """
+    Rectangular regions of ``partition`` that together contain all frames selected
+    by ``partition_roi``, to be passed as ``crop_to`` to ``Partition.iter_tiles``.
+    The crops don't overlap, but tiles can intersect more than one of them.
+
+    Returns
+    -------
+    list of Slice
+        in the coordinate system of the partition slice, with the full signal dimensions
+    """
+    p_slice = partition.slice
+    nav_dims = partition_roi.ndim
+    crops = []
+    for start, stop in _get_runs(partition_roi.reshape((-1,)), max_gap):
+        for origin, shape in _run_to_boxes(start, stop, partition_roi.shape):
+            crops.append(Slice(
+                origin=tuple(
+                    o + p_o for o, p_o in zip(origin, p_slice.origin)
+                ) + tuple(p_slice.origin[nav_dims:]),
+                shape=Shape(
+                    tuple(shape) + tuple(p_slice.shape.sig),
+                    sig_dims=p_slice.shape.sig.dims
+                ),
+            ))
+    return crops
+
+
+def get_tile_selection(tile_slice, partition_roi, partition, crop):
+    """
+    Which frames of a tile are selected by ``partition_roi`` and lie inside of ``crop``
+
+    Returns
+    -------
+    numpy.ndarray
+        flat boolean array, with one entry per frame of the tile
+    """
+    selection = np.zeros(tuple(tile_slice.shape.nav), dtype=bool)
+    intersection = tile_slice.intersection_with(crop)
+    if not intersection.is_null():
+        in_tile = intersection.shift(tile_slice).get(nav_only=True)
+        in_partition = intersection.shift(partition.slice).get(nav_only=True)
+        selection[in_tile] = partition_roi[in_partition]
+    return selection.reshape((-1,))
+
+
+def iter_roi_tiles(partition, partition_roi, max_gap=MAX_GAP, **kwargs):
+    """
+    Read only the tiles of ``partition`` that contain frames selected by ``partition_roi``.
+    Each selected frame is part of exactly one of the yielded tiles, even if a
+    tile intersects multiple crops and is read more than once. ``max_gap`` is
+    passed on to :func:`get_crops`, additional keyword arguments are passed on
+    to ``Partition.iter_tiles``.
+
+    Yields
+    ------
+    (DataTile, numpy.ndarray)
+        the tile, and the flat selection of its frames (see :func:`get_tile_selection`)
+    """
+    for crop in get_crops(partition_roi, partition, max_gap=max_gap):
+        for tile in partition.iter_tiles(crop_to=crop, **kwargs):
+            selection = get_tile_selection(tile.tile_slice, partition_roi, partition, crop)
+            if selection.any():
+                yield tile, selection
+
+
+def get_progressive_rois(nav_shape, strides=(8, 4, 2, 1)):
+    """
+    ROIs for processing a dataset in coarse-to-fine passes: each pass selects the
+    frames on a regular grid with the given stride along all navigation axes,
+    except for those already selected by an earlier pass. The last pass selects
+    all remaining frames, so each frame is selected exactly once.
+
+    Yields
+    ------
+    (int, numpy.ndarray)
+        the stride of the pass, and its roi of shape ``nav_shape``
+    """
+    done = np.zeros(nav_shape, dtype=bool)
+    for stride in strides:
+        grid = np.zeros(nav_shape, dtype=bool)
+        grid[tuple(slice(None, None, stride) for _ in nav_shape)] = True
+        roi = grid & ~done
+        done |= grid
+        if roi.any():
+            yield stride, roi
+    if not done.all():
+        yield 1, ~done
+
+
+def upsample_nav(data, stride, nav_dims):
+    """
+    Fill in the frames that are not on the grid with ``stride`` from the nearest
+    grid point before them, so a result that was only computed on the grid can be
+    shown at the full resolution. The navigation axes are the last ``nav_dims`` axes
+    of ``data``, and a copy is returned.
+    """
+    if stride == 1:
+        return data.copy()
+    index = np.ix_(*[
+        (np.arange(size) // stride) * stride
+        for size in data.shape[data.ndim - nav_dims:]
+    ])
+    return data[(Ellipsis,) + index]
@@ -15,9 +15,27 @@ class JobCancelledError(Exception):
 
 
 class JobExecutor(object):
-    def run_job(self, job):
+    # if tasks run in processes on this machine that can write into
+    # shared memory allocated by the client, see ``Job.make_shared_result``:
+    supports_shared_result = False
+
+    def get_tasks(self, job):
+        """
+        create the tasks of a Job, as this executor would run them
+        """
+        return list(job.get_tasks())
+
+    def run_job(self, job, tasks=None):
         """
         run a Job
+
+        Parameters
+        ----------
+        job : Job
+            the job to run
+
+        tasks : list of Task or None
+            the tasks of ``job``, if they were already created with ``get_tasks``
         """
         raise NotImplementedError()
 
@@ -32,6 +50,12 @@ class JobExecutor(object):
         cleanup resources used by this executor, if any
         """
 
+    def cancel(self, cancel_id):
+        """
+        cancel execution identified by `cancel_id`
+        """
+        pass
+
     def get_available_workers(self):
         """
         returns a list of dicts with available workers
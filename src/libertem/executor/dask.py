@@ -1,15 +1,59 @@
+import time
 import functools
+import itertools
 import logging
 
+import numpy as np
 import tornado.util
 from dask import distributed as dd
 
+from libertem.io.dataset.base import min_num_partitions_hint
 from .base import JobExecutor, JobCancelledError, sync_to_async, AsyncAdapter
 
 
 log = logging.getLogger(__name__)
 
 
+def _task_nbytes(task):
+    partition = getattr(task, "partition", None)
+    if partition is None:
+        return 0
+    return partition.shape.size * np.dtype(partition.dtype).itemsize
+
+
+def _run_task(task):
+    """
+    Run ``task`` on a dask worker, and measure where and how long it ran
+    """
+    t0 = time.perf_counter()
+    result = task()
+    seconds = time.perf_counter() - t0
+    try:
+        worker = dd.get_worker().name
+    except ValueError:
+        worker = None
+    return result, {
+        "worker": worker,
+        "seconds": seconds,
+        "bytes": _task_nbytes(task),
+    }
+
+
+def _add_worker_stats(worker_stats, info):
+    stats = worker_stats.setdefault(info["worker"], {
+        "tasks": 0,
+        "seconds": 0.0,
+        "bytes": 0,
+        "throughput": 0.0,
+    })
+    stats["tasks"] += 1
+    stats["seconds"] += info["seconds"]
+    stats["bytes"] += info["bytes"]
+    if stats["seconds"] > 0:
+        # in bytes per second:
+        stats["throughput"] = stats["bytes"] / stats["seconds"]
+
+
 class CommonDaskMixin(object):
     def _task_idx_to_workers(self, workers, idx):
         hosts = list(sorted(set(w['host'] for w in workers)))
@@ -35,44 +79,136 @@ class CommonDaskMixin(object):
                 locations = self._task_idx_to_workers(available_workers, task.idx)
             submit_kwargs['workers'] = locations
             futures.append(
-                self.client.submit(task, **submit_kwargs)
+                self.client.submit(_run_task, task, **submit_kwargs)
             )
         return futures
 
+    def _submit_dynamic(self, task):
+        """
+        submit a task that may run on any worker; its locations are only a preference
+        """
+        submit_kwargs = {}
+        locations = task.get_locations()
+        if locations is not None:
+            if len(locations) == 0:
+                raise ValueError("no workers found for task")
+            submit_kwargs['workers'] = locations
+            submit_kwargs['allow_other_workers'] = True
+        return self.client.submit(_run_task, task, pure=False, **submit_kwargs)
+
     def get_available_workers(self):
         info = self.client.scheduler_info()
         return [
             {
                 'name': worker['name'],
                 'host': worker['host'],
+                'nthreads': worker.get('nthreads', 1),
             }
             for worker in info['workers'].values()
         ]
 
 
 class DaskJobExecutor(CommonDaskMixin, JobExecutor):
-    def __init__(self, client, is_local=False):
+    def __init__(self, client, is_local=False, scheduling="static", partitions_per_worker=4):
+        """
+        Parameters
+        ----------
+        client : distributed.Client
+            the client connected to the dask scheduler
+
+        is_local : bool
+            if the cluster was started by us, and should be shut down in ``close``
+
+        scheduling : "static" or "dynamic"
+            in static mode, all tasks are submitted at once, each pinned to the
+            workers of one host. In dynamic mode, jobs are split into
+            ``partitions_per_worker`` partitions per worker thread, and tasks are
+            handed out as workers become free, so fast workers take over work from
+            slow ones. Locations of partitions (see ``Partition.get_locations``)
+            are only used as a preference in dynamic mode.
+
+        partitions_per_worker : int
+            how many partitions per worker thread to make in dynamic mode
+        """
+        if scheduling not in ("static", "dynamic"):
+            raise ValueError("unknown scheduling mode: %r" % scheduling)
         self.is_local = is_local
         self.client = client
+        self.scheduling = scheduling
+        self.partitions_per_worker = partitions_per_worker
         self._futures = {}
+        self._cancelled = set()
 
-    def run_job(self, job):
-        tasks = job.get_tasks()
-        return self.run_tasks(tasks, cancel_id=job)
+    def _get_num_slots(self):
+        return sum(w['nthreads'] for w in self.get_available_workers())
+
+    def get_tasks(self, job):
+        if self.scheduling == "dynamic":
+            with min_num_partitions_hint(self._get_num_slots() * self.partitions_per_worker):
+                return list(job.get_tasks())
+        return list(job.get_tasks())
+
+    def run_job(self, job, tasks=None):
+        if tasks is None:
+            tasks = self.get_tasks(job)
+        # per-worker statistics of this run: number of tasks, time spent,
+        # bytes processed and throughput in bytes per second
+        worker_stats = {}
+        for result in self._run_tasks(tasks, cancel_id=job, worker_stats=worker_stats):
+            yield result
+        job.diagnostics["workers"] = worker_stats
 
     def run_tasks(self, tasks, cancel_id):
+        return self._run_tasks(tasks, cancel_id, worker_stats={})
+
+    def _run_tasks(self, tasks, cancel_id, worker_stats):
+        if self.scheduling == "dynamic":
+            results = self._run_tasks_dynamic(tasks, cancel_id)
+        else:
+            results = self._run_tasks_static(tasks, cancel_id)
+        try:
+            for result, info in results:
+                _add_worker_stats(worker_stats, info)
+                yield result
+        finally:
+            self._futures.pop(cancel_id, None)
+            self._cancelled.discard(cancel_id)
+        log.debug("worker stats: %r", worker_stats)
+
+    def _run_tasks_static(self, tasks, cancel_id):
         futures = self._get_futures(tasks)
         self._futures[cancel_id] = futures
         for future, result in dd.as_completed(futures, with_results=True):
             if future.cancelled():
                 raise JobCancelledError()
             yield result
-        del self._futures[cancel_id]
+
+    def _run_tasks_dynamic(self, tasks, cancel_id):
+        tasks = iter(tasks)
+        # keep each worker thread busy, plus one task queued for it, so it doesn't
+        # need to wait for the round trip to the scheduler:
+        num_in_flight = max(1, 2 * self._get_num_slots())
+        futures = [
+            self._submit_dynamic(task)
+            for task in itertools.islice(tasks, num_in_flight)
+        ]
+        self._futures[cancel_id] = futures
+        in_flight = dd.as_completed(futures)
+        for future in in_flight:
+            if future.cancelled() or cancel_id in self._cancelled:
+                raise JobCancelledError()
+            futures.remove(future)
+            for task in itertools.islice(tasks, 1):
+                new_future = self._submit_dynamic(task)
+                futures.append(new_future)
+                in_flight.add(new_future)
+            yield future.result()
 
     def cancel(self, cancel_id):
         if cancel_id in self._futures:
+            self._cancelled.add(cancel_id)
             futures = self._futures[cancel_id]
-            self.client.cancel(futures)
+            self.client.cancel(list(futures))
 
     def run_function(self, fn, *args, **kwargs):
         """
@@ -105,7 +241,7 @@ class DaskJobExecutor(CommonDaskMixin, JobExecutor):
         return cls(client=client, is_local=False, *args, **kwargs)
 
     @classmethod
-    def make_local(cls, cluster_kwargs=None, client_kwargs=None):
+    def make_local(cls, cluster_kwargs=None, client_kwargs=None, **kwargs):
         """
         Spin up a local dask cluster
 
@@ -113,6 +249,8 @@ class DaskJobExecutor(CommonDaskMixin, JobExecutor):
             threads_per_worker
             n_workers
 
+        other keyword arguments, like ``scheduling``, are passed on to the constructor
+
         Returns
         -------
         DaskJobExecutor
@@ -120,7 +258,7 @@ class DaskJobExecutor(CommonDaskMixin, JobExecutor):
         """
         cluster = dd.LocalCluster(**(cluster_kwargs or {}))
         client = dd.Client(cluster, **(client_kwargs or {}))
-        return cls(client=client, is_local=True)
+        return cls(client=client, is_local=True, **kwargs)
 
 
 class AsyncDaskJobExecutor(AsyncAdapter):
@@ -140,10 +278,11 @@ class AsyncDaskJobExecutor(AsyncAdapter):
         return cls(wrapped=executor)
 
     @classmethod
-    async def make_local(cls, cluster_kwargs=None, client_kwargs=None):
+    async def make_local(cls, cluster_kwargs=None, client_kwargs=None, **kwargs):
         executor = await sync_to_async(functools.partial(
             DaskJobExecutor.make_local,
             cluster_kwargs=cluster_kwargs,
             client_kwargs=client_kwargs,
+            **kwargs,
         ))
         return cls(wrapped=executor)
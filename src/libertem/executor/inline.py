@@ -5,8 +5,9 @@ class InlineJobExecutor(JobExecutor):
     """
     naive JobExecutor that just iterates over partitions and processes them one after another
     """
-    def run_job(self, job):
-        tasks = job.get_tasks()
+    def run_job(self, job, tasks=None):
+        if tasks is None:
+            tasks = job.get_tasks()
         return self.run_tasks(tasks, cancel_id=job)
 
     def run_tasks(self, tasks, cancel_id):
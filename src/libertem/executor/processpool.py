@@ -0,0 +1,212 @@
+import pickle
+import functools
+import multiprocessing
+import concurrent.futures
+
+import cloudpickle
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    # Python < 3.8 has neither shared memory nor pickle protocol 5 with out-of-band
+    # buffers, results are then sent back through the pipe as plain pickles:
+    shared_memory = None
+
+from .base import JobExecutor, JobCancelledError, sync_to_async, AsyncAdapter
+
+# results with less out-of-band data than this are sent back through the pipe:
+SHM_THRESHOLD = 64*1024
+
+
+def _encode_result(result):
+    """
+    Pickle ``result``, moving the data of numpy arrays into a shared memory segment
+
+    Returns
+    -------
+    (bytes, str or None, list of int)
+        the pickled result without the array data, the name of the shared memory
+        segment and the sizes of the buffers stored in it
+    """
+    if shared_memory is None:
+        return pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL), None, []
+    buffers = []
+    payload = pickle.dumps(result, protocol=5, buffer_callback=buffers.append)
+    buffers = [buf.raw() for buf in buffers]
+    sizes = [buf.nbytes for buf in buffers]
+    if sum(sizes) < SHM_THRESHOLD:
+        return pickle.dumps(result, protocol=5), None, []
+    shm = shared_memory.SharedMemory(create=True, size=sum(sizes))
+    try:
+        offset = 0
+        for buf, size in zip(buffers, sizes):
+            shm.buf[offset:offset + size] = buf
+            offset += size
+    finally:
+        shm.close()
+    return payload, shm.name, sizes
+
+
+def _decode_result(payload, shm_name, sizes):
+    if shm_name is None:
+        return pickle.loads(payload)
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        # one copy out of the segment, so it can be released right away:
+        data = bytearray(shm.buf[:sum(sizes)])
+    finally:
+        shm.close()
+        shm.unlink()
+    view = memoryview(data)
+    buffers = []
+    offset = 0
+    for size in sizes:
+        buffers.append(view[offset:offset + size])
+        offset += size
+    return pickle.loads(payload, buffers=buffers)
+
+
+def _discard_result(future):
+    """
+    free the shared memory of a result that will not be decoded
+    """
+    if future.cancelled() or future.exception() is not None:
+        return
+    payload, shm_name, sizes = future.result()
+    if shm_name is not None:
+        shm = shared_memory.SharedMemory(name=shm_name)
+        shm.close()
+        shm.unlink()
+
+
+def _run_pickled(pickled_fn):
+    # tasks and functions are pickled with cloudpickle, as they may contain lambdas,
+    # for example mask factories:
+    fn = cloudpickle.loads(pickled_fn)
+    return _encode_result(fn())
+
+
+def _warm_up():
+    # import the modules needed for running tasks:
+    import libertem.job.base  # NOQA
+    return multiprocessing.current_process().name
+
+
+def _get_mp_context():
+    # forking a process that runs threads is not safe, start workers from a
+    # clean server process instead, where possible:
+    methods = multiprocessing.get_all_start_methods()
+    if "forkserver" in methods:
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
+class ProcessPoolJobExecutor(JobExecutor):
+    """
+    JobExecutor that runs tasks in a pool of local worker processes, without
+    dask. Useful on a single workstation, where it starts faster and doesn't
+    need a round trip through the dask scheduler for each task.
+
+    The worker processes are started once and kept running until ``close``
+    is called. The array data of results is passed back through shared memory
+    instead of the pipe to the worker, on Python 3.8 and newer.
+    """
+    supports_shared_result = shared_memory is not None
+
+    def __init__(self, n_workers=None, mp_context=None):
+        """
+        Parameters
+        ----------
+        n_workers : int or None
+            number of worker processes, defaults to the number of CPU cores
+
+        mp_context : multiprocessing context or None
+            how to start the worker processes, defaults to "forkserver" where available,
+            and "spawn" otherwise
+        """
+        if n_workers is None:
+            n_workers = multiprocessing.cpu_count()
+        if mp_context is None:
+            mp_context = _get_mp_context()
+        self.n_workers = n_workers
+        self._pool = concurrent.futures.ProcessPoolExecutor(
+            max_workers=n_workers, mp_context=mp_context,
+        )
+        self._futures = {}
+        self._warm_up()
+
+    def _warm_up(self):
+        """
+        start the worker processes now, instead of on the first job
+        """
+        futures = [self._pool.submit(_warm_up) for i in range(self.n_workers)]
+        concurrent.futures.wait(futures)
+
+    def _submit(self, fn):
+        return self._pool.submit(_run_pickled, cloudpickle.dumps(fn))
+
+    def run_job(self, job, tasks=None):
+        if tasks is None:
+            tasks = job.get_tasks()
+        return self.run_tasks(tasks, cancel_id=job)
+
+    def run_tasks(self, tasks, cancel_id):
+        futures = [self._submit(task) for task in tasks]
+        self._futures[cancel_id] = futures
+        pending = set(futures)
+        try:
+            for future in concurrent.futures.as_completed(futures):
+                if future.cancelled():
+                    raise JobCancelledError()
+                pending.remove(future)
+                yield _decode_result(*future.result())
+        except concurrent.futures.CancelledError:
+            raise JobCancelledError()
+        finally:
+            del self._futures[cancel_id]
+            # if we stopped early, results may still arrive:
+            for future in pending:
+                future.cancel()
+                future.add_done_callback(_discard_result)
+
+    def cancel(self, cancel_id):
+        """
+        cancel the tasks that have not started yet; tasks that are already running
+        are finished, but their results are discarded
+        """
+        if cancel_id in self._futures:
+            for future in self._futures[cancel_id]:
+                future.cancel()
+
+    def run_function(self, fn, *args, **kwargs):
+        """
+        run a callable `fn` in one of the worker processes
+        """
+        fn_with_args = functools.partial(fn, *args, **kwargs)
+        return _decode_result(*self._submit(fn_with_args).result())
+
+    def get_available_workers(self):
+        return [
+            {'name': 'worker-%d' % i, 'host': 'localhost', 'nthreads': 1}
+            for i in range(self.n_workers)
+        ]
+
+    def close(self):
+        for futures in self._futures.values():
+            for future in futures:
+                future.cancel()
+        self._pool.shutdown(wait=True)
+
+
+class AsyncProcessPoolJobExecutor(AsyncAdapter):
+    def __init__(self, wrapped=None, *args, **kwargs):
+        if wrapped is None:
+            wrapped = ProcessPoolJobExecutor(*args, **kwargs)
+        super().__init__(wrapped)
+
+    @classmethod
+    async def make_local(cls, *args, **kwargs):
+        executor = await sync_to_async(functools.partial(
+            ProcessPoolJobExecutor, *args, **kwargs,
+        ))
+        return cls(wrapped=executor)
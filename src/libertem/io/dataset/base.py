@@ -1,12 +1,43 @@
+import queue
+import threading
+import contextlib
+
 import numpy as np
 
-from libertem.io.utils import get_partition_shape
+from libertem.common import Shape
+from libertem.io.utils import get_partition_shape, get_partition_ranges
+from libertem.io.tiling import negotiate_tileshape
+from libertem.common.buffers import tile_buffer_pool
 
 
 class DataSetException(Exception):
     pass
 
 
+# per-thread, so concurrent runs don't see each other's hints:
+_partition_hints = threading.local()
+
+
+@contextlib.contextmanager
+def min_num_partitions_hint(num_partitions):
+    """
+    Ask for at least ``num_partitions`` partitions from the ``get_partitions``
+    calls made on this thread in the ``with`` block. Executors that hand out
+    partitions dynamically use this to get more, smaller partitions than
+    there are workers, without changing the dataset. Datasets that were given
+    their own ``min_num_partitions`` keep using that.
+
+    As ``get_partitions`` is usually a generator, the partitions have to be
+    created inside the ``with`` block.
+    """
+    previous = getattr(_partition_hints, "min_num_partitions", None)
+    _partition_hints.min_num_partitions = num_partitions
+    try:
+        yield
+    finally:
+        _partition_hints.min_num_partitions = previous
+
+
 class DataSet(object):
     def initialize(self):
         """
@@ -79,6 +110,24 @@ class DataSet(object):
              "value": str(len(list(self.get_partitions())))}
         ]
 
+    def set_prefetch_depth(self, depth):
+        """
+        Opt in to reading ahead: while a tile is being processed, the next ``depth``
+        tiles are read and decoded on a background thread, so I/O overlaps
+        with computation. Should be called after ``initialize``. A depth of 0
+        disables reading ahead, which is the default.
+
+        This costs an additional copy of each tile, and ``depth + 1`` tile buffers
+        per partition, so it is most useful if reading a tile takes about as
+        long as processing it.
+        """
+        self._meta.prefetch_depth = depth
+
+    def _get_min_num_partitions(self, min_num_partitions):
+        if min_num_partitions is not None:
+            return min_num_partitions
+        return getattr(_partition_hints, "min_num_partitions", None)
+
     def get_diagnostics(self):
         """
         Get relevant diagnostics for this dataset, as a list of
@@ -101,14 +150,39 @@ class DataSet(object):
         target_size : int
             target size in bytes - how large should each partition be?
         min_num_partitions : int
-            minimum number of partitions desired, defaults to twice the number of CPU cores
+            minimum number of partitions desired, defaults to the number of CPU cores
         Returns
         -------
         (int, int, int, int)
             the shape calculated from the given parameters
         """
         return get_partition_shape(datashape, framesize, dtype, target_size,
-                                   min_num_partitions)
+                                   self._get_min_num_partitions(min_num_partitions))
+
+    def partition_ranges(self, num_frames, framesize, dtype, target_size,
+                         min_num_partitions=None):
+        """
+        Split the flattened navigation axis into ranges of frames, for datasets
+        that can start and end partitions at any frame
+        Parameters
+        ----------
+        num_frames : int
+            number of frames in the whole dataset
+        framesize : int
+            number of pixels per frame
+        dtype : numpy.dtype or str
+            data type of the dataset
+        target_size : int
+            target size in bytes - how large should each partition be?
+        min_num_partitions : int
+            minimum number of partitions desired, defaults to the number of CPU cores
+        Returns
+        -------
+        list of (int, int)
+            (start, stop) frame indices for each partition
+        """
+        return get_partition_ranges(num_frames, framesize, dtype, target_size,
+                                    self._get_min_num_partitions(min_num_partitions))
 
 
 class Reader(object):
@@ -123,6 +197,8 @@ class DataSetMeta(object):
         if raw_dtype is None:
             raw_dtype = dtype
         self.raw_dtype = np.dtype(raw_dtype)
+        # number of tiles to read ahead, see DataSet.set_prefetch_depth
+        self.prefetch_depth = 0
 
 
 class Partition(object):
@@ -141,7 +217,7 @@ class Partition(object):
         """
         return self.slice.shape
 
-    def get_tiles(self, crop_to=None, full_frames=False):
+    def get_tiles(self, crop_to=None, full_frames=False, consumer=None):
         """
         Return a generator over all DataTiles contained in this Partition.
 
@@ -159,14 +235,142 @@ class Partition(object):
 
         full_frames : boolean, default False
             always read full frames, not stacks of crops of frames
+
+        consumer : str or None
+            what the tiles are used for: "mask", "sum" or "udf". Datasets that
+            choose their tileshape automatically use this to pick a fitting one.
         """
         raise NotImplementedError()
 
+    def get_tileshape(self, tileshape, full_frames=False, consumer=None, **kwargs):
+        """
+        The shape of the tiles to read from this partition
+
+        Parameters
+        ----------
+
+        tileshape : Shape or tuple or None
+            the tileshape given by the user. if it is None, a tileshape is
+            chosen that fits the dtype, frame size and consumer of this partition,
+            see :func:`libertem.io.tiling.negotiate_tileshape`
+
+        full_frames : boolean, default False
+            see ``get_tiles``
+
+        consumer : str or None
+            see ``get_tiles``
+
+        kwargs
+            passed on to :func:`libertem.io.tiling.negotiate_tileshape`
+        """
+        if tileshape is None:
+            return negotiate_tileshape(
+                self.shape, self.dtype, consumer=consumer, whole_frames=full_frames,
+                **kwargs
+            )
+        if full_frames:
+            tileshape = (
+                tuple(tileshape[:self.meta.shape.nav.dims]) + tuple(self.meta.shape.sig)
+            )
+        return Shape(tileshape, sig_dims=self.meta.shape.sig.dims)
+
+    def iter_tiles(self, crop_to=None, full_frames=False, consumer=None):
+        """
+        Like ``get_tiles``, but reads ahead on a background thread if the DataSet
+        opted in to that (see :meth:`DataSet.set_prefetch_depth`). Tasks should use
+        this method to get their tiles.
+
+        ``consumer`` tells datasets that choose their tileshape automatically what the
+        tiles are used for: "mask", "sum" or "udf".
+        """
+        tiles = self.get_tiles(crop_to=crop_to, full_frames=full_frames, consumer=consumer)
+        depth = getattr(self.meta, "prefetch_depth", 0)
+        if depth > 0:
+            return prefetch_tiles(tiles, depth=depth)
+        return tiles
+
     def get_locations(self):
         # Allow using any worker by default
         return None
 
 
+def prefetch_tiles(tiles, depth):
+    """
+    Iterate over ``tiles`` on a background thread, keeping up to ``depth`` tiles
+    ready for the consumer.
+
+    As readers re-use their buffers, each tile is copied into one of ``depth + 1``
+    buffers from the ``tile_buffer_pool``: one is in use by the consumer, the others
+    are filled by the background thread. The buffer of a tile is re-used once the next tile is
+    requested, the same contract as for ``Partition.get_tiles``.
+
+    Parameters
+    ----------
+    tiles : iterator of DataTile
+        usually the generator returned by ``Partition.get_tiles``
+
+    depth : int
+        number of tiles to read ahead
+    """
+    free_buffers = queue.Queue()
+    for i in range(depth + 1):
+        free_buffers.put(None)  # checked out lazily, when we know the tile shape
+    ready = queue.Queue()
+    stop = threading.Event()
+    # count allocations of the background thread for the consumer:
+    counter = tile_buffer_pool.current_counter()
+    pool_buffers = []
+
+    def _get_buffer(buf, tile):
+        if buf is not None and buf.shape == tile.data.shape and buf.dtype == tile.data.dtype:
+            return buf
+        buf = tile_buffer_pool.get(tile.data.shape, dtype=tile.data.dtype)
+        pool_buffers.append(buf)
+        return buf
+
+    def _read_ahead():
+        try:
+            with tile_buffer_pool.count_allocations(counter):
+                for tile in tiles:
+                    buf = free_buffers.get()
+                    if stop.is_set():
+                        return
+                    buf = _get_buffer(buf, tile)
+                    np.copyto(buf, tile.data)
+                    ready.put(("tile", DataTile(data=buf, tile_slice=tile.tile_slice)))
+                ready.put(("done", None))
+        except Exception as e:
+            ready.put(("error", e))
+        finally:
+            if hasattr(tiles, "close"):
+                tiles.close()
+
+    def _consume():
+        thread = threading.Thread(target=_read_ahead, name="prefetch_tiles", daemon=True)
+        thread.start()
+        try:
+            buf_in_use = None
+            while True:
+                if buf_in_use is not None:
+                    free_buffers.put(buf_in_use)
+                kind, value = ready.get()
+                if kind == "done":
+                    return
+                elif kind == "error":
+                    raise value
+                buf_in_use = value.data
+                yield value
+        finally:
+            # also stops the background thread if the consumer stops early:
+            stop.set()
+            free_buffers.put(None)
+            thread.join()
+            for buf in pool_buffers:
+                tile_buffer_pool.put(buf)
+
+    return _consume()
+
+
 class DataTile(object):
     __slots__ = ["data", "tile_slice"]
 
@@ -58,7 +58,7 @@ class BloReader(object):
 
 
 class BloDataSet(DataSet):
-    def __init__(self, path, tileshape, endianess='<'):
+    def __init__(self, path, tileshape=None, endianess='<'):
         self._tileshape = tileshape
         self._path = path
         self._header = None
@@ -154,16 +154,11 @@ class BloPartition(Partition):
         self.reader = reader
         super().__init__(*args, **kwargs)
 
-    def get_tiles(self, crop_to=None, full_frames=False):
+    def get_tiles(self, crop_to=None, full_frames=False, consumer=None):
         if crop_to is not None:
             if crop_to.shape.sig != self.meta.shape.sig:
                 raise DataSetException("BloDataSet only supports whole-frame crops for now")
-        if full_frames:
-            tileshape = (
-                tuple(self.tileshape[:self.meta.shape.nav.dims]) + tuple(self.meta.shape.sig)
-            )
-        else:
-            tileshape = self.tileshape
+        tileshape = self.get_tileshape(self.tileshape, full_frames=full_frames, consumer=consumer)
         with self.reader.get_data() as data:
             subslices = list(self.slice.subslices(shape=tileshape))
             for tile_slice in subslices:
@@ -171,6 +166,8 @@ class BloPartition(Partition):
                     intersection = tile_slice.intersection_with(crop_to)
                     if intersection.is_null():
                         continue
+                    # only read the frames inside of the crop:
+                    tile_slice = intersection
                 # NOTE: no need to re-use buffer, as there is none (mmap!)
                 yield DataTile(
                     data=data[tile_slice.get()],
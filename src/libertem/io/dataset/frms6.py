@@ -5,13 +5,15 @@ import csv
 import glob
 import math
 import logging
-import itertools
 import configparser
 
 import scipy.io as sio
 import numpy as np
+import numba
 
 from libertem.common import Slice, Shape
+from libertem.common.buffers import tile_buffer_pool
+from libertem.io.utils import get_frame_range
 from .base import DataSet, Partition, DataTile, DataSetException, DataSetMeta
 
 log = logging.getLogger(__name__)
@@ -47,17 +49,60 @@ class GainMapCSVDialect(csv.excel):
     delimiter = ';'
 
 
-def _unbin(tile_data, factor):
+@numba.njit(nogil=True)
+def preprocess_frames(raw, dark_frame, gain_map, bin_factor, sig_origin, out):
     """
-    tile_data should have shape (num_frames, y, x)
+    Pre-process raw frames in one pass, see :meth:`FRMS6FileSet.read_images`
+
+    Parameters
+    ----------
+    raw : np.ndarray of uint16
+        raw frames of shape (num_frames, h, w), usually a view of the memory mapped file
+    dark_frame : np.ndarray or None
+        the raw dark frame of shape (h, w)
+    gain_map : np.ndarray or None
+        the folded gain map of shape (2 * h, w // 2)
+    bin_factor : int
+        the binning factor, rows are repeated this many times
+    sig_origin : tuple of int
+        (y, x) position of ``out`` in the final frame, for reading only a part of it
+    out : np.ndarray
+        of shape (num_frames, crop_h, crop_w); the pre-processed frames are written here
     """
-    s = tile_data.shape
-
-    # insert a binning dimension:
-    tile_data = tile_data.reshape((s[0], s[1], 1, s[2]))
-    unbinned = tile_data.repeat(factor, axis=2)
-    # FIXME: should we scale the data by the binning factor?
-    return unbinned.reshape((s[0], factor * s[1], s[2]))
+    h = raw.shape[1]
+    w = raw.shape[2]
+    half_height = h * bin_factor
+    for frame in range(out.shape[0]):
+        for r in range(out.shape[1]):
+            y = sig_origin[0] + r
+            if y < half_height:
+                src_y = y // bin_factor
+            else:
+                src_y = (y - half_height) // bin_factor
+            # un-binning: repeat the row we just computed
+            # FIXME: should we scale the data by the binning factor?
+            if r > 0 and (y - 1) // bin_factor == y // bin_factor:
+                out[frame, r] = out[frame, r - 1]
+                continue
+            for c in range(out.shape[2]):
+                x = sig_origin[1] + c
+                if y < half_height:
+                    # left part:
+                    raw_y = src_y
+                    raw_x = x
+                    gain_y = src_y
+                else:
+                    # folding: the right part is flipped in both directions
+                    # and goes below the left part
+                    raw_y = h - 1 - src_y
+                    raw_x = w - 1 - x
+                    gain_y = h + src_y
+                px = np.float64(raw[frame, raw_y, raw_x])
+                if dark_frame is not None:
+                    px -= dark_frame[raw_y, raw_x]
+                if gain_map is not None:
+                    px *= gain_map[gain_y, x]
+                out[frame, r, c] = px
 
 
 class FRMS6File(object):
@@ -172,71 +217,46 @@ class FRMS6FileSet(object):
         3) folding
         4) apply gain map
         5) un-binning
+
+        All steps are done in a single pass over the raw data, directly into `out`.
+        If `crop_to` is given, `out` only has the shape of its signal part, and only
+        that part of the frames is read and pre-processed.
         """
+        sig_dims = self._meta.shape.sig.dims
+        sig_origin = (0, 0)
+        if crop_to is not None:
+            sig_origin = tuple(crop_to.origin[-sig_dims:])
+            assert tuple(crop_to.shape.sig) == tuple(out.shape[1:])
+        bin_factor = self._files[0].global_header['readoutmode']['bin']
 
         frames_read = 0
-
-        # 1) conversion to float: happens as we write to this buffer
-        raw_buffer = np.zeros((out.shape[0],) + tuple(self._meta.raw_shape.sig),
-                              dtype=self._meta.dtype)
         for f in self._files:
             # this file comes before the overlapping region, and has no overlap
             # with the requested range, go to next file:
             f_end_idx = f.start_idx + f.num_frames
-            if f_end_idx < start:
+            if f_end_idx <= start:
                 continue
 
             # this file comes after the the overlapping range, stop here:
-            if f.start_idx > stop:
-                assert frames_read == out.shape[0]
+            if f.start_idx >= stop:
                 break
 
             # file-local indices:
             f_start = max(0, start - f.start_idx)
             f_stop = min(stop, f_end_idx) - f.start_idx
 
-            raw_buffer[
-                frames_read:frames_read + (f_stop - f_start)
-            ] = f.data[f_start:f_stop, ...]
+            preprocess_frames(
+                raw=f.data[f_start:f_stop],
+                dark_frame=self._dark_frame,
+                gain_map=self._gain_map,
+                bin_factor=bin_factor,
+                sig_origin=sig_origin,
+                out=out[frames_read:frames_read + (f_stop - f_start)],
+            )
 
             frames_read += f_stop - f_start
         assert frames_read == out.shape[0]
 
-        # 2) offset correction:
-        if self._dark_frame is not None:
-            raw_buffer -= self._dark_frame
-
-        # 3) folding: l(eft) p(art), r(ight) p(art)
-        # the right part is folded to below the left part
-        # (imagine the bottom-right corner as a hinge)
-        half_width = out.shape[2]
-        assert out.shape[1] % 2 == 0
-        half_height = out.shape[1] // 2
-
-        lp = raw_buffer[..., :half_width]
-        rp = raw_buffer[..., half_width:]
-        # negative strides to flip both x and y direction:
-        rp = rp[:, ::-1, ::-1]
-
-        # 4) apply gain map:
-        if self._gain_map is not None:
-            gain_half = self._gain_map.shape[0] // 2
-            gain_lp = self._gain_map[:gain_half, ...]
-            gain_rp = self._gain_map[gain_half:, ...]
-            lp *= gain_lp
-            rp *= gain_rp
-
-        # 5) un-binning:
-        bin_factor = self._files[0].global_header['readoutmode']['bin']
-        if bin_factor > 1:
-            lp = _unbin(lp, factor=bin_factor)
-            rp = _unbin(rp, factor=bin_factor)
-        out[..., :half_height, :] = lp
-        out[..., half_height:, :] = rp
-
-        # FIXME: to be implemented:
-        assert crop_to is None or tuple(crop_to.shape.sig) == tuple(out.shape[1:])
-
         return out
 
 
@@ -424,24 +444,15 @@ class FRMS6DataSet(DataSet):
     def raw_dtype(self):
         return self._meta.raw_dtype
 
-    def _get_num_partitions(self):
-        """
-        returns the number of partitions the dataset should be split into
-        """
-        # let's try to aim for 512MB per partition
-        res = max(1, self._total_filesize // (512*1024*1024))
-        return res
-
     def get_partitions(self):
         num_frames = self.shape.nav.size
-        f_per_part = num_frames // self._get_num_partitions()
-
-        c0 = itertools.count(start=0, step=f_per_part)
-        c1 = itertools.count(start=f_per_part, step=f_per_part)
-        for (start, stop) in zip(c0, c1):
-            if start >= num_frames:
-                break
-            stop = min(stop, num_frames)
+        ranges = self.partition_ranges(
+            num_frames=num_frames,
+            framesize=self.shape.sig.size,
+            dtype=self.dtype,
+            target_size=512*1024*1024,
+        )
+        for (start, stop) in ranges:
             part_slice = Slice(
                 origin=(
                     start, 0, 0,
@@ -470,10 +481,11 @@ class FRMS6Partition(Partition):
         framesize = self.meta.shape.sig.size * self.meta.dtype.itemsize
         return max(1, math.floor(target_size / framesize))
 
-    def get_tiles(self, crop_to=None, full_frames=False):
+    def get_tiles(self, crop_to=None, full_frames=False, consumer=None):
         # NOTE: full_frames is ignored, as we currently read whole frames only
-        start_at_frame = self._start_frame
-        num_frames = self._num_frames
+        # only the frames inside of the crop are read:
+        start_at_frame, stop = get_frame_range(self._start_frame, self._num_frames, crop_to)
+        num_frames = stop - start_at_frame
         stackheight = self._get_stackheight()
         dtype = self.meta.dtype
         sig_shape = self.meta.shape.sig
@@ -481,39 +493,42 @@ class FRMS6Partition(Partition):
         if crop_to is not None:
             sig_origin = tuple(crop_to.origin[-sig_shape.dims:])
             sig_shape = crop_to.shape.sig
-        tile_buf_full = np.zeros((stackheight,) + tuple(sig_shape), dtype=dtype)
+        tile_buf_full = tile_buffer_pool.get((stackheight,) + tuple(sig_shape), dtype=dtype)
 
         tileshape = (
             stackheight,
         ) + tuple(sig_shape)
 
-        for outer_frame in range(start_at_frame, start_at_frame + num_frames, stackheight):
-            if start_at_frame + num_frames - outer_frame < stackheight:
-                end_frame = start_at_frame + num_frames
-                current_stackheight = end_frame - outer_frame
-                current_tileshape = (
-                    current_stackheight,
-                ) + tuple(sig_shape)
-                tile_buf = np.zeros(current_tileshape, dtype=dtype)
-            else:
-                current_stackheight = stackheight
-                current_tileshape = tileshape
-                tile_buf = tile_buf_full
-            tile_slice = Slice(
-                origin=(outer_frame,) + sig_origin,
-                shape=Shape(current_tileshape, sig_dims=sig_shape.dims)
-            )
-            if crop_to is not None:
-                intersection = tile_slice.intersection_with(crop_to)
-                if intersection.is_null():
-                    continue
-            self._fileset.read_images(
-                start=outer_frame,
-                stop=outer_frame + current_stackheight,
-                out=tile_buf,
-                crop_to=crop_to,
-            )
-            yield DataTile(
-                data=tile_buf,
-                tile_slice=tile_slice
-            )
+        border_buf = None
+        try:
+            for outer_frame in range(start_at_frame, start_at_frame + num_frames, stackheight):
+                if start_at_frame + num_frames - outer_frame < stackheight:
+                    end_frame = start_at_frame + num_frames
+                    current_stackheight = end_frame - outer_frame
+                    current_tileshape = (
+                        current_stackheight,
+                    ) + tuple(sig_shape)
+                    # only the last stack can be smaller:
+                    tile_buf = border_buf = tile_buffer_pool.get(current_tileshape, dtype=dtype)
+                else:
+                    current_stackheight = stackheight
+                    current_tileshape = tileshape
+                    tile_buf = tile_buf_full
+                tile_slice = Slice(
+                    origin=(outer_frame,) + sig_origin,
+                    shape=Shape(current_tileshape, sig_dims=sig_shape.dims)
+                )
+                self._fileset.read_images(
+                    start=outer_frame,
+                    stop=outer_frame + current_stackheight,
+                    out=tile_buf,
+                    crop_to=crop_to,
+                )
+                yield DataTile(
+                    data=tile_buf,
+                    tile_slice=tile_slice
+                )
+        finally:
+            tile_buffer_pool.put(tile_buf_full)
+            if border_buf is not None:
+                tile_buffer_pool.put(border_buf)
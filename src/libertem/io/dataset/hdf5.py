@@ -1,9 +1,9 @@
 import contextlib
 
-import numpy as np
 import h5py
 
 from libertem.common import Slice, Shape
+from libertem.common.buffers import tile_buffer_pool
 from .base import DataSet, Partition, DataTile, DataSetException, DataSetMeta
 
 
@@ -36,16 +36,21 @@ class H5Reader(object):
 
 
 class H5DataSet(DataSet):
-    def __init__(self, path, ds_path, tileshape,
+    def __init__(self, path, ds_path, tileshape=None,
                  target_size=512*1024*1024, min_num_partitions=None, sig_dims=2):
         self.path = path
         self.ds_path = ds_path
         self.target_size = target_size
         self.sig_dims = sig_dims
-        self.tileshape = Shape(tileshape, sig_dims=self.sig_dims)
+        # if no tileshape is given, it is chosen per partition and consumer,
+        # aligned to the chunks of the HDF5 dataset:
+        if tileshape is not None:
+            tileshape = Shape(tileshape, sig_dims=self.sig_dims)
+        self.tileshape = tileshape
         self.min_num_partitions = min_num_partitions
         self._dtype = None
         self._raw_shape = None
+        self._chunks = None
 
     def get_reader(self):
         return H5Reader(
@@ -57,6 +62,7 @@ class H5DataSet(DataSet):
         with self.get_reader().get_h5ds() as h5ds:
             self._dtype = h5ds.dtype
             self._raw_shape = Shape(h5ds.shape, sig_dims=self.sig_dims)
+            self._chunks = h5ds.chunks
             self._meta = DataSetMeta(
                 shape=self.shape,
                 raw_shape=self._raw_shape,
@@ -135,9 +141,9 @@ class H5DataSet(DataSet):
             min_num_partitions=self.min_num_partitions,
         )
         for pslice in ds_slice.subslices(partition_shape):
-            # TODO: where should the tileshape be set? let the user choose for now
             yield H5Partition(
                 tileshape=self.tileshape,
+                chunks=self._chunks,
                 meta=self._meta,
                 reader=self.get_reader(),
                 partition_slice=pslice,
@@ -148,36 +154,36 @@ class H5DataSet(DataSet):
 
 
 class H5Partition(Partition):
-    def __init__(self, tileshape, reader, *args, **kwargs):
+    def __init__(self, tileshape, reader, *args, chunks=None, **kwargs):
         self.tileshape = tileshape
+        self.chunks = chunks
         self.reader = reader
         super().__init__(*args, **kwargs)
 
-    def get_tiles(self, crop_to=None, full_frames=False):
+    def get_tiles(self, crop_to=None, full_frames=False, consumer=None):
         if crop_to is not None:
             if crop_to.shape.sig != self.meta.shape.sig:
                 raise DataSetException("H5DataSet only supports whole-frame crops for now")
-        if full_frames:
-            tileshape = (
-                tuple(self.tileshape[:self.meta.shape.nav.dims]) + tuple(self.meta.shape.sig)
-            )
-        else:
-            tileshape = self.tileshape
-        data = np.ndarray(tileshape, dtype=self.dtype)
-        with self.reader.get_h5ds() as dataset:
+        tileshape = self.get_tileshape(
+            self.tileshape, full_frames=full_frames, consumer=consumer, chunks=self.chunks
+        )
+        with self.reader.get_h5ds() as dataset, \
+                tile_buffer_pool.buffer(tileshape, dtype=self.dtype) as data:
             subslices = list(self.slice.subslices(shape=tileshape))
             for tile_slice in subslices:
                 if crop_to is not None:
                     intersection = tile_slice.intersection_with(crop_to)
                     if intersection.is_null():
                         continue
+                    # only read the frames inside of the crop:
+                    tile_slice = intersection
                 if tile_slice.shape != tileshape:
-                    # at the border, can't reuse buffer
-                    # hmm. aren't there only like 3 different shapes at the border?
-                    # FIXME: use buffer pool to reuse buffers of same shape
-                    border_data = np.ndarray(tile_slice.shape, dtype=self.dtype)
-                    dataset.read_direct(border_data, source_sel=tile_slice.get())
-                    yield DataTile(data=border_data, tile_slice=tile_slice)
+                    # at the border, can't reuse buffer, get one of the right shape from the pool
+                    # (it is returned once the consumer continues with the next tile):
+                    shape = tuple(tile_slice.shape)
+                    with tile_buffer_pool.buffer(shape, dtype=self.dtype) as border_data:
+                        dataset.read_direct(border_data, source_sel=tile_slice.get())
+                        yield DataTile(data=border_data, tile_slice=tile_slice)
                 else:
                     # reuse buffer
                     dataset.read_direct(data, source_sel=tile_slice.get())
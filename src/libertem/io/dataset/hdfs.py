@@ -32,7 +32,7 @@ class HDFSReader(object):
 
 
 class BinaryHDFSDataSet(DataSet):
-    def __init__(self, index_path, host, port, tileshape, worker_map=None):
+    def __init__(self, index_path, host, port, tileshape=None, worker_map=None):
         self.index_path = index_path
         self.dirname = os.path.dirname(index_path)
         self.host = host
@@ -98,6 +98,18 @@ class BinaryHDFSDataSet(DataSet):
         return "<BinaryHDFSDataSet %s>" % self.index_path
 
 
+def _is_contiguous(part_slice, nav_shape):
+    """
+    If the frames of ``part_slice`` are stored one after another in a partition
+    with ``nav_shape``
+    """
+    nav_dims = len(nav_shape)
+    origin = part_slice.origin[:nav_dims]
+    last = [o + s - 1 for o, s in zip(origin, part_slice.shape.nav)]
+    first = np.ravel_multi_index(origin, nav_shape)
+    return np.ravel_multi_index(last, nav_shape) - first + 1 == part_slice.shape.nav.size
+
+
 class BinaryHDFSPartition(Partition):
     """
     Store your DataSet as a bunch of binary files (see ingest prototype for format)
@@ -110,18 +122,33 @@ class BinaryHDFSPartition(Partition):
         self._reader = reader
         super().__init__(*args, **kwargs)
 
-    def get_tiles(self, crop_to=None):
+    def get_tiles(self, crop_to=None, full_frames=False, consumer=None):
         if crop_to is not None:
             if crop_to.shape.sig != self.meta.shape.sig:
                 raise DataSetException("BinaryHDFSDataSet only supports whole-frame crops for now")
-        data = np.ndarray(self.tileshape, dtype=self.dtype)
-        subslices = list(self.slice.subslices(shape=self.tileshape))
+        tileshape = self.tileshape
+        if tileshape is None:
+            # tiles are read sequentially from the file, so they must consist of whole frames:
+            tileshape = self.get_tileshape(None, full_frames=True, consumer=consumer)
+        buf = np.ndarray(tileshape, dtype=self.dtype).reshape((-1,))
+        subslices = list(self.slice.subslices(shape=tileshape))
+        nav_shape = tuple(self.shape.nav)
+        framesize = self.meta.shape.sig.size * self.dtype.itemsize
         with self._reader.get_fs().open(self.path, 'rb') as f:
             for tile_slice in subslices:
                 if crop_to is not None:
                     intersection = tile_slice.intersection_with(crop_to)
                     if intersection.is_null():
                         continue
+                    # only read the frames inside of the crop, if they are
+                    # stored one after another:
+                    if _is_contiguous(intersection.shift(self.slice), nav_shape):
+                        tile_slice = intersection
+                first = np.ravel_multi_index(
+                    tile_slice.shift(self.slice).origin[:len(nav_shape)], nav_shape
+                )
+                f.seek(int(first) * framesize)
+                data = buf[:tile_slice.shape.size].reshape(tuple(tile_slice.shape))
                 f.read(length=data.nbytes, out_buffer=data)
                 yield DataTile(data=data, tile_slice=tile_slice)
 
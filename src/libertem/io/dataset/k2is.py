@@ -2,17 +2,25 @@
 import os
 import re
 import glob
+import hashlib
 import math
 import mmap
+import queue
 import logging
+import threading
 import itertools
 import contextlib
+import collections
+import concurrent.futures
 
 import numpy as np
 import numba
 from ncempy.io import dm
 
 from libertem.common import Slice, Shape
+from libertem.common.buffers import tile_buffer_pool
+from libertem.io.index import get_file_keys, load_index, save_index
+from libertem.io.utils import get_frame_range
 from .base import DataSet, Partition, DataTile, DataSetException, DataSetMeta
 
 log = logging.getLogger(__name__)
@@ -29,8 +37,11 @@ SECTOR_SIZE = (2 * 930, 256)
 
 SHUTTER_ACTIVE_MASK = 0x1
 
+# bump this if the contents of the sync index change:
+SYNC_INDEX_VERSION = 1
 
-@numba.njit
+
+@numba.njit(nogil=True)
 def decode_uint12_le(inp, out):
     """
     decode bytes from bytestring ``inp`` as 12 bit into ``out``
@@ -51,6 +62,131 @@ def decode_uint12_le(inp, out):
         out[i * 2 + 1] = b
 
 
+def _make_decode_stack(parallel):
+    @numba.njit(nogil=True, parallel=parallel)
+    def _decode_stack(inp, out, first_offset, blocks):
+        stackheight = out.shape[1]
+        frame_stride = BLOCK_SIZE * BLOCKS_PER_SECTOR_PER_FRAME
+        # one flat loop over all (block, frame) pairs, so prange can split it up evenly:
+        for idx in numba.prange(len(blocks) * stackheight):
+            blockidx = blocks[idx // stackheight]
+            frame = idx % stackheight
+            start = first_offset + frame * frame_stride + blockidx * BLOCK_SIZE + HEADER_SIZE
+            decode_uint12_le(inp[start:start + DATA_SIZE], out[blockidx, frame])
+    return _decode_stack
+
+
+_decode_stack_serial = _make_decode_stack(parallel=False)
+_decode_stack_parallel = _make_decode_stack(parallel=True)
+
+
+def decode_stack(inp, out, first_offset, blocks, parallel=False):
+    """
+    decode the blocks with indices ``blocks`` of ``out.shape[1]`` consecutive frames
+    of a sector in one call
+
+    Parameters
+    ----------
+    inp : np.ndarray of uint8
+        the raw data of the whole sector file
+    out : np.ndarray
+        of shape (BLOCKS_PER_SECTOR_PER_FRAME, stackheight, 930 * 16); the data of
+        block ``i`` of frame ``j`` of the stack is decoded into ``out[i, j]``
+    first_offset : int
+        offset of the first block of the first frame of the stack in ``inp``
+    blocks : np.ndarray of int
+        indices of the blocks to decode, other parts of ``out`` are left untouched
+    parallel : bool
+        decode using multiple threads
+    """
+    if parallel:
+        _decode_stack_parallel(inp, out, first_offset, blocks)
+    else:
+        _decode_stack_serial(inp, out, first_offset, blocks)
+
+
+@numba.njit(nogil=True)
+def decode_frame(inp, out, first_offset):
+    """
+    decode all blocks of one frame of a sector directly into ``out``,
+    which is a (possibly strided) view of shape (1860, 256)
+    """
+    for blockidx in range(BLOCKS_PER_SECTOR_PER_FRAME):
+        block_x = 256 - (16 * (blockidx % 16 + 1))
+        block_y = 930 * (blockidx // 16)
+        start = first_offset + blockidx * BLOCK_SIZE + HEADER_SIZE
+        block = inp[start:start + DATA_SIZE]
+        for row in range(BLOCK_SHAPE[0]):
+            # 8 pairs of pixels per row of the block:
+            for pair in range(BLOCK_SHAPE[1] // 2):
+                i = row * (BLOCK_SHAPE[1] // 2) + pair
+                fst_uint8 = np.uint16(block[i * 3])
+                mid_uint8 = np.uint16(block[i * 3 + 1])
+                lst_uint8 = np.uint16(block[i * 3 + 2])
+                col = block_x + pair * 2
+                out[block_y + row, col] = fst_uint8 | (mid_uint8 & 0x0F) << 8
+                out[block_y + row, col + 1] = (mid_uint8 & 0xF0) >> 4 | lst_uint8 << 4
+
+
+# read-only mappings of whole sector files, as uint8 arrays, shared by all partitions
+# and jobs in this (worker) process. The least recently used mappings are closed when
+# there are more than _MAX_MAPPINGS, which is enough for the 8 sectors of a few datasets:
+_MAX_MAPPINGS = 32
+_mappings = collections.OrderedDict()
+_mappings_lock = threading.Lock()
+
+
+def _close_mapping(entry):
+    raw_data, arr = entry
+    del arr
+    try:
+        raw_data.close()
+    except BufferError:
+        # someone still has a view of the data; the file is unmapped
+        # once that is garbage collected
+        pass
+
+
+def _get_mapping(key):
+    """
+    Get the mapping for the sector file identified by ``key``, which is a tuple
+    (path, size, mtime), so changed files are mapped again.
+    """
+    with _mappings_lock:
+        mapping = _mappings.get(key)
+        if mapping is not None:
+            _mappings.move_to_end(key)
+            return mapping[1]
+        # mappings of an older version of the same file are never used again:
+        for stale_key in [k for k in _mappings if k[0] == key[0]]:
+            _close_mapping(_mappings.pop(stale_key))
+        while len(_mappings) >= _MAX_MAPPINGS:
+            _close_mapping(_mappings.popitem(last=False)[1])
+        with open(key[0], "rb") as f:
+            # the mapping stays valid after closing the file
+            raw_data = mmap.mmap(
+                fileno=f.fileno(),
+                length=0,   # whole file
+                access=mmap.ACCESS_READ,
+            )
+        mapping = _mappings[key] = (raw_data, np.frombuffer(raw_data, dtype=np.uint8))
+        return mapping[1]
+
+
+def release_mappings(paths=None):
+    """
+    Close the long-lived mappings of the sector files in ``paths``, or all mappings
+    if ``paths`` is None.
+    """
+    with _mappings_lock:
+        keys = [
+            key for key in _mappings
+            if paths is None or key[0] in paths
+        ]
+        for key in keys:
+            _close_mapping(_mappings.pop(key))
+
+
 def _pattern(path):
     path, ext = os.path.splitext(path)
     ext = ext.lower()
@@ -76,6 +212,60 @@ def _get_gtg_path(full_path):
         )
 
 
+def _get_sync_index_paths(paths):
+    """
+    Where the sync index of the dataset with sector files ``paths`` can be stored:
+    next to the sector files as ``.<name>.libertem-sync.json``, or in
+    ``~/.libertem/k2is-sync/`` if that is not writable
+    """
+    first = os.path.abspath(paths[0])
+    dirname, basename = os.path.split(first)
+    base = re.sub(r'[0-9]*\.bin$', '', basename, flags=re.IGNORECASE)
+    key = hashlib.sha1(first.encode("utf8")).hexdigest()
+    return [
+        os.path.join(dirname, ".%s.libertem-sync.json" % base),
+        os.path.join(os.path.expanduser("~"), ".libertem", "k2is-sync", "%s.json" % key),
+    ]
+
+
+def load_sync_index(paths):
+    """
+    Load the result of synchronizing the sectors of a dataset, as stored by
+    `save_sync_index`. The index is only used if all sector files still have the
+    same size and modification time as when it was created.
+
+    Returns
+    -------
+    dict or None
+        with keys "start_offsets" and "num_frames", or None if there is no valid index
+    """
+    index = load_index(
+        _get_sync_index_paths(paths),
+        version=SYNC_INDEX_VERSION,
+        file_keys=get_file_keys(paths),
+    )
+    if index is None:
+        return None
+    return {
+        "start_offsets": [int(o) for o in index["start_offsets"]],
+        "num_frames": int(index["num_frames"]),
+    }
+
+
+def save_sync_index(paths, start_offsets, num_frames):
+    """
+    Persist the offsets of the first block of each sector after synchronization,
+    and the number of complete frames after that, so datasets can be opened again
+    without scanning the block headers.
+    """
+    return save_index(_get_sync_index_paths(paths), {
+        "version": SYNC_INDEX_VERSION,
+        "files": get_file_keys(paths),
+        "start_offsets": [int(o) for o in start_offsets],
+        "num_frames": int(num_frames),
+    })
+
+
 class K2FileSet:
     def __init__(self, paths, start_offsets=None):
         self.paths = paths
@@ -148,16 +338,29 @@ class K2FileSet:
     def first_blocks(self):
         return [next(s.get_blocks()) for s in self.sectors]
 
+    @property
+    def num_frames(self):
+        """
+        number of complete frames after the first block of all sectors
+        """
+        return min(
+            (s.filesize - s.first_block_offset) // (BLOCK_SIZE * BLOCKS_PER_SECTOR_PER_FRAME)
+            for s in self.sectors
+        )
+
     def close(self):
         for s in self.sectors:
             s.close()
+        release_mappings(self.paths)
 
 
 class Sector:
     def __init__(self, fname, idx, initial_offset=0):
         self.fname = fname
         self.idx = idx
-        self.filesize = os.stat(fname).st_size
+        stat = os.stat(fname)
+        self.filesize = stat.st_size
+        self._mapping_key = (fname, stat.st_size, stat.st_mtime_ns)
         self.first_block_offset = initial_offset
         # FIXME: hardcoded sig_dims
         self.sig_dims = 2
@@ -169,6 +372,14 @@ class Sector:
         self.f.close()
         self.f = None
 
+    def get_mapping(self):
+        """
+        The data of the whole sector file, as a uint8 array, backed by a
+        read-only mapping of the file that is shared by all partitions and
+        jobs in this process. See also `release_mappings`.
+        """
+        return _get_mapping(self._mapping_key)
+
     def seek(self, pos):
         self.f.seek(pos)
 
@@ -192,106 +403,113 @@ class Sector:
             yield DataBlock(offset=offset, sector=self)
             offset += BLOCK_SIZE
 
-    def read_full_frame(self, frame, buf, dtype="float32", crop_to=None):
-        raw_data = mmap.mmap(
-            fileno=self.f.fileno(),
-            length=0,   # whole file
-            access=mmap.ACCESS_READ,
+    def read_full_frame(self, frame, buf):
+        """
+        decode all blocks of ``frame`` directly into ``buf``, which is of shape (1, 1860, 256),
+        converting the pixels to the dtype of ``buf``
+        """
+        offset = (
+            self.first_block_offset
+            + frame * BLOCK_SIZE * BLOCKS_PER_SECTOR_PER_FRAME
         )
-        # FIXME: can we somehow get rid of this buffer?
-        block_buf = np.zeros(BLOCK_SHAPE, dtype=dtype).reshape((-1,))
-        for blockidx in range(BLOCKS_PER_SECTOR_PER_FRAME):
-            offset = (
-                self.first_block_offset
-                + frame * BLOCK_SIZE * BLOCKS_PER_SECTOR_PER_FRAME
-                + blockidx * BLOCK_SIZE
-            )
-            input_start = offset + HEADER_SIZE
-            input_end = offset + HEADER_SIZE + DATA_SIZE
-            block_x = 256 - (16 * (blockidx % 16 + 1))
-            block_y = 930 * (blockidx // 16)
-            decode_uint12_le(
-                inp=raw_data[input_start:input_end],
-                out=block_buf,
-            )
-            buf[:,
-                block_y:(block_y + BLOCK_SHAPE[0]),
-                block_x:(block_x + BLOCK_SHAPE[1])] = block_buf.reshape((1,) + BLOCK_SHAPE)
+        decode_frame(inp=self.get_mapping(), out=buf[0], first_offset=offset)
 
     def read_stacked(self, start_at_frame, num_frames, stackheight=16,
-                     dtype="float32", crop_to=None):
+                     dtype="float32", crop_to=None, parallel=False):
         """
         Reads `stackheight` blocks into a single buffer.
         The blocks are read from consecutive frames, always
         from the same coordinates inside the sector of the frame.
 
+        All blocks of the sector for `stackheight` frames are decoded at once,
+        optionally using multiple threads (`parallel`).
+
         yields DataTiles of the shape (stackheight, 930, 16)
         (different tiles at the borders may be yielded if the stackheight doesn't evenly divide
         the total number of frames to read)
         """
+        for tiles in self.read_stacks(start_at_frame=start_at_frame, num_frames=num_frames,
+                                      stackheight=stackheight, dtype=dtype, crop_to=crop_to,
+                                      parallel=parallel):
+            yield from tiles
+
+    def read_stacks(self, start_at_frame, num_frames, stackheight=16,
+                    dtype="float32", crop_to=None, parallel=False):
+        """
+        Like `read_stacked`, but yields the tiles of each stack together, as a list.
+        The data of the tiles is only valid until the next list is requested.
+        """
+        # only the frames inside of the crop are decoded:
+        start_at_frame, stop = get_frame_range(start_at_frame, num_frames, crop_to)
+        num_frames = stop - start_at_frame
         tileshape = (
             stackheight,
         ) + BLOCK_SHAPE
-        raw_data = mmap.mmap(
-            fileno=self.f.fileno(),
-            length=0,   # whole file
-            access=mmap.ACCESS_READ,
-        )
+        inp = self.get_mapping()
 
-        tile_buf_full = np.zeros(tileshape, dtype=dtype)
+        stack_buf_full = tile_buffer_pool.get(
+            (BLOCKS_PER_SECTOR_PER_FRAME, stackheight, BLOCK_SHAPE[0] * BLOCK_SHAPE[1]),
+            dtype=dtype,
+        )
         assert DATA_SIZE % 3 == 0
         log.debug("starting read_stacked with start_at_frame=%d, num_frames=%d, stackheight=%d",
                   start_at_frame, num_frames, stackheight)
-        for outer_frame in range(start_at_frame, start_at_frame + num_frames, stackheight):
-            # log.debug("outer_frame=%d", outer_frame)
-            # end of the selected frame range, calculate rest of stack:
-            if start_at_frame + num_frames - outer_frame < stackheight:
-                end_frame = start_at_frame + num_frames
-                current_stackheight = end_frame - outer_frame
-                current_tileshape = (
-                    current_stackheight,
-                ) + BLOCK_SHAPE
-                tile_buf = np.zeros(current_tileshape, dtype=dtype)
-            else:
-                current_stackheight = stackheight
-                current_tileshape = tileshape
-                tile_buf = tile_buf_full
-            for blockidx in range(BLOCKS_PER_SECTOR_PER_FRAME):
-                start_x = (self.idx + 1) * 256 - (16 * (blockidx % 16 + 1))
-                start_y = 930 * (blockidx // 16)
-                tile_slice = Slice(
-                    origin=(
-                        outer_frame,
-                        start_y,
-                        start_x,
-                    ),
-                    shape=Shape(current_tileshape, sig_dims=self.sig_dims),
-                )
-                if crop_to is not None:
-                    intersection = tile_slice.intersection_with(crop_to)
-                    if intersection.is_null():
-                        continue
+        try:
+            for outer_frame in range(start_at_frame, start_at_frame + num_frames, stackheight):
+                # log.debug("outer_frame=%d", outer_frame)
+                # end of the selected frame range, calculate rest of stack:
+                if start_at_frame + num_frames - outer_frame < stackheight:
+                    end_frame = start_at_frame + num_frames
+                    current_stackheight = end_frame - outer_frame
+                    current_tileshape = (
+                        current_stackheight,
+                    ) + BLOCK_SHAPE
+                    stack_buf = stack_buf_full[:, :current_stackheight]
+                else:
+                    current_stackheight = stackheight
+                    current_tileshape = tileshape
+                    stack_buf = stack_buf_full
+                blocks = []
+                tile_slices = []
+                for blockidx in range(BLOCKS_PER_SECTOR_PER_FRAME):
+                    start_x = (self.idx + 1) * 256 - (16 * (blockidx % 16 + 1))
+                    start_y = 930 * (blockidx // 16)
+                    tile_slice = Slice(
+                        origin=(
+                            outer_frame,
+                            start_y,
+                            start_x,
+                        ),
+                        shape=Shape(current_tileshape, sig_dims=self.sig_dims),
+                    )
+                    if crop_to is not None:
+                        intersection = tile_slice.intersection_with(crop_to)
+                        if intersection.is_null():
+                            continue
+                    blocks.append(blockidx)
+                    tile_slices.append(tile_slice)
+                if not blocks:
+                    continue
                 offset = (
                     self.first_block_offset
                     + outer_frame * BLOCK_SIZE * BLOCKS_PER_SECTOR_PER_FRAME
-                    + blockidx * BLOCK_SIZE
                 )
-                for frame in range(current_stackheight):
-                    block_offset = (
-                        offset + frame * BLOCK_SIZE * BLOCKS_PER_SECTOR_PER_FRAME
-                    )
-                    input_start = block_offset + HEADER_SIZE
-                    input_end = block_offset + HEADER_SIZE + DATA_SIZE
-                    out = tile_buf[frame].reshape((-1,))
-                    decode_uint12_le(
-                        inp=raw_data[input_start:input_end],
-                        out=out,
-                    )
-                yield DataTile(
-                    data=tile_buf,
-                    tile_slice=tile_slice
+                decode_stack(
+                    inp=inp,
+                    out=stack_buf,
+                    first_offset=offset,
+                    blocks=np.array(blocks, dtype=np.int64),
+                    parallel=parallel,
                 )
-        raw_data.close()
+                yield [
+                    DataTile(
+                        data=stack_buf[blockidx].reshape(current_tileshape),
+                        tile_slice=tile_slice
+                    )
+                    for blockidx, tile_slice in zip(blocks, tile_slices)
+                ]
+        finally:
+            tile_buffer_pool.put(stack_buf_full)
 
     def set_first_block_offset(self, offset):
         self.first_block_offset = offset
@@ -431,8 +649,18 @@ class DataBlock:
 
 
 class K2ISDataSet(DataSet):
-    def __init__(self, path):
+    def __init__(self, path, num_threads=1):
+        """
+        Parameters
+        ----------
+        path : str
+            path to the .gtg file or one of the .bin files of the dataset
+        num_threads : int
+            number of threads that read and decode the sectors of a partition
+            concurrently, see `K2ISPartition`
+        """
         self._path = path
+        self._num_threads = num_threads
         self._start_offsets = None
         # NOTE: the sync flag appears to be set one frame too late, so
         # we compensate here by setting a negative _skip_frames value.
@@ -503,8 +731,9 @@ class K2ISDataSet(DataSet):
 
     def check_valid(self):
         try:
-            fs = self._get_fileset()
-            fs.sync()
+            sync_result = self._get_sync_result()
+            fs = K2FileSet(self._files, start_offsets=sync_result["start_offsets"])
+            fs.validate_sync()
         except Exception as e:
             raise DataSetException("failed to load dataset: %s" % e) from e
         return True
@@ -525,6 +754,9 @@ class K2ISDataSet(DataSet):
             {"name": "est. number of frames (from first sector)",
              "value": str(est_num_frames)},
 
+            {"name": "number of complete frames after sync",
+             "value": str(self._get_sync_result()["num_frames"])},
+
             {"name": "first frame id after sync, (from first sector)",
              "value": str(first_block.header['frame_id'])},
 
@@ -543,47 +775,45 @@ class K2ISDataSet(DataSet):
             ))
         return list(sorted(files))
 
-    def _cache_first_block_offsets(self, fs):
-        self._start_offsets = [
-            s.first_block_offset
-            for s in fs.sectors
-        ]
+    def _get_sync_result(self):
+        """
+        Synchronize the sectors, or load the result of an earlier synchronization
+        from the sync index, if the files didn't change in between.
+        """
+        sync_result = load_sync_index(self._files)
+        if sync_result is not None:
+            return sync_result
+        fs = K2FileSet(self._files)
+        fs.sync()
+        sync_result = {
+            "start_offsets": [s.first_block_offset for s in fs.sectors],
+            "num_frames": fs.num_frames,
+        }
+        save_sync_index(self._files, **sync_result)
+        return sync_result
+
+    def _cache_first_block_offsets(self, start_offsets):
         # apply skip_frames value to the start_offsets
         self._start_offsets = [o + BLOCK_SIZE*self._skip_frames*32
-                               for o in self._start_offsets]
+                               for o in start_offsets]
 
     def _get_fileset(self, with_sync=True):
         if not with_sync:
             return K2FileSet(self._files)
         if self._start_offsets is None:
-            fs = K2FileSet(self._files)
-            fs.sync()
-            self._cache_first_block_offsets(fs)
-        else:
-            fs = K2FileSet(self._files, start_offsets=self._start_offsets)
-        return fs
-
-    def _get_num_partitions(self):
-        """
-        returns the number of partitions the dataset should be split into
-        """
-        size = sum(sector.filesize
-                   for sector in self._fileset.sectors)
-        # let's try to aim for 512MB per partition
-        res = max(1, size // (512*1024*1024))
-        return res
+            self._cache_first_block_offsets(self._get_sync_result()["start_offsets"])
+        return K2FileSet(self._files, start_offsets=self._start_offsets)
 
     def get_partitions(self):
         fs = self._fileset
         num_frames = self.shape.nav.size
-        f_per_part = num_frames // self._get_num_partitions()
-
-        c0 = itertools.count(start=0, step=f_per_part)
-        c1 = itertools.count(start=f_per_part, step=f_per_part)
-        for (start, stop) in zip(c0, c1):
-            if start >= num_frames:
-                break
-            stop = min(stop, num_frames)
+        ranges = self.partition_ranges(
+            num_frames=num_frames,
+            framesize=self.shape.sig.size,
+            dtype=self.dtype,
+            target_size=512*1024*1024,
+        )
+        for (start, stop) in ranges:
             part_slice = Slice(
                 origin=(
                     start, 0, 0,
@@ -597,6 +827,7 @@ class K2ISDataSet(DataSet):
                 sectors=fs.sectors,
                 start_frame=start,
                 num_frames=stop - start,
+                num_threads=self._num_threads,
             )
 
     def __repr__(self):
@@ -606,13 +837,20 @@ class K2ISDataSet(DataSet):
 
 
 class K2ISPartition(Partition):
-    def __init__(self, sectors, start_frame, num_frames, *args, **kwargs):
+    """
+    Reads the sectors of the partition one after another, or, if ``num_threads`` is
+    larger than one, reads and decodes up to ``num_threads`` sectors concurrently.
+    The decoder releases the GIL, so this can make use of fast storage and multiple
+    cores. Tiles are then yielded in the order the sectors finish decoding them.
+    """
+    def __init__(self, sectors, start_frame, num_frames, *args, num_threads=1, **kwargs):
         self._sectors = sectors
         self._start_frame = start_frame
         self._num_frames = num_frames
+        self._num_threads = num_threads
         super().__init__(*args, **kwargs)
 
-    def get_tiles(self, crop_to=None, full_frames=False):
+    def get_tiles(self, crop_to=None, full_frames=False, consumer=None):
         if full_frames:
             yield from self._read_full_frames(crop_to=crop_to)
         else:
@@ -620,20 +858,18 @@ class K2ISPartition(Partition):
 
     def _read_full_frames(self, crop_to=None):
         with contextlib.ExitStack() as stack:
-            frame_buf = np.zeros((1, 1860, 2048), dtype="float32")
+            frame_buf = stack.enter_context(
+                tile_buffer_pool.buffer((1, 1860, 2048), dtype="float32")
+            )
             open_sectors = [
                 stack.enter_context(sector)
                 for sector in self._sectors
             ]
-            for frame in range(self._start_frame, self._start_frame + self._num_frames):
+            for frame in range(*get_frame_range(self._start_frame, self._num_frames, crop_to)):
                 tile_slice = Slice(
                     origin=(frame, 0, 0),
                     shape=Shape(frame_buf.shape, sig_dims=2),
                 )
-                if crop_to is not None:
-                    intersection = tile_slice.intersection_with(crop_to)
-                    if intersection.is_null():
-                        continue
                 for s in open_sectors:
                     s.read_full_frame(
                         frame=frame,
@@ -645,6 +881,9 @@ class K2ISPartition(Partition):
                 )
 
     def _read_stacked(self, crop_to=None):
+        if self._num_threads > 1:
+            yield from self._read_stacked_threaded(crop_to=crop_to)
+            return
         for sector in self._sectors:
             with sector as s:
                 yield from s.read_stacked(
@@ -653,6 +892,59 @@ class K2ISPartition(Partition):
                     crop_to=crop_to,
                 )
 
+    def _read_stacked_threaded(self, crop_to=None):
+        # each sector is read by one thread, which hands over the tiles of a stack and
+        # waits until they were consumed before decoding the next stack into its buffer:
+        stacks = queue.Queue()
+        cancelled = threading.Event()
+
+        def _read_sector(sector):
+            try:
+                with sector as s:
+                    for tiles in s.read_stacks(
+                        start_at_frame=self._start_frame,
+                        num_frames=self._num_frames,
+                        crop_to=crop_to,
+                    ):
+                        consumed = threading.Event()
+                        stacks.put((tiles, consumed, None))
+                        consumed.wait()
+                        if cancelled.is_set():
+                            break
+            except Exception as e:
+                stacks.put((None, None, e))
+            else:
+                stacks.put((None, None, None))
+
+        pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self._num_threads, thread_name_prefix="k2is-sector",
+        )
+        remaining = len(self._sectors)
+        try:
+            for sector in self._sectors:
+                pool.submit(_read_sector, sector)
+            while remaining > 0:
+                tiles, consumed, exc = stacks.get()
+                if tiles is None:
+                    remaining -= 1
+                    if exc is not None:
+                        raise exc
+                    continue
+                try:
+                    yield from tiles
+                finally:
+                    consumed.set()
+        finally:
+            # stop the other threads, if we stopped early or one of them failed:
+            cancelled.set()
+            while remaining > 0:
+                tiles, consumed, exc = stacks.get()
+                if tiles is None:
+                    remaining -= 1
+                else:
+                    consumed.set()
+            pool.shutdown(wait=True)
+
     def __repr__(self):
         return "<K2ISPartition: start_frame=%d, num_frames=%d>" % (
             self._start_frame, self._num_frames,
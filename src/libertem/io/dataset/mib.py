@@ -2,16 +2,125 @@ import re
 import io
 import os
 import glob
+import bisect
 import logging
-import functools
+import collections
+import concurrent.futures
 
 import numpy as np
 
 from libertem.common import Slice, Shape
+from libertem.io.index import get_index_paths, load_index, save_index
+from libertem.io.utils import get_frame_range
 from .base import DataSet, Partition, DataTile, DataSetException, DataSetMeta
 
 log = logging.getLogger(__name__)
 
+# bump this if the contents of the header index change:
+HEADER_INDEX_VERSION = 1
+
+
+def _stat(path):
+    stat = os.stat(path)
+    return {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+    }
+
+
+def _read_header(path):
+    return MIBFile(path).read_header()
+
+
+def _map_threaded(fn, paths, num_threads=None):
+    # opening files has a high latency, especially on network file systems, so we
+    # do it for many files at once:
+    if len(paths) <= 1:
+        return [fn(path) for path in paths]
+    with concurrent.futures.ThreadPoolExecutor(
+            max_workers=num_threads, thread_name_prefix="mib-header") as pool:
+        return list(pool.map(fn, paths))
+
+
+def read_headers(paths, num_threads=None):
+    """
+    Read the headers of the .mib files ``paths`` using ``num_threads`` threads
+
+    Returns
+    -------
+    dict
+        mapping each path to the header fields of the file, see `MIBFile.read_header`
+    """
+    return dict(zip(paths, _map_threaded(_read_header, paths, num_threads)))
+
+
+def _from_json(fields):
+    fields = dict(fields)
+    fields['image_size'] = tuple(fields['image_size'])
+    return fields
+
+
+def scan_headers(prefix, paths, num_threads=None):
+    """
+    Get the header fields of all ``paths``. They are taken from the header index of
+    the dataset for files that didn't change since it was written, and only the
+    headers of the other files are read. The index is then updated.
+
+    The index maps the global frame range of each file, given by the first
+    frame and the number of frames in its header, to the file.
+
+    Parameters
+    ----------
+    prefix : str
+        path that identifies the dataset, see `libertem.io.index.get_index_paths`
+    paths : list of str
+        the .mib files of the dataset
+    num_threads : int or None
+        number of threads used for reading headers
+
+    Returns
+    -------
+    dict
+        mapping each path to the header fields of the file
+    """
+    index_paths = get_index_paths(prefix, "mib-index")
+    stats = dict(zip(paths, _map_threaded(_stat, paths, num_threads)))
+    index = load_index(index_paths, version=HEADER_INDEX_VERSION)
+    headers = {}
+    if index is not None:
+        by_name = {
+            entry["name"]: entry
+            for entry in index["files"]
+        }
+        for path in paths:
+            entry = by_name.get(os.path.basename(path))
+            if entry is None:
+                continue
+            stat = stats[path]
+            if (entry["size"], entry["mtime_ns"]) != (stat["size"], stat["mtime_ns"]):
+                continue
+            headers[path] = _from_json(entry["fields"])
+    missing = [path for path in paths if path not in headers]
+    if missing or index is None or len(index["files"]) != len(paths):
+        log.debug("reading %d .mib headers", len(missing))
+        headers.update(read_headers(missing, num_threads))
+        entries = []
+        for path in paths:
+            fields = headers[path]
+            start = fields['sequence_first_image'] - 1
+            entries.append({
+                "name": os.path.basename(path),
+                "frames": [start, start + fields['num_images']],
+                "fields": fields,
+                **stats[path],
+            })
+        entries.sort(key=lambda entry: entry["frames"][0])
+        save_index(index_paths, {
+            "version": HEADER_INDEX_VERSION,
+            "files": entries,
+        })
+    return headers
+
 
 class MIBFile(object):
     def __init__(self, path, fields=None):
@@ -28,8 +137,9 @@ class MIBFile(object):
         return ">u%d" % num_bytes
 
     def read_header(self):
-        with io.open(file=self.path, mode="r", encoding="ascii") as f:
-            header = f.read(100)
+        # only decode the header, the text decoder would read ahead into the frame data:
+        with io.open(file=self.path, mode="rb") as f:
+            header = f.read(100).decode("ascii")
             filesize = os.fstat(f.fileno()).st_size
         parts = header.split(",")
         image_size = (int(parts[5]), int(parts[4]))
@@ -55,6 +165,25 @@ class MIBFile(object):
             self.read_header()
         return self._fields
 
+    def get_mmap(self):
+        """
+        All frames of the file, as a strided view into a read-only memory map,
+        of shape (num_frames, pixels_y, pixels_x). The headers between the frames
+        are skipped by the stride of the first axis.
+        """
+        bpp = self.fields['bytes_per_pixel']
+        hsize = self.fields['header_size_bytes']
+        assert hsize % bpp == 0
+        num = self.fields['num_images']
+        size_px = self.fields['image_size'][0] * self.fields['image_size'][1]
+        # (num_frames, pixels) incl. header
+        mapped = np.memmap(self.path, dtype=self.fields['dtype'], mode='r',
+                           shape=(num, size_px + hsize // bpp))
+        # cut off headers
+        mapped = mapped[:, (hsize // bpp):]
+        # reshape to (num_frames, pixels_y, pixels_x)
+        return mapped.reshape((num, self.fields['image_size'][0], self.fields['image_size'][1]))
+
     def _frames(self, num, offset):
         """
         read frames as views into the memmapped file
@@ -67,23 +196,7 @@ class MIBFile(object):
         offset : int
             index of first frame to read (number of frames to skip)
         """
-        bpp = self.fields['bytes_per_pixel']
-        hsize = self.fields['header_size_bytes']
-        assert hsize % bpp == 0
-        size_px = self.fields['image_size'][0] * self.fields['image_size'][1]
-        size = size_px * bpp  # bytes
-        imagesize_incl_header = size + hsize  # bytes
-        mapped = np.memmap(self.path, dtype=self.fields['dtype'], mode='r',
-                           offset=offset * imagesize_incl_header)
-
-        # limit to number of frames to read
-        mapped = mapped[:num * (size_px + hsize // bpp)]
-        # reshape (num_frames, pixels) incl. header
-        mapped = mapped.reshape((num, size_px + hsize // bpp))
-        # cut off headers
-        mapped = mapped[:, (hsize // bpp):]
-        # reshape to (num_frames, pixels_y, pixels_x)
-        return mapped.reshape((num, self.fields['image_size'][0], self.fields['image_size'][1]))
+        return self.get_mmap()[offset:offset + num]
 
     def read_frames(self, num, offset, out, crop_to):
         """
@@ -108,11 +221,138 @@ class MIBFile(object):
         return out
 
 
+class MIBFileSet(object):
+    # how many memory maps are kept open at once; datasets can consist of many
+    # thousands of files, and each map keeps a file descriptor open:
+    max_open_maps = 16
+
+    def __init__(self, files):
+        """
+        The files of a dataset, or a part of it, that can be read as one
+        sequence of frames.
+
+        Parameters
+        ----------
+        files : list of MIBFile
+            sorted by the index of their first frame
+        """
+        self._files = files
+        self._maps = collections.OrderedDict()
+        self._starts = [f.fields['sequence_first_image'] - 1 for f in files]
+        self._contiguous = all(
+            start + f.fields['num_images'] == next_start
+            for f, start, next_start in zip(files, self._starts, self._starts[1:])
+        )
+        self._end = 0
+        if files:
+            self._end = self._starts[-1] + files[-1].fields['num_images']
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['_maps'] = collections.OrderedDict()
+        return state
+
+    def _get_mmap(self, f):
+        """
+        the frames of ``f``, from a memory map that is re-used by later calls
+        until ``close`` is called, or until too many other files were mapped
+        """
+        mapped = self._maps.get(f.path)
+        if mapped is None:
+            mapped = self._maps[f.path] = f.get_mmap()
+            while len(self._maps) > self.max_open_maps:
+                self._maps.popitem(last=False)
+        else:
+            self._maps.move_to_end(f.path)
+        return mapped
+
+    def close(self):
+        """
+        drop the memory maps, views that were returned by `get_view` stay valid
+        """
+        self._maps.clear()
+
+    def _find_file(self, start):
+        idx = bisect.bisect_right(self._starts, start) - 1
+        return max(0, idx)
+
+    def get_view(self, start, stop, dtype, crop_to=None):
+        """
+        The frames [`start`, `stop`) as a view into the memory map of the file,
+        without copying, if they are all in one file that has ``dtype``
+
+        Returns
+        -------
+        numpy.ndarray or None
+            None if the frames need to be copied using `read_images`
+        """
+        if not self._files:
+            return None
+        idx = self._find_file(start)
+        f, f_start = self._files[idx], self._starts[idx]
+        if start < f_start or stop > f_start + f.fields['num_images']:
+            return None
+        if np.dtype(f.fields['dtype']) != np.dtype(dtype):
+            return None
+        frames = self._get_mmap(f)[start - f_start:stop - f_start]
+        if crop_to is not None:
+            frames = frames[(...,) + crop_to.get(sig_only=True)]
+        return frames
+
+    def read_images(self, start, stop, out, crop_to=None):
+        """
+        Read the frames [`start`, `stop`) into `out`, from all files that contain
+        some of them. Frames that are not contained in any file are set to zero.
+
+        Parameters
+        ----------
+        start, stop : int
+            dataset-global frame indices
+        out : buffer
+            output buffer that should fit `stop - start` frames
+        crop_to : Slice
+            crop to the signal part of this Slice
+        """
+        if not self._files or not self._contiguous or start < self._starts[0] or stop > self._end:
+            out[:] = 0
+        idx = self._find_file(start)
+        for f, f_start in zip(self._files[idx:], self._starts[idx:]):
+            if f_start >= stop:
+                break
+            f_end = f_start + f.fields['num_images']
+            if f_end <= start:
+                continue
+            read_start = max(start, f_start)
+            read_stop = min(stop, f_end)
+            frames = self._get_mmap(f)[read_start - f_start:read_stop - f_start]
+            if crop_to is not None:
+                frames = frames[(...,) + crop_to.get(sig_only=True)]
+            out[read_start - start:read_stop - start] = frames
+        return out
+
+
 class MIBDataSet(DataSet):
-    def __init__(self, path, tileshape, scan_size):
+    def __init__(self, path, tileshape=None, scan_size=None, num_threads=None):
+        """
+        Parameters
+        ----------
+        path : str
+            path to one of the .mib files, or the .hdr file, of the dataset
+        tileshape : tuple of int or None
+            shape of the tiles to read, by default chosen for each partition and consumer
+        scan_size : tuple of int
+            the scan size, (y, x)
+        num_threads : int or None
+            number of threads for reading the headers of many files at once
+        """
         self._sig_dims = 2
         self._path = path
-        self._tileshape = Shape(tileshape, sig_dims=self._sig_dims)
+        if scan_size is None:
+            raise DataSetException("MIBDataSet needs the scan_size parameter")
+        # if no tileshape is given, it is chosen per partition and consumer:
+        if tileshape is not None:
+            tileshape = Shape(tileshape, sig_dims=self._sig_dims)
+        self._tileshape = tileshape
         self._scan_size = tuple(scan_size)
         self._filename_cache = None
         self._files_sorted = None
@@ -121,6 +361,7 @@ class MIBDataSet(DataSet):
         # before calling _preread_headers!
         self._headers = {}
         self._meta = None
+        self._num_threads = num_threads
 
     def initialize(self):
         self._headers = self._preread_headers()
@@ -151,25 +392,23 @@ class MIBDataSet(DataSet):
         return False
 
     def _preread_headers(self):
-        res = {}
-        for f in self._files():
-            res[f.path] = f.fields
-        return res
+        return scan_headers(self._prefix(), self._filenames(), num_threads=self._num_threads)
 
-    def _filenames(self):
-        if self._filename_cache is not None:
-            return self._filename_cache
+    def _prefix(self):
         path, ext = os.path.splitext(self._path)
         ext = ext.lower()
         if ext == '.mib':
-            pattern = "%s*.mib" % (
-                re.sub(r'[0-9]+$', '', path)
-            )
+            return re.sub(r'[0-9]+$', '', path)
         elif ext == '.hdr':
-            pattern = "%s*.mib" % path
+            return path
         else:
             raise DataSetException("unknown extension")
-        fns = glob.glob(pattern)
+
+    def _filenames(self):
+        if self._filename_cache is not None:
+            return self._filename_cache
+        pattern = "%s*.mib" % self._prefix()
+        fns = list(sorted(glob.glob(pattern)))
         self._filename_cache = fns
         return fns
 
@@ -208,16 +447,17 @@ class MIBDataSet(DataSet):
                         s, num_images
                     )
                 )
-            if self._tileshape.sig != self.raw_shape.sig:
-                raise DataSetException(
-                    "MIB only supports tileshapes that match whole frames, %r != %r" % (
-                        self._tileshape.sig, self.raw_shape.sig
+            if self._tileshape is not None:
+                if self._tileshape.sig != self.raw_shape.sig:
+                    raise DataSetException(
+                        "MIB only supports tileshapes that match whole frames, %r != %r" % (
+                            self._tileshape.sig, self.raw_shape.sig
+                        )
+                    )
+                if self._tileshape[0] != 1:
+                    raise DataSetException(
+                        "MIB only supports tileshapes that don't cross rows"
                     )
-                )
-            if self._tileshape[0] != 1:
-                raise DataSetException(
-                    "MIB only supports tileshapes that don't cross rows"
-                )
             # FIXME: this should not generally be required!
             """
             for f in self._files():
@@ -231,24 +471,32 @@ class MIBDataSet(DataSet):
 
     def get_partitions(self):
         """
-        we keep it simple: one MIB file == one partition
+        Partitions are ranges of frames, independent of how the frames are
+        split up into files, so many small files can be read by one partition.
         """
-
-        @functools.lru_cache(maxsize=None)
-        def pshape_for_length(length):
-            return Shape((length,) + tuple(self.raw_shape.sig), sig_dims=self._sig_dims)
-
-        for f in self._files_sorted:
-            idx = f.fields['sequence_first_image'] - 1
-            length = f.fields['num_images']
-
-            pshape = pshape_for_length(length)
-            pslice = Slice(origin=(idx, 0, 0), shape=pshape)
-
+        num_frames = self.raw_shape.nav.size
+        ranges = self.partition_ranges(
+            num_frames=num_frames,
+            framesize=self.raw_shape.sig.size,
+            dtype=self.dtype,
+            target_size=512*1024*1024,
+        )
+        starts = [f.fields['sequence_first_image'] - 1 for f in self._files_sorted]
+        for (start, stop) in ranges:
+            # only pass on the files the partition needs:
+            first = max(0, bisect.bisect_right(starts, start) - 1)
+            last = bisect.bisect_left(starts, stop)
+            pslice = Slice(
+                origin=(start, 0, 0),
+                shape=Shape((stop - start,) + tuple(self.raw_shape.sig),
+                            sig_dims=self._sig_dims),
+            )
             yield MIBPartition(
                 tileshape=self._tileshape,
                 meta=self._meta,
-                partfile=f,
+                fileset=MIBFileSet(self._files_sorted[first:last]),
+                start_frame=start,
+                num_frames=stop - start,
                 partition_slice=pslice,
             )
 
@@ -257,39 +505,58 @@ class MIBDataSet(DataSet):
 
 
 class MIBPartition(Partition):
-    def __init__(self, tileshape, partfile, *args, **kwargs):
+    def __init__(self, tileshape, fileset, start_frame, num_frames, *args, **kwargs):
         self.tileshape = tileshape
-        self.partfile = partfile
+        self._fileset = fileset
+        self._start_frame = start_frame
+        self._num_frames = num_frames
         super().__init__(*args, **kwargs)
         assert all(s > 0 for s in self.shape), "invalid shape (%r)" % (self.shape,)
 
-    def get_tiles(self, crop_to=None, full_frames=False):
-        stackheight = self.tileshape.nav.size
-
-        num_tiles = self.partfile.fields['num_images'] // stackheight
+    def get_tiles(self, crop_to=None, full_frames=False, consumer=None):
+        if self.tileshape is None:
+            # the partition has a flat navigation axis, and frames can't be split:
+            tileshape = self.get_tileshape(None, full_frames=True, consumer=consumer)
+        else:
+            tileshape = self.tileshape
+        stackheight = tileshape.nav.size
 
-        tshape = self.tileshape.flatten_nav()
+        tshape = tileshape.flatten_nav()
         sig_origin = (0, 0)
         if crop_to is not None and tshape.sig != crop_to.shape.sig:
             tshape = Shape(tuple(tshape.nav) + tuple(crop_to.shape.sig), sig_dims=tshape.sig.dims)
             sig_origin = crop_to.origin[1:]
-        data = np.ndarray(tshape, dtype=self.dtype)
-        for t in range(num_tiles):
-            tile_slice = Slice(origin=(t * stackheight + self.slice.origin[0],) + sig_origin,
-                               shape=tshape)
-            if crop_to is not None:
-                intersection = tile_slice.intersection_with(crop_to)
-                if intersection.is_null():
+        # only the frames inside of the crop are read, so each frame is read once,
+        # even if there are many small crops:
+        first, last = get_frame_range(self._start_frame, self._num_frames, crop_to)
+        data = None
+        try:
+            for start in range(first, last, stackheight):
+                stop = min(last, start + stackheight)
+                num = stop - start
+                tile_slice = Slice(
+                    origin=(start,) + sig_origin,
+                    shape=Shape((num,) + tuple(tshape.sig), sig_dims=tshape.sig.dims),
+                )
+                assert all([
+                    item > 0
+                    for item in tile_slice.shift(self.slice).shape
+                ])
+                assert all([
+                    item >= 0
+                    for item in tile_slice.shift(self.slice).origin
+                ])
+                # NOTE: if all frames of the tile are in the same file, the tile is a
+                # strided view into the memory map, which skips the frame headers:
+                view = self._fileset.get_view(start=start, stop=stop,
+                                              dtype=self.dtype, crop_to=crop_to)
+                if view is not None:
+                    yield DataTile(data=view, tile_slice=tile_slice)
                     continue
-            self.partfile.read_frames(num=stackheight, offset=t * stackheight, out=data,
-                                      crop_to=crop_to)
-            assert all([
-                item > 0
-                for item in tile_slice.shift(self.slice).shape
-            ])
-            assert all([
-                item >= 0
-                for item in tile_slice.shift(self.slice).origin
-            ])
-
-            yield DataTile(data=data, tile_slice=tile_slice)
+                if data is None:
+                    data = np.ndarray(tshape, dtype=self.dtype)
+                self._fileset.read_images(start=start, stop=stop, out=data[:num],
+                                          crop_to=crop_to)
+                yield DataTile(data=data[:num], tile_slice=tile_slice)
+        finally:
+            self._fileset.close()
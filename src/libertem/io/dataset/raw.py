@@ -26,11 +26,10 @@ class RawFileDataSet(DataSet):
         self._detector_size_raw = tuple(detector_size_raw)  # example: (130, 128)
         self._detector_size = tuple(crop_detector_to)                # example: (128, 128)
         self._min_num_partitions = None  # FIXME
-        if tileshape is None:
-            # raw files are memory mapped -> works well with large tiles
-            # (actual tiles are then as large as the partitions)
-            tileshape = self._scan_size + self._detector_size
-        self._tileshape = tuple(tileshape)
+        if tileshape is not None:
+            tileshape = tuple(tileshape)
+        # if no tileshape is given, it is chosen per partition and consumer of the tiles:
+        self._tileshape = tileshape
         self._sig_dims = len(self._detector_size)
         self._meta = DataSetMeta(
             shape=Shape(self._scan_size + self._detector_size, sig_dims=self._sig_dims),
@@ -81,7 +80,6 @@ class RawFileDataSet(DataSet):
             min_num_partitions=self._min_num_partitions,
         )
         for pslice in ds_slice.subslices(partition_shape):
-            # TODO: where should the tileshape be set? let the user choose for now
             yield RawFilePartition(
                 tileshape=self._tileshape,
                 meta=self._meta,
@@ -99,16 +97,16 @@ class RawFilePartition(Partition):
         self.reader = reader
         super().__init__(*args, **kwargs)
 
-    def get_tiles(self, crop_to=None, full_frames=False):
+    def get_tiles(self, crop_to=None, full_frames=False, consumer=None):
         if crop_to is not None:
             if crop_to.shape.sig != self.meta.shape.sig:
                 raise DataSetException("RawFileDataSet only supports whole-frame crops for now")
-        if full_frames:
-            tileshape = (
-                tuple(self.tileshape[:self.meta.shape.nav.dims]) + tuple(self.meta.shape.sig)
-            )
-        else:
-            tileshape = self.tileshape
+        tileshape = self.tileshape
+        if tileshape is None and consumer is None:
+            # raw files are memory mapped -> works well with large tiles
+            # (actual tiles are then as large as the partitions)
+            tileshape = self.meta.shape
+        tileshape = self.get_tileshape(tileshape, full_frames=full_frames, consumer=consumer)
         f = self.reader.open_file()
         subslices = list(self.slice.subslices(shape=tileshape))
         for tile_slice in subslices:
@@ -116,6 +114,8 @@ class RawFilePartition(Partition):
                 intersection = tile_slice.intersection_with(crop_to)
                 if intersection.is_null():
                     continue
+                # only read the frames inside of the crop:
+                tile_slice = intersection
             # NOTE: no need to re-use buffer, as there is none (mmap!)
             yield DataTile(
                 data=f[tile_slice.get()],
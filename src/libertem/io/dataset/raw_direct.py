@@ -5,6 +5,7 @@ import os
 import numpy as np
 
 from libertem.common import Slice, Shape
+from libertem.io.utils import get_frame_range
 from .base import DataSet, Partition, DataTile, DataSetException, DataSetMeta
 from libertem.io.direct import open_direct, empty_aligned, readinto_direct
 
@@ -100,24 +101,15 @@ class DirectRawFileDataSet(DataSet):
         except (IOError, OSError, ValueError) as e:
             raise DataSetException("invalid dataset: %s" % e)
 
-    def _get_num_partitions(self):
-        """
-        returns the number of partitions the dataset should be split into
-        """
-        # let's try to aim for 1024MB per partition
-        res = max(1, self._filesize // (1024*1024*1024))
-        return res
-
     def get_partitions(self):
         num_frames = self.shape.nav.size
-        f_per_part = num_frames // self._get_num_partitions()
-
-        c0 = itertools.count(start=0, step=f_per_part)
-        c1 = itertools.count(start=f_per_part, step=f_per_part)
-        for (start, stop) in zip(c0, c1):
-            if start >= num_frames:
-                break
-            stop = min(stop, num_frames)
+        ranges = self.partition_ranges(
+            num_frames=num_frames,
+            framesize=self.shape.sig.size,
+            dtype=self.dtype,
+            target_size=1024*1024*1024,
+        )
+        for (start, stop) in ranges:
             part_slice = Slice(
                 origin=(
                     start, 0, 0,
@@ -146,7 +138,7 @@ class DirectRawFilePartition(Partition):
         self.num_frames = num_frames
         super().__init__(*args, **kwargs)
 
-    def get_tiles(self, crop_to=None, full_frames=False):
+    def get_tiles(self, crop_to=None, full_frames=False, consumer=None):
         # NOTE: full_frames ignored here because we currently only read full frames
         if crop_to is not None:
             if crop_to.shape.sig != self.meta.shape.sig:
@@ -154,12 +146,11 @@ class DirectRawFilePartition(Partition):
                     "DirectRawFileDataSet only supports whole-frame crops for now"
                 )
         stackheight = self.stackheight
-        start_frame = self.start_frame
-        num_frames = self.num_frames
+        # only the frames inside of the crop are read:
+        start_frame, stop = get_frame_range(self.start_frame, self.num_frames, crop_to)
         shape_sig = tuple(self.shape.sig)
         sig_dims = self.shape.sig.dims
         sig_size = self.shape.sig.size
-        stop = start_frame + num_frames
         with self.reader.open_file() as reader:
             buf = reader.get_buffer(stackheight)
             c0 = itertools.count(start=start_frame, step=stackheight)
@@ -176,14 +167,9 @@ class DirectRawFilePartition(Partition):
                     shape=Shape((tile_height,) + shape_sig,
                                 sig_dims=sig_dims)
                 )
-                if crop_to is not None:
-                    intersection = tileslice.intersection_with(crop_to)
-                    if intersection.is_null():
-                        continue
                 reader.seek_frame(tile_start)
-                data = reader.readinto(buf)
-                # at partition boundary we may read more than requested, cut it off:
-                data = data[:tile_height * sig_size]
+                # at the end of the partition or crop, only read the frames of the tile:
+                data = reader.readinto(buf[:tile_height * sig_size])
                 yield DataTile(
                     data=data.reshape((tile_height,) + shape_sig),
                     tile_slice=tileslice
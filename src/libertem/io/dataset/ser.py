@@ -1,13 +1,13 @@
 import os
 import math
 import logging
-import itertools
 import contextlib
 
-import numpy as np
 from ncempy.io.ser import fileSER
 
 from libertem.common import Slice, Shape
+from libertem.common.buffers import tile_buffer_pool
+from libertem.io.utils import get_frame_range
 from .base import DataSet, Partition, DataTile, DataSetException, DataSetMeta
 
 log = logging.getLogger(__name__)
@@ -104,24 +104,15 @@ class SERDataSet(DataSet):
         except (IOError, OSError) as e:
             raise DataSetException("invalid dataset: %s" % e) from e
 
-    def _get_num_partitions(self):
-        """
-        returns the number of partitions the dataset should be split into
-        """
-        # let's try to aim for 512MB per partition
-        res = max(1, self._filesize // (512*1024*1024))
-        return res
-
     def get_partitions(self):
         num_frames = self.shape.nav.size
-        f_per_part = num_frames // self._get_num_partitions()
-
-        c0 = itertools.count(start=0, step=f_per_part)
-        c1 = itertools.count(start=f_per_part, step=f_per_part)
-        for (start, stop) in zip(c0, c1):
-            if start >= num_frames:
-                break
-            stop = min(stop, num_frames)
+        ranges = self.partition_ranges(
+            num_frames=num_frames,
+            framesize=self.shape.sig.size,
+            dtype=self.dtype,
+            target_size=512*1024*1024,
+        )
+        for (start, stop) in ranges:
             part_slice = Slice(
                 origin=(
                     start, 0, 0,
@@ -153,9 +144,10 @@ class SERPartition(Partition):
         framesize = self.meta.shape.sig.size * self.dtype.itemsize
         return min(1, math.floor(target_size / framesize))
 
-    def get_tiles(self, crop_to=None, full_frames=False):
-        start_at_frame = self._start_frame
-        num_frames = self._num_frames
+    def get_tiles(self, crop_to=None, full_frames=False, consumer=None):
+        # only the frames inside of the crop are read:
+        start_at_frame, stop = get_frame_range(self._start_frame, self._num_frames, crop_to)
+        num_frames = stop - start_at_frame
         stackheight = self._get_stackheight()
         dtype = self.dtype
         sig_shape = self.meta.shape.sig
@@ -163,39 +155,42 @@ class SERPartition(Partition):
         if crop_to is not None:
             sig_origin = tuple(crop_to.origin[-sig_shape.dims:])
             sig_shape = crop_to.shape.sig
-        tile_buf_full = np.zeros((stackheight,) + tuple(sig_shape), dtype=dtype)
+        tile_buf_full = tile_buffer_pool.get((stackheight,) + tuple(sig_shape), dtype=dtype)
 
         tileshape = (
             stackheight,
         ) + tuple(sig_shape)
 
-        for outer_frame in range(start_at_frame, start_at_frame + num_frames, stackheight):
-            if start_at_frame + num_frames - outer_frame < stackheight:
-                end_frame = start_at_frame + num_frames
-                current_stackheight = end_frame - outer_frame
-                current_tileshape = (
-                    current_stackheight,
-                ) + tuple(sig_shape)
-                tile_buf = np.zeros(current_tileshape, dtype=dtype)
-            else:
-                current_stackheight = stackheight
-                current_tileshape = tileshape
-                tile_buf = tile_buf_full
-            tile_slice = Slice(
-                origin=(outer_frame,) + sig_origin,
-                shape=Shape(current_tileshape, sig_dims=sig_shape.dims)
-            )
-            if crop_to is not None:
-                intersection = tile_slice.intersection_with(crop_to)
-                if intersection.is_null():
-                    continue
-            self._reader.read_images(
-                start=outer_frame,
-                stop=outer_frame + current_stackheight,
-                out=tile_buf,
-                crop_to=crop_to,
-            )
-            yield DataTile(
-                data=tile_buf,
-                tile_slice=tile_slice
-            )
+        border_buf = None
+        try:
+            for outer_frame in range(start_at_frame, start_at_frame + num_frames, stackheight):
+                if start_at_frame + num_frames - outer_frame < stackheight:
+                    end_frame = start_at_frame + num_frames
+                    current_stackheight = end_frame - outer_frame
+                    current_tileshape = (
+                        current_stackheight,
+                    ) + tuple(sig_shape)
+                    # only the last stack can be smaller:
+                    tile_buf = border_buf = tile_buffer_pool.get(current_tileshape, dtype=dtype)
+                else:
+                    current_stackheight = stackheight
+                    current_tileshape = tileshape
+                    tile_buf = tile_buf_full
+                tile_slice = Slice(
+                    origin=(outer_frame,) + sig_origin,
+                    shape=Shape(current_tileshape, sig_dims=sig_shape.dims)
+                )
+                self._reader.read_images(
+                    start=outer_frame,
+                    stop=outer_frame + current_stackheight,
+                    out=tile_buf,
+                    crop_to=crop_to,
+                )
+                yield DataTile(
+                    data=tile_buf,
+                    tile_slice=tile_slice
+                )
+        finally:
+            tile_buffer_pool.put(tile_buf_full)
+            if border_buf is not None:
+                tile_buffer_pool.put(border_buf)
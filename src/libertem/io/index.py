@@ -0,0 +1,106 @@
+"""
+Persistent indices of datasets, which store metadata that is expensive to compute
+when opening a dataset, like the results of scanning file headers. They are small
+JSON files, stored next to the data, or in the home directory if the directory of
+the data is not writable.
+"""
+import os
+import json
+import hashlib
+import logging
+
+log = logging.getLogger(__name__)
+
+
+def get_index_paths(prefix, kind):
+    """
+    Where the index of ``kind`` can be stored, in order of preference
+
+    Parameters
+    ----------
+    prefix : str
+        path that identifies the dataset, usually the common prefix of its files
+    kind : str
+        what is stored in the index, for example "mib-index"
+
+    Returns
+    -------
+    list of str
+    """
+    prefix = os.path.abspath(prefix)
+    dirname, basename = os.path.split(prefix)
+    key = hashlib.sha1(prefix.encode("utf8")).hexdigest()
+    return [
+        os.path.join(dirname, ".%s.libertem-%s.json" % (basename, kind)),
+        os.path.join(os.path.expanduser("~"), ".libertem", kind, "%s.json" % key),
+    ]
+
+
+def get_file_keys(paths):
+    """
+    The name, size and modification time of each of ``paths``, to find out if
+    an index is still valid for them
+    """
+    keys = []
+    for path in paths:
+        stat = os.stat(path)
+        keys.append({
+            "name": os.path.basename(path),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+        })
+    return keys
+
+
+def load_index(index_paths, version, file_keys=None):
+    """
+    Load the first index from ``index_paths`` that exists and has ``version``.
+    If ``file_keys`` are given, indices that were made for files with other
+    keys (see `get_file_keys`) are skipped, so an outdated index next to the data
+    doesn't hide a valid one in the home directory.
+
+    Returns
+    -------
+    dict or None
+    """
+    for index_path in index_paths:
+        try:
+            with open(index_path) as f:
+                index = json.load(f)
+        except (IOError, OSError, ValueError):
+            continue
+        if index.get("version") != version:
+            continue
+        if file_keys is not None and index.get("files") != file_keys:
+            continue
+        return index
+    return None
+
+
+def save_index(index_paths, index):
+    """
+    Write ``index`` to the first of ``index_paths`` that is writable. Failing to
+    write the index is not an error, it only needs to be computed again.
+
+    Returns
+    -------
+    str or None
+        the path the index was written to
+    """
+    for index_path in index_paths:
+        tmp_path = "%s.%d.tmp" % (index_path, os.getpid())
+        try:
+            os.makedirs(os.path.dirname(index_path), exist_ok=True)
+            with open(tmp_path, "w") as f:
+                json.dump(index, f)
+            os.replace(tmp_path, index_path)
+            return index_path
+        except (IOError, OSError) as e:
+            log.debug("could not write index to %s: %s", index_path, e)
+        finally:
+            # only left over if writing failed:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+    return None
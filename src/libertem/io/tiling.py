@@ -0,0 +1,248 @@
+import os
+import glob
+import json
+import socket
+import functools
+
+import numpy as np
+
+from libertem.common import Shape
+
+# used if the cache sizes can't be read from the system:
+DEFAULT_CACHE_SIZES = {
+    "L2": 256*1024,
+    "L3": 8*1024*1024,
+}
+
+# the consumers we know about. the working set of a mask dot product also contains
+# the masks and the result, so its tiles should only fill a part of the L3 cache.
+# summing frames streams over the tile and accumulates into a single frame, which
+# works best if the tile stays in L2. UDFs work on single frames of full-frame tiles.
+CONSUMERS = ("mask", "sum", "udf")
+
+CALIBRATION_ENV = "LIBERTEM_TILING_CALIBRATION"
+
+
+def _count_cpus(cpu_list):
+    count = 0
+    for part in cpu_list.strip().split(","):
+        if "-" in part:
+            first, last = part.split("-")
+            count += int(last) - int(first) + 1
+        else:
+            count += 1
+    return count
+
+
+def _parse_cache_size(size):
+    units = {"K": 1024, "M": 1024*1024, "G": 1024*1024*1024}
+    size = size.strip()
+    if size[-1] in units:
+        return int(size[:-1]) * units[size[-1]]
+    return int(size)
+
+
+@functools.lru_cache(maxsize=None)
+def get_cache_sizes():
+    """
+    Sizes of the L2 and L3 caches available to a single core, in bytes
+
+    Reads the information for the first CPU from sysfs; where that is not
+    available, :data:`DEFAULT_CACHE_SIZES` are used. Caches that are shared
+    between cores are divided between them, as we run one worker per core.
+
+    Returns
+    -------
+    dict
+        with keys "L2" and "L3"
+    """
+    sizes = dict(DEFAULT_CACHE_SIZES)
+    for path in glob.glob("/sys/devices/system/cpu/cpu0/cache/index*"):
+        try:
+            with open(os.path.join(path, "level")) as f:
+                level = int(f.read())
+            with open(os.path.join(path, "type")) as f:
+                cache_type = f.read().strip()
+            with open(os.path.join(path, "size")) as f:
+                size = _parse_cache_size(f.read())
+            with open(os.path.join(path, "shared_cpu_list")) as f:
+                size //= max(1, _count_cpus(f.read()))
+        except (IOError, OSError, ValueError):
+            continue
+        if cache_type == "Instruction" or level not in (2, 3):
+            continue
+        sizes["L%d" % level] = size
+    return sizes
+
+
+def get_calibration_path():
+    """
+    Where the tiling calibration is stored, can be overridden by setting the
+    ``LIBERTEM_TILING_CALIBRATION`` environment variable
+    """
+    path = os.environ.get(CALIBRATION_ENV)
+    if path:
+        return path
+    return os.path.join(os.path.expanduser("~"), ".libertem", "tiling.json")
+
+
+def load_calibration(path=None, host=None):
+    """
+    Load the tile sizes measured by the calibration benchmark for this host
+
+    Returns
+    -------
+    dict
+        mapping consumer names to target tile sizes in bytes; empty if this host
+        was not calibrated yet
+    """
+    if path is None:
+        path = get_calibration_path()
+    if host is None:
+        host = socket.gethostname()
+    try:
+        with open(path) as f:
+            calibration = json.load(f)
+    except (IOError, OSError, ValueError):
+        return {}
+    return {
+        consumer: int(size)
+        for consumer, size in calibration.get(host, {}).items()
+        if consumer in CONSUMERS
+    }
+
+
+def save_calibration(target_sizes, path=None, host=None):
+    """
+    Persist the tile sizes for this host, keeping those of other hosts that
+    share the same file (for example a home directory on a network file system)
+
+    Parameters
+    ----------
+    target_sizes : dict
+        mapping consumer names to target tile sizes in bytes
+    """
+    if path is None:
+        path = get_calibration_path()
+    if host is None:
+        host = socket.gethostname()
+    try:
+        with open(path) as f:
+            calibration = json.load(f)
+    except (IOError, OSError, ValueError):
+        calibration = {}
+    calibration[host] = {
+        consumer: int(size)
+        for consumer, size in target_sizes.items()
+    }
+    dirname = os.path.dirname(path)
+    if dirname:
+        os.makedirs(dirname, exist_ok=True)
+    tmp_path = "%s.%d.tmp" % (path, os.getpid())
+    with open(tmp_path, "w") as f:
+        json.dump(calibration, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+    _get_calibration.cache_clear()
+
+
+@functools.lru_cache(maxsize=None)
+def _get_calibration():
+    return load_calibration()
+
+
+def get_target_size(consumer=None, cache_sizes=None, calibration=None):
+    """
+    How large, in bytes, the tiles for ``consumer`` should be
+
+    Measured values from the calibration benchmark take precedence over
+    the estimates from the cache sizes.
+    """
+    if consumer is None:
+        consumer = "udf"
+    if consumer not in CONSUMERS:
+        raise ValueError("unknown consumer %r, should be one of %r" % (consumer, CONSUMERS))
+    if calibration is None:
+        calibration = _get_calibration()
+    if consumer in calibration:
+        return calibration[consumer]
+    if cache_sizes is None:
+        cache_sizes = get_cache_sizes()
+    if consumer == "sum":
+        return cache_sizes["L2"] // 2
+    return cache_sizes["L3"] // 4
+
+
+def _align_to_chunks(tileshape, chunks, shape):
+    aligned = list(tileshape)
+    for i, (size, chunk, max_size) in enumerate(zip(tileshape, chunks, shape)):
+        if size == max_size:
+            continue
+        if size < chunk:
+            # reading a part of a chunk means decompressing all of it,
+            # so we rather read more at once:
+            aligned[i] = min(chunk, max_size)
+        else:
+            aligned[i] = size - size % chunk
+    return aligned
+
+
+def negotiate_tileshape(shape, dtype, consumer=None, chunks=None, whole_frames=False,
+                        cross_rows=True, target_size=None):
+    """
+    Choose a tileshape for reading data of ``shape``
+
+    Tiles are stacks of frames, taken from the last navigation axis first, that
+    fit into the target size for the consumer (see :func:`get_target_size`). If
+    a single frame is already larger than that, frames are split along their
+    first signal axis, unless ``whole_frames`` is set.
+
+    Parameters
+    ----------
+    shape : Shape
+        shape of the data that will be split into tiles, usually a partition
+
+    dtype : numpy.dtype or str
+        the dtype of the data
+
+    consumer : str or None
+        what the tiles are used for: "mask", "sum" or "udf"
+
+    chunks : tuple of int or None
+        the chunk layout of HDF5 data. tiles are aligned to chunk boundaries, and
+        don't read partial chunks
+
+    whole_frames : bool
+        never split frames
+
+    cross_rows : bool
+        allow tiles to contain more than one scan row, if the reader supports it
+
+    target_size : int or None
+        override the target size of the tiles, in bytes
+
+    Returns
+    -------
+    Shape
+        with the same dimensionality as ``shape``
+    """
+    if target_size is None:
+        target_size = get_target_size(consumer)
+    nav = tuple(shape.nav)
+    sig = tuple(shape.sig)
+    # integer data is converted to float by most consumers before doing any work:
+    itemsize = max(np.dtype(dtype).itemsize, 4)
+    frame_bytes = shape.sig.size * itemsize
+    tileshape = [1] * len(nav) + list(sig)
+    if frame_bytes <= target_size or whole_frames:
+        num_frames = max(1, target_size // frame_bytes)
+        for i in reversed(range(len(nav))):
+            tileshape[i] = min(nav[i], num_frames)
+            if tileshape[i] < nav[i] or not cross_rows:
+                break
+            num_frames //= tileshape[i]
+    else:
+        row_bytes = frame_bytes // sig[0]
+        tileshape[len(nav)] = max(1, min(sig[0], target_size // row_bytes))
+    if chunks is not None:
+        tileshape = _align_to_chunks(tileshape, chunks, tuple(shape))
+    return Shape(tileshape, sig_dims=shape.sig.dims)
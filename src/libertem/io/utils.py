@@ -13,9 +13,74 @@ except ModuleNotFoundError:
     from libertem.win_tweaks import get_owner_name  # noqa: F401
 
 
+def get_num_partitions(num_frames, framesize, dtype, target_size, min_num_partitions=None):
+    """
+    Calculate the number of partitions for ``num_frames`` frames
+
+    Aims for partitions of ``target_size`` bytes, but makes at least
+    ``min_num_partitions`` partitions, and rounds up to a multiple of
+    ``min_num_partitions``, so each worker gets the same number of partitions
+    and no worker is left idle in the last round. Never returns more partitions
+    than there are frames.
+
+    Parameters
+    ----------
+    num_frames : int
+        number of frames in the whole dataset
+    framesize : int
+        number of pixels per frame
+    dtype : numpy.dtype or str
+        data type of the dataset
+    target_size : int
+        target size in bytes - how large should each partition be?
+    min_num_partitions : int
+        minimum number of partitions desired, usually the number of workers;
+        defaults to the number of CPU cores
+    Returns
+    -------
+    int
+        the number of partitions
+    """
+    min_num_partitions = min_num_partitions or multiprocessing.cpu_count()
+    bytes_per_frame = framesize * np.dtype(str(dtype)).itemsize
+    frames_per_partition = max(1, target_size // bytes_per_frame)
+    num_partitions = -(-num_frames // frames_per_partition)
+    num_partitions = -(-num_partitions // min_num_partitions) * min_num_partitions
+    return max(1, min(num_partitions, num_frames))
+
+
+def get_partition_ranges(num_frames, framesize, dtype, target_size, min_num_partitions=None):
+    """
+    Split the flattened navigation axis into ranges of frames
+
+    The number of partitions is chosen by :func:`get_num_partitions`. Partitions
+    can start and end anywhere, not only at the border of a scan row, and their
+    lengths differ by at most one frame.
+
+    Returns
+    -------
+    list of (int, int)
+        (start, stop) frame indices for each partition
+    """
+    num_partitions = get_num_partitions(
+        num_frames, framesize, dtype, target_size, min_num_partitions
+    )
+    bounds = [
+        i * num_frames // num_partitions
+        for i in range(num_partitions + 1)
+    ]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
 def get_partition_shape(datashape, framesize, dtype, target_size, min_num_partitions=None):
     """
     Calculate partition shape for the given ``target_size``
+
+    The number of partitions is chosen by :func:`get_num_partitions`. If there are
+    fewer partitions than scan rows, each partition covers a number of whole rows,
+    otherwise scan rows are split, which helps with tall, narrow scans and with many
+    workers.
+
     Parameters
     ----------
     datashape : (int, int, int, int)
@@ -27,23 +92,56 @@ def get_partition_shape(datashape, framesize, dtype, target_size, min_num_partit
     target_size : int
         target size in bytes - how large should each partition be?
     min_num_partitions : int
-        minimum number of partitions desired, defaults to twice the number of CPU cores
+        minimum number of partitions desired, defaults to the number of CPU cores
     Returns
     -------
     (int, int, int, int)
         the shape calculated from the given parameters
     """
-    min_num_partitions = min_num_partitions or multiprocessing.cpu_count()
-    # FIXME: allow for partitions smaller than one scan row
-    # FIXME: allow specifying the "aspect ratio" for a partition?
-    num_frames = datashape[0] * datashape[1]
-    bytes_per_frame = framesize * np.dtype(str(dtype)).itemsize
-    frames_per_partition = target_size // bytes_per_frame
-    num_partitions = num_frames // frames_per_partition
-    num_partitions = max(min_num_partitions, num_partitions)
+    rows, cols = datashape[0], datashape[1]
+    num_partitions = get_num_partitions(
+        rows * cols, framesize, dtype, target_size, min_num_partitions
+    )
+    if num_partitions <= rows:
+        rows_per_partition = _get_chunk_size(rows, num_partitions)
+        return (rows_per_partition, cols, datashape[2], datashape[3])
+    parts_per_row = -(-num_partitions // rows)
+    cols_per_partition = _get_chunk_size(cols, parts_per_row)
+    return (1, cols_per_partition, datashape[2], datashape[3])
 
-    # number of partitions should evenly divide number of scan rows:
-    # assert datashape[1] % num_partitions == 0,\
-    #     "%d %% %d != 0 (datashape=%r)" % (datashape[1], num_partitions, datashape)
 
-    return (max(1, datashape[0] // num_partitions), datashape[1], datashape[2], datashape[3])
+def _get_chunk_size(length, num_chunks):
+    """
+    The largest chunk size that splits ``length`` into at least ``num_chunks`` chunks
+    (the last one possibly shorter), or 1 if ``num_chunks > length``. Rounding up
+    ``length / num_chunks`` instead can result in fewer chunks, for example only 6
+    chunks of 2 for a length of 12 and 8 chunks.
+    """
+    chunk_size = max(1, -(-length // num_chunks))
+    while chunk_size > 1 and -(-length // chunk_size) < num_chunks:
+        chunk_size -= 1
+    return chunk_size
+
+
+def get_frame_range(start_frame, num_frames, crop_to=None):
+    """
+    The frames of a partition with a flat navigation axis that are inside of ``crop_to``,
+    so readers only read these, and not the whole stacks of frames the crop intersects
+
+    Parameters
+    ----------
+    start_frame, num_frames : int
+        the frames of the partition
+    crop_to : Slice or None
+        see ``Partition.get_tiles``
+
+    Returns
+    -------
+    (int, int)
+        the (start, stop) frame indices, ``stop == start`` if no frame is inside of the crop
+    """
+    start, stop = start_frame, start_frame + num_frames
+    if crop_to is not None:
+        start = max(start, crop_to.origin[0])
+        stop = max(start, min(stop, crop_to.origin[0] + crop_to.shape[0]))
+    return start, stop
@@ -1,5 +1,78 @@
 import numpy as np
 
+from libertem.common.buffers import tile_buffer_pool, SharedResultBuffer
+from libertem.common.roi import (
+    get_raw_roi, get_partition_roi, iter_roi_tiles, get_progressive_rois, MAX_GAP,
+)
+from libertem.io.dataset.base import DataTile
+
+
+# diagnostics that are summed over all partitions:
+COUNTERS = {"tile_buffer_allocations"}
+
+
+def add_diagnostics(result_tiles, diagnostics):
+    """
+    Attach ``diagnostics`` to the first of the ``result_tiles`` of a partition
+    """
+    if not result_tiles:
+        return
+    tile = result_tiles[0]
+    tile.diagnostics = dict(tile.diagnostics or {}, **diagnostics)
+
+
+def iter_tiles_in_roi(partition, roi, consumer=None, max_gap=MAX_GAP):
+    """
+    Read the tiles of ``partition`` that contain frames selected by the partition-local
+    ``roi``, or all tiles if it is None. The other frames of these tiles are set to zero.
+    """
+    if roi is None:
+        yield from partition.iter_tiles(consumer=consumer)
+        return
+    # the data of a tile is only valid until the next one is requested, so the
+    # buffer of a partly selected tile can go back to the pool after that:
+    buf = None
+    try:
+        for data_tile, selection in iter_roi_tiles(partition, roi, max_gap, consumer=consumer):
+            if buf is not None:
+                tile_buffer_pool.put(buf)
+                buf = None
+            if not selection.all():
+                # the tile tasks we have are linear in the frame data, so frames
+                # outside of the roi don't contribute if they are set to zero. The
+                # data of the reader may be read-only, so we zero them in a copy:
+                buf = tile_buffer_pool.get(data_tile.data.shape, data_tile.data.dtype)
+                np.copyto(buf, data_tile.data)
+                buf.reshape((selection.size, -1))[~selection] = 0
+                data_tile = DataTile(data=buf, tile_slice=data_tile.tile_slice)
+            yield data_tile
+    finally:
+        if buf is not None:
+            tile_buffer_pool.put(buf)
+
+
+def iter_progressive_passes(job, strides=(8, 4, 2, 1)):
+    """
+    Restrict ``job`` to the roi of each pass of a coarse-to-fine run in turn (see
+    :func:`libertem.common.roi.get_progressive_rois`), yielding ``(stride, roi)``
+    while the job is run for the pass. Jobs that don't support a roi get a single
+    pass with a roi of None.
+
+    The frames between the grid points of a pass are selected by later passes, so
+    they are not read together with the grid points (``max_gap=0``), and each frame
+    is only read once over all passes.
+    """
+    if job.supports_roi:
+        passes = get_progressive_rois(tuple(job.dataset.shape.nav), strides)
+    else:
+        passes = [(1, None)]
+    try:
+        for stride, roi in passes:
+            job.set_roi(roi, max_gap=0)
+            yield stride, roi
+    finally:
+        job.set_roi(None)
+
 
 class Job(object):
     """
@@ -7,8 +80,36 @@ class Job(object):
     to yield tasks for your specific computation.
     """
 
+    # if the tasks of this job can write their results into a shared memory
+    # buffer, instead of sending them back, see ``make_shared_result``:
+    supports_shared_result = False
+
+    # if the job can be restricted to a region of interest, see ``set_roi``:
+    supports_roi = False
+
     def __init__(self, dataset):
         self.dataset = dataset
+        # information about how the job was run, filled in from the
+        # result tiles, see ``collect_diagnostics``:
+        self.diagnostics = {}
+        self.shared_result = None
+        # boolean mask of shape ``dataset.raw_shape.nav``, see ``set_roi``:
+        self.roi = None
+        self.roi_max_gap = MAX_GAP
+
+    def set_roi(self, roi, max_gap=MAX_GAP):
+        """
+        Restrict the job to the frames selected by ``roi``, a boolean mask of shape
+        ``dataset.shape.nav``, or None to select all frames. Only the partitions
+        containing selected frames get a task, see ``get_partitions_in_roi``.
+
+        Selected frames that are at most ``max_gap`` frames apart are read together,
+        including the frames in between, see :func:`libertem.common.roi.get_crops`.
+        """
+        if roi is not None and not self.supports_roi:
+            raise ValueError("%s can't be restricted to a roi" % type(self).__name__)
+        self.roi = get_raw_roi(roi, self.dataset)
+        self.roi_max_gap = max_gap
 
     def get_tasks(self):
         """
@@ -19,9 +120,50 @@ class Job(object):
         """
         raise NotImplementedError()
 
+    def get_partitions_in_roi(self):
+        """
+        The partitions of the dataset that contain frames selected by ``self.roi``,
+        to create tasks from. Partitions without any selected frames are skipped.
+
+        Yields
+        ------
+        (int, Partition, numpy.ndarray or None)
+            the index of the partition, the partition, and the part of the roi
+            that covers it, or None if the job has no roi
+        """
+        for idx, partition in enumerate(self.dataset.get_partitions()):
+            if self.roi is None:
+                yield idx, partition, None
+                continue
+            partition_roi = get_partition_roi(self.roi, partition)
+            if partition_roi.any():
+                yield idx, partition, partition_roi
+
     def get_result_shape(self):
         raise NotImplementedError()
 
+    def estimate_result(self, result, done, stride):
+        """
+        Estimate the result for the whole dataset from a partial ``result``, for showing
+        it while running in coarse-to-fine passes (see
+        :meth:`libertem.api.Context.run_progressive`). By default, the partial result
+        is returned as it is.
+
+        Parameters
+        ----------
+        result
+            the result reduced so far, which must not be modified
+        done : numpy.ndarray
+            boolean mask of shape ``dataset.shape.nav``, the frames that were processed
+        stride : int
+            all frames on the grid with this stride along the navigation axes were processed
+
+        Returns
+        -------
+        an array in the same layout as ``result``
+        """
+        return result
+
     def get_result_dtype(self):
         dtype = np.dtype(self.dataset.dtype)
         if dtype.kind in ('u', 'i'):
@@ -33,6 +175,42 @@ class Job(object):
         dtype = self.get_result_dtype()
         return np.zeros(shape, dtype=dtype)
 
+    def make_shared_result(self):
+        """
+        Allocate a result buffer in shared memory, which the tasks of this job
+        reduce their results into directly. Only useful if the tasks run on the
+        same machine, see ``JobExecutor.supports_shared_result``. The
+        buffer needs to be freed with ``close_shared_result``.
+        """
+        self.shared_result = SharedResultBuffer.create(
+            shape=self.get_result_shape(), dtype=self.get_result_dtype()
+        )
+        return self.shared_result
+
+    def get_shared_result(self):
+        """
+        Get a copy of the result from the shared result buffer, after all tasks have run
+        """
+        return self.shared_result.get_array().copy()
+
+    def close_shared_result(self):
+        if self.shared_result is not None:
+            self.shared_result.close()
+            self.shared_result = None
+
+    def collect_diagnostics(self, result_tile):
+        """
+        Record the diagnostics of a ResultTile of this job in ``self.diagnostics``.
+        Call this for each result tile, alongside ``reduce_into_result``.
+        """
+        if not result_tile.diagnostics:
+            return
+        for key, value in result_tile.diagnostics.items():
+            if key in COUNTERS:
+                self.diagnostics[key] = self.diagnostics.get(key, 0) + value
+            else:
+                self.diagnostics[key] = value
+
 
 class Task(object):
     """
@@ -51,10 +229,107 @@ class Task(object):
         raise NotImplementedError()
 
 
+class TileTask(Task):
+    """
+    A Task that looks at each tile of the partition exactly once, in any order.
+    Instead of ``__call__``, implement ``init_result``, ``process_tile`` and
+    ``get_result_tiles``.
+
+    Tasks of this kind can be fused with other TileTasks on the same partition
+    (see :class:`libertem.job.fused.FusedTask`), so each tile only needs
+    to be read and decoded once for all of them.
+    """
+
+    # what the tiles are used for, lets datasets choose a fitting tileshape
+    # (see :func:`libertem.io.tiling.negotiate_tileshape`):
+    consumer = None
+
+    def __init__(self, *args, shared_result=None, roi=None, max_gap=MAX_GAP, **kwargs):
+        """
+        Parameters
+        ----------
+        shared_result : SharedResultBuffer or None
+            if given, the result tiles are reduced into this buffer in the worker,
+            and only a :class:`SharedResultTile` is sent back
+
+        roi : numpy.ndarray or None
+            boolean mask over the navigation axes of the partition; if given, only
+            tiles containing selected frames are read, and the other frames of
+            these tiles are set to zero before they are passed to ``process_tile``
+
+        max_gap : int
+            see ``Job.set_roi``
+        """
+        super().__init__(*args, **kwargs)
+        self.shared_result = shared_result
+        self.roi = roi
+        self.max_gap = max_gap
+
+    def init_result(self):
+        """
+        prepare the partial result for this partition
+        """
+        raise NotImplementedError()
+
+    def process_tile(self, data_tile):
+        """
+        process a single DataTile, accumulating into the partial result
+        """
+        raise NotImplementedError()
+
+    def get_result_tiles(self):
+        """
+        Returns
+        -------
+        list of ResultTile
+            the partial results for this partition
+        """
+        raise NotImplementedError()
+
+    def iter_tiles(self):
+        """
+        The tiles to pass to ``process_tile``, restricted to the roi of this task
+        """
+        return iter_tiles_in_roi(
+            self.partition, self.roi, consumer=self.consumer, max_gap=self.max_gap,
+        )
+
+    def __call__(self):
+        with tile_buffer_pool.count_allocations() as allocations:
+            self.init_result()
+            for data_tile in self.iter_tiles():
+                self.process_tile(data_tile)
+        result_tiles = self.get_result_tiles()
+        if self.shared_result is not None:
+            self.shared_result.reduce_tiles(result_tiles)
+            result_tiles = [
+                SharedResultTile(diagnostics=tile.diagnostics)
+                for tile in result_tiles[:1]
+            ]
+        add_diagnostics(result_tiles, {"tile_buffer_allocations": allocations.count})
+        return result_tiles
+
+
 class ResultTile(object):
+    # optional dict with information about how the result was computed
+    # in the worker, for example which backend was chosen:
+    diagnostics = None
+
     @property
     def dtype(self):
         raise NotImplementedError
 
     def reduce_into_result(self, result):
         raise NotImplementedError
+
+
+class SharedResultTile(ResultTile):
+    """
+    Sent back instead of the result data, if the task already reduced
+    its results into the shared result buffer of the job
+    """
+    def __init__(self, diagnostics=None):
+        self.diagnostics = diagnostics
+
+    def reduce_into_result(self, result):
+        return result
@@ -0,0 +1,155 @@
+import numpy as np
+
+from libertem.common.buffers import tile_buffer_pool
+from libertem.common.roi import MAX_GAP
+from .base import Job, Task, TileTask, ResultTile, add_diagnostics, iter_tiles_in_roi
+
+
+class FusedJob(Job):
+    """
+    Run several jobs on the same dataset in a single pass over the data.
+
+    For each partition, the tasks of all jobs are combined into a single
+    :class:`FusedTask`. The result buffer is a list, containing the
+    result buffer of each job, in the same order as `jobs`.
+    """
+
+    def __init__(self, jobs, *args, **kwargs):
+        if len(jobs) == 0:
+            raise ValueError("need at least one job to run")
+        dataset = jobs[0].dataset
+        if any(job.dataset is not dataset for job in jobs):
+            raise ValueError("all jobs need to work on the same dataset")
+        super().__init__(dataset=dataset, *args, **kwargs)
+        self.jobs = jobs
+
+    @property
+    def supports_roi(self):
+        return all(job.supports_roi for job in self.jobs)
+
+    def set_roi(self, roi, max_gap=MAX_GAP):
+        super().set_roi(roi, max_gap=max_gap)
+        for job in self.jobs:
+            job.set_roi(roi, max_gap=max_gap)
+
+    def estimate_result(self, result, done, stride):
+        return [
+            job.estimate_result(job_result, done, stride)
+            for job, job_result in zip(self.jobs, result)
+        ]
+
+    def get_tasks(self):
+        tasks_by_partition = {}
+        order = []
+        for job_idx, job in enumerate(self.jobs):
+            for task in job.get_tasks():
+                # some jobs skip partitions, so we group by the partition slice:
+                key = task.partition.slice
+                if key not in tasks_by_partition:
+                    tasks_by_partition[key] = []
+                    order.append(key)
+                tasks_by_partition[key].append((job_idx, task))
+        for idx, key in enumerate(order):
+            job_tasks = tasks_by_partition[key]
+            yield FusedTask(
+                partition=job_tasks[0][1].partition,
+                idx=idx,
+                job_tasks=job_tasks,
+            )
+
+    def get_result_shape(self):
+        return [job.get_result_shape() for job in self.jobs]
+
+    def get_result_dtype(self):
+        return [job.get_result_dtype() for job in self.jobs]
+
+    def get_result_buffer(self):
+        return [job.get_result_buffer() for job in self.jobs]
+
+    def collect_diagnostics(self, result_tile):
+        super().collect_diagnostics(result_tile)
+        for job_idx, tiles in result_tile.results.items():
+            for tile in tiles:
+                self.jobs[job_idx].collect_diagnostics(tile)
+
+
+def _same_roi(roi, other):
+    if roi is None or other is None:
+        return roi is other
+    return roi is other or np.array_equal(roi, other)
+
+
+class FusedTask(Task):
+    def __init__(self, job_tasks, *args, **kwargs):
+        """
+        Parameters
+        ----------
+        job_tasks : list of (int, Task) tuples
+            the tasks working on this partition, together with the index of their job
+        """
+        super().__init__(*args, **kwargs)
+        self.job_tasks = job_tasks
+
+    def __call__(self):
+        tile_tasks = [
+            task for _, task in self.job_tasks
+            if isinstance(task, TileTask)
+        ]
+        # tasks restricted to a different roi need different tiles, so
+        # they do their own pass over the data, like other tasks:
+        tile_tasks = [
+            task for task in tile_tasks
+            if _same_roi(task.roi, tile_tasks[0].roi) and task.max_gap == tile_tasks[0].max_gap
+        ]
+        results = {}
+        with tile_buffer_pool.count_allocations() as allocations:
+            for task in tile_tasks:
+                task.init_result()
+            # if the tasks want different tiles, fall back to the default:
+            consumers = {task.consumer for task in tile_tasks}
+            consumer = consumers.pop() if len(consumers) == 1 else None
+            if tile_tasks:
+                # read each tile only once, and feed it to all tasks:
+                tiles = iter_tiles_in_roi(
+                    self.partition, tile_tasks[0].roi, consumer, tile_tasks[0].max_gap,
+                )
+                for data_tile in tiles:
+                    for task in tile_tasks:
+                        task.process_tile(data_tile)
+            for job_idx, task in self.job_tasks:
+                if task in tile_tasks:
+                    result_tiles = task.get_result_tiles()
+                else:
+                    # other tasks need to do their own pass over the data:
+                    result_tiles = task()
+                results.setdefault(job_idx, []).extend(result_tiles)
+        result_tiles = [
+            FusedResultTile(results=results)
+        ]
+        add_diagnostics(result_tiles, {"tile_buffer_allocations": allocations.count})
+        return result_tiles
+
+
+class FusedResultTile(ResultTile):
+    def __init__(self, results):
+        """
+        Parameters
+        ----------
+        results : dict
+            mapping from job index to the list of ResultTiles of that job
+        """
+        self.results = results
+
+    @property
+    def dtype(self):
+        return [
+            tile.dtype
+            for tiles in self.results.values()
+            for tile in tiles
+        ]
+
+    def reduce_into_result(self, result):
+        for job_idx, tiles in self.results.items():
+            for tile in tiles:
+                tile.reduce_into_result(result[job_idx])
+        return result
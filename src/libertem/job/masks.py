@@ -1,5 +1,9 @@
+import uuid
+import weakref
 import functools
 import logging
+import threading
+from collections import OrderedDict
 
 try:
     import torch
@@ -9,67 +13,305 @@ import scipy.sparse as sp
 import numpy as np
 
 from libertem.io.dataset.base import DataTile, Partition
-from .base import Job, Task, ResultTile
+from .base import Job, TileTask, ResultTile
 from libertem.masks import to_dense, to_sparse
 from libertem.common import Slice
+from libertem.common.roi import upsample_nav
 
 log = logging.getLogger(__name__)
 
 
-def _make_mask_slicer(computed_masks):
+def _mask_nbytes(mask):
+    if sp.issparse(mask):
+        return sum(
+            getattr(mask, attr).nbytes
+            for attr in ('data', 'indices', 'indptr', 'row', 'col', 'offsets')
+            if hasattr(mask, attr)
+        )
+    return mask.nbytes
+
+
+class MaskCache(object):
+    """
+    Size-bounded LRU cache for computed and sliced masks. One instance lives
+    in each worker process (see ``mask_cache`` below), so masks survive across
+    jobs: re-running a job with the same mask factories, for example when
+    tweaking a parameter of another analysis in the GUI, doesn't need to call
+    the factories or slice the masks again.
+
+    The keys are built by the :class:`MaskContainer` from a key that identifies
+    the mask factories (see ``MaskContainer``), the dtype, the sparsity setting
+    and the slice.
+
+    Parameters
+    ----------
+    max_bytes : int
+        Upper bound for the total size of the cached masks. Least recently used
+        entries are evicted first. Single entries larger than this are not cached.
+    """
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._nbytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def nbytes(self):
+        return self._nbytes
+
+    def get(self, key):
+        """
+        Get the value for ``key`` and mark it as recently used, or
+        return None if it is not cached.
+        """
+        with self._lock:
+            try:
+                value, nbytes = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, nbytes):
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._nbytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, nbytes)
+            self._nbytes += nbytes
+            while self._nbytes > self.max_bytes:
+                _, (_, evicted_nbytes) = self._entries.popitem(last=False)
+                self._nbytes -= evicted_nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+            self.hits = 0
+            self.misses = 0
+
+
+# worker-resident, shared between all jobs running in this process:
+mask_cache = MaskCache(max_bytes=256*1024*1024)
+
+# tokens that identify mask factories for as long as they are alive; unlike id(),
+# a token is never re-used for a different factory after the first one is gone:
+_factory_tokens = weakref.WeakKeyDictionary()
+_factory_tokens_lock = threading.Lock()
+
+
+def _get_factory_token(fn):
+    with _factory_tokens_lock:
+        token = _factory_tokens.get(fn)
+        if token is None:
+            token = _factory_tokens[fn] = uuid.uuid4().hex
+        return token
+
+
+def _make_mask_slicer(compute_for_slice):
     @functools.lru_cache(maxsize=None)
     def _get_masks_for_slice(slice_):
-        sliced_masks = [
-            # .reshape((-1, 1)) -> like flatten, but compatible with sparse
-            # matrices and no copies
-            # should save us one copy as we np.hstack() immediately afterwards
-            # https://stackoverflow.com/a/28930580/540644
-            slice_.get(mask, sig_only=True).reshape((-1, 1))
-            for mask in computed_masks
-        ]
-        # MaskContainer assures that all or none of the masks are sparse
-        if sp.issparse(sliced_masks[0]):
-            return sp.hstack(sliced_masks)
-        else:
-            return np.hstack(sliced_masks)
+        return compute_for_slice(slice_)
     return _get_masks_for_slice
 
 
+def _slice_masks(computed_masks, slice_):
+    sliced_masks = [
+        # .reshape((-1, 1)) -> like flatten, but compatible with sparse
+        # matrices and no copies
+        # should save us one copy as we np.hstack() immediately afterwards
+        # https://stackoverflow.com/a/28930580/540644
+        slice_.get(mask, sig_only=True).reshape((-1, 1))
+        for mask in computed_masks
+    ]
+    # MaskContainer assures that all or none of the masks are sparse
+    if sp.issparse(sliced_masks[0]):
+        return sp.hstack(sliced_masks)
+    else:
+        return np.hstack(sliced_masks)
+
+
+# Rough per-element costs in seconds for the mask backend cost model, measured with
+# float32 data, numpy with OpenBLAS and scipy.sparse. Only their ratios matter.
+# Dense: data @ masks streams the data once, plus one multiply-add per mask:
+_COST_DENSE_READ = 0.3e-9
+_COST_DENSE_MAC = 0.1e-9
+# Sparse: masks.T.dot(data.T) needs a transposed copy of the data for stacks of
+# more than one frame, and then does one (much slower) multiply-add per non-zero:
+_COST_SPARSE_TRANSPOSE = 2e-9
+_COST_SPARSE_MAC = 2e-9
+# constant overhead per matrix product:
+_COST_DENSE_CALL = 5e-6
+_COST_SPARSE_CALL = 2e-5
+
+
+def _estimate_cost(num_frames, sig_size, nnz_dense, nnz_sparse):
+    """
+    Estimate the time for applying a group of dense masks with a total of ``nnz_dense``
+    non-zero entries and a group of sparse masks with ``nnz_sparse`` non-zero entries
+    to a tile of ``num_frames`` frames with ``sig_size`` pixels each.
+    ``nnz_dense`` and ``nnz_sparse`` are lists with one entry per mask.
+    """
+    cost = 0
+    if nnz_dense:
+        cost += _COST_DENSE_CALL + num_frames * sig_size * (
+            _COST_DENSE_READ + len(nnz_dense) * _COST_DENSE_MAC
+        )
+    if nnz_sparse:
+        cost += _COST_SPARSE_CALL + num_frames * sum(nnz_sparse) * _COST_SPARSE_MAC
+        if num_frames > 1:
+            cost += num_frames * sig_size * _COST_SPARSE_TRANSPOSE
+    return cost
+
+
+def choose_mask_backend(nnz, sig_size, num_frames):
+    """
+    Split masks into a dense and a sparse group, minimizing the estimated cost
+    of applying them to a tile.
+
+    Parameters
+    ----------
+    nnz : list of int
+        number of non-zero entries for each mask
+    sig_size : int
+        number of pixels per frame
+    num_frames : int
+        number of frames per tile
+
+    Returns
+    -------
+    dict
+        with the keys "dense" and "sparse" containing the indices of the masks
+        in each group, and "estimated_cost" with the estimated time per tile in seconds
+    """
+    # the per-mask cost only depends on the number of non-zeros, so the best
+    # split puts the k sparsest masks into the sparse group, for some k:
+    order = sorted(range(len(nnz)), key=lambda idx: nnz[idx])
+    best = None
+    for k in range(len(order) + 1):
+        cost = _estimate_cost(
+            num_frames=num_frames,
+            sig_size=sig_size,
+            nnz_dense=[nnz[idx] for idx in order[k:]],
+            nnz_sparse=[nnz[idx] for idx in order[:k]],
+        )
+        if best is None or cost < best[0]:
+            best = (cost, k)
+    cost, k = best
+    return {
+        "dense": sorted(order[k:]),
+        "sparse": sorted(order[:k]),
+        "estimated_cost": cost,
+    }
+
+
 class ApplyMasksJob(Job):
     """
     Apply masks to signals/frames in the dataset.
     """
-    def __init__(self, mask_factories, use_torch=True, use_sparse=None, *args, **kwargs):
+    # partitions write to disjoint parts of the result:
+    supports_shared_result = True
+    supports_roi = True
+
+    def __init__(self, mask_factories, use_torch=True, use_sparse=None, *args,
+                 roi=None, mask_cache_key=None, **kwargs):
+        """
+        Parameters
+        ----------
+        roi : numpy.ndarray or None
+            boolean mask of shape ``dataset.shape.nav``; only the selected frames are
+            read, the result is zero for the others
+
+        mask_cache_key : hashable or None
+            identifies the masks across jobs, see ``MaskContainer``
+        """
         super().__init__(*args, **kwargs)
+        self.set_roi(roi)
         mask_dtype = np.dtype(self.dataset.dtype)
         if mask_dtype.kind in ('u', 'i'):
             mask_dtype = np.dtype("float32")
-        self.masks = MaskContainer(mask_factories, dtype=mask_dtype, use_sparse=use_sparse)
+        self.masks = MaskContainer(mask_factories, dtype=mask_dtype, use_sparse=use_sparse,
+                                   cache_key=mask_cache_key)
         self.use_torch = use_torch
 
     def get_tasks(self):
-        for idx, partition in enumerate(self.dataset.get_partitions()):
+        for idx, partition, partition_roi in self.get_partitions_in_roi():
             yield ApplyMasksTask(
                 partition=partition,
                 masks=self.masks,
                 use_torch=self.use_torch,
                 idx=idx,
+                shared_result=self.shared_result,
+                roi=partition_roi,
+                max_gap=self.roi_max_gap,
             )
 
     def get_result_shape(self):
         return (len(self.masks),) + tuple(self.dataset.raw_shape.nav)
 
+    def estimate_result(self, result, done, stride):
+        nav_shape = tuple(self.dataset.shape.nav)
+        if self.dataset.raw_shape.nav.size != self.dataset.shape.nav.size:
+            return result
+        # the result is computed per frame, so fill in the frames
+        # that were not processed yet from their neighbours:
+        reshaped = result.reshape((len(self.masks),) + nav_shape)
+        return upsample_nav(reshaped, stride, nav_dims=len(nav_shape)).reshape(result.shape)
+
 
 class MaskContainer(object):
-    def __init__(self, mask_factories, dtype, use_sparse=None):
+    """
+    Parameters
+    ----------
+    mask_factories : list of callable
+        functions that return the masks
+    dtype : numpy.dtype
+        the masks are converted to this dtype
+    use_sparse : bool or "auto" or None
+        the mask backend, see ``_compute_masks``
+    cache_key : hashable or None
+        identifies the masks in the worker-resident ``mask_cache``, so containers
+        with different, but equivalent, factories can share cached masks. Should
+        contain everything the masks depend on, for example their parameters.
+        By default, the identity of the factory objects is used.
+    """
+    def __init__(self, mask_factories, dtype, use_sparse=None, cache_key=None):
         self.mask_factories = mask_factories
         self.dtype = dtype
         self.use_sparse = use_sparse
-        self._mask_cache = {}
         # lazily initialized in the worker process, to keep task size small:
         self._computed_masks = None
         self._get_masks_for_slice = None
+        self._backend = None
+        self._groups_for_slice = {}
         self.validate_mask_functions()
+        # computed here, and not in the worker, so the key is the same in all processes:
+        self._cache_key = self._make_cache_key(cache_key)
+
+    def _make_cache_key(self, cache_key):
+        """
+        Key for the masks in the worker-resident ``mask_cache``, or None
+        if the factories can't be identified, which disables caching.
+        """
+        if cache_key is None:
+            try:
+                cache_key = tuple(_get_factory_token(fn) for fn in self.mask_factories)
+            except TypeError:
+                # can't create weak references to the factories:
+                return None
+        return (
+            cache_key,
+            np.dtype(self.dtype).str,
+            self.use_sparse,
+        )
 
     def validate_mask_functions(self):
         for fn in self.mask_factories:
@@ -82,24 +324,110 @@ class MaskContainer(object):
     def __len__(self):
         return len(self.mask_factories)
 
-    def __getitem__(self, key):
+    def _get_slice(self, key):
         if isinstance(key, Partition):
-            slice_ = key.slice
+            return key.slice
         elif isinstance(key, DataTile):
-            slice_ = key.tile_slice
+            return key.tile_slice
         elif isinstance(key, Slice):
-            slice_ = key
+            return key
         else:
             raise TypeError(
                 "MaskContainer[k] can only be called with "
                 "DataTile/Slice/Partition instances"
             )
-        return self.get_masks_for_slice(slice_.discard_nav())
+
+    def __getitem__(self, key):
+        return self.get_masks_for_slice(self._get_slice(key).discard_nav())
+
+    def get_mask_groups(self, key):
+        """
+        Get the masks for the DataTile/Slice/Partition ``key``, split into groups
+        that should be applied using the same backend. Unless ``use_sparse`` is
+        "auto", this is a single group containing all masks.
+
+        Returns
+        -------
+        list of (index, masks, is_sparse) tuples
+            ``index`` selects the results of the group from the results for all masks,
+            ``masks`` is the stacked (pixels, masks in group) matrix for the slice
+        """
+        slice_ = self._get_slice(key)
+        sig_slice = slice_.discard_nav()
+        if self.use_sparse != "auto":
+            return [(slice(None), self.get_masks_for_slice(sig_slice), self.use_sparse)]
+        groups = self._groups_for_slice.get(sig_slice)
+        if groups is None:
+            backend = self.get_backend(num_frames=slice_.shape.nav.size)
+            groups = self._groups_for_slice[sig_slice] = [
+                self._make_group(sig_slice, indices=backend[kind], is_sparse=kind == "sparse")
+                for kind in ("dense", "sparse")
+                if backend[kind]
+            ]
+        return groups
+
+    def _make_group(self, slice_, indices, is_sparse):
+        if len(indices) == len(self):
+            index = slice(None)
+        else:
+            index = np.array(indices)
+        convert = to_sparse if is_sparse else to_dense
+        masks = self._get_cached(
+            key=(slice_, tuple(indices), is_sparse),
+            compute=lambda: _slice_masks(
+                [convert(self.computed_masks[idx]) for idx in indices],
+                slice_,
+            ),
+        )
+        return (index, masks, is_sparse)
+
+    def get_backend(self, num_frames):
+        """
+        Decide which masks to apply as dense and which as sparse matrices. In "auto"
+        mode, this uses a cost model based on the number of non-zero entries of each mask
+        and the number of frames per tile, and the decision is made once, for the first tile.
+
+        Parameters
+        ----------
+        num_frames : int
+            number of frames per tile
+
+        Returns
+        -------
+        dict
+            with the keys "auto", "dense" and "sparse", the latter containing the indices
+            of the masks in each group. In "auto" mode, also contains the "estimated_cost"
+            per tile in seconds.
+        """
+        if self._backend is not None:
+            return self._backend
+        computed_masks = self.computed_masks
+        if self.use_sparse == "auto":
+            nnz = [
+                m.nnz if sp.issparse(m) else np.count_nonzero(m)
+                for m in computed_masks
+            ]
+            backend = choose_mask_backend(
+                nnz=nnz,
+                sig_size=int(np.prod(computed_masks[0].shape)),
+                num_frames=num_frames,
+            )
+            backend["auto"] = True
+        else:
+            all_masks = list(range(len(self)))
+            backend = {
+                "auto": False,
+                "dense": [] if self.use_sparse else all_masks,
+                "sparse": all_masks if self.use_sparse else [],
+            }
+        self._backend = backend
+        return backend
 
     @property
     def shape(self):
         m0 = self.computed_masks[0]
-        return (m0.size, len(self.computed_masks))
+        # not m0.size, which is the number of non-zero entries for sparse matrices:
+        return (int(np.prod(m0.shape)), len(self.computed_masks))
 
     def _compute_masks(self):
         """
@@ -116,6 +444,8 @@ class MaskContainer(object):
         # it takes precedence.
         # If it is None, use sparse only if all masks are sparse
         # and set the use_sparse property accordingly
+        # If it is "auto", keep the masks as they are, they are
+        # converted per group when they are sliced
 
         raw_masks = [
             f().astype(self.dtype)
@@ -129,6 +459,8 @@ class MaskContainer(object):
             masks = [
                 to_dense(m) for m in raw_masks
             ]
+        elif self.use_sparse == "auto":
+            masks = raw_masks
         else:
             sparse = [
                 sp.issparse(m) for m in raw_masks
@@ -143,19 +475,57 @@ class MaskContainer(object):
                 ]
         return masks
 
+    def _get_cached(self, key, compute):
+        """
+        Get the result of ``compute()`` from the ``mask_cache``; the resolved
+        ``use_sparse`` setting is cached alongside, as it is only known
+        after calling the mask factories.
+        """
+        if self._cache_key is None:
+            return compute()
+        key = self._cache_key + key
+        cached = mask_cache.get(key)
+        if cached is not None:
+            self.use_sparse, masks = cached
+            return masks
+        masks = compute()
+        if isinstance(masks, list):
+            nbytes = sum(_mask_nbytes(m) for m in masks)
+        else:
+            nbytes = _mask_nbytes(masks)
+        mask_cache.put(key, (self.use_sparse, masks), nbytes)
+        return masks
+
+    def _uniform_masks(self):
+        computed_masks = self.computed_masks
+        if self.use_sparse == "auto":
+            # the raw masks can be a mixture of sparse and dense matrices, but they
+            # can only be stacked if they are all the same kind:
+            convert = to_sparse if all(sp.issparse(m) for m in computed_masks) else to_dense
+            computed_masks = [convert(m) for m in computed_masks]
+        return computed_masks
+
+    def _compute_masks_for_slice(self, slice_):
+        return self._get_cached(
+            key=(slice_,),
+            compute=lambda: _slice_masks(self._uniform_masks(), slice_),
+        )
+
     def get_masks_for_slice(self, slice_):
         if self._get_masks_for_slice is None:
-            self._get_masks_for_slice = _make_mask_slicer(self.computed_masks)
+            self._get_masks_for_slice = _make_mask_slicer(self._compute_masks_for_slice)
         return self._get_masks_for_slice(slice_)
 
     @property
     def computed_masks(self):
         if self._computed_masks is None:
-            self._computed_masks = self._compute_masks()
+            self._computed_masks = self._get_cached(key=(None,), compute=self._compute_masks)
         return self._computed_masks
 
 
-class ApplyMasksTask(Task):
+class ApplyMasksTask(TileTask):
+    consumer = "mask"
+
     def __init__(self, masks, use_torch, *args, **kwargs):
         """
         Parameters
@@ -171,61 +541,87 @@ class ApplyMasksTask(Task):
         if torch is None or np.dtype(self.partition.dtype).kind == 'c':
             self.use_torch = False
 
-    def reshaped_data(self, data, dest_slice):
+    def _get_result_buffer(self, num_frames, num_masks, dtype):
         """
-        Reshapes the result from the flattened and interleaved version to a shape
-        that fits the result array (masks, ...nav_dims)
+        get a (num_frames, num_masks) buffer to write the result of the matrix product into,
+        re-using it between tiles of the same size
         """
+        shape = (num_frames, num_masks)
+        buf = self._result_buffer
+        if buf is None or buf.shape != shape or buf.dtype != dtype:
+            buf = self._result_buffer = np.zeros(shape, dtype=dtype)
+        return buf
 
-        num_masks = data.shape[1]
-
-        deinterleaved = np.stack(
-            [data.ravel()[idx::num_masks]
-             for idx in range(num_masks)],
-            axis=0,
-        )
-        return deinterleaved.reshape((num_masks,) + tuple(dest_slice.shape.nav))
-
-    def __call__(self):
+    def init_result(self):
         num_masks = len(self.masks)
         dest_dtype = np.dtype(self.partition.dtype)
         if dest_dtype.kind not in ('c', 'f'):
-            dest_dtype = 'float32'
-        part = np.zeros((num_masks,) + tuple(self.partition.shape.nav), dtype=dest_dtype)
-        for data_tile in self.partition.get_tiles():
-            flat_data = data_tile.flat_data
-            if flat_data.dtype != dest_dtype:
-                data = flat_data.astype(dest_dtype)
-            else:
-                data = flat_data
-            masks = self.masks[data_tile]
-            if self.masks.use_sparse:
-                # The sparse matrix has to be the left-hand side, for that
-                # reason we transpose before and after multiplication.
-                result = masks.T.dot(data.T).T
-            elif self.use_torch:
-                result = torch.mm(
-                    torch.from_numpy(data),
-                    torch.from_numpy(masks),
-                ).numpy()
-            else:
-                result = data.dot(masks)
-            dest_slice = data_tile.tile_slice.shift(self.partition.slice)
-            reshaped = self.reshaped_data(data=result, dest_slice=dest_slice)
-            # Ellipsis to match the "number of masks" part of the result
-            part[(Ellipsis,) + dest_slice.get(nav_only=True)] += reshaped
+            dest_dtype = np.dtype('float32')
+        self._dest_dtype = dest_dtype
+        self._part = np.zeros((num_masks,) + tuple(self.partition.shape.nav), dtype=dest_dtype)
+        self._result_buffer = None
+
+    def _apply_masks(self, data, masks, is_sparse):
+        """
+        Returns
+        -------
+        the result in (masks, frames) layout
+        """
+        # for the dense case, this is just a transposed view of the result
+        # of data @ masks, so we don't need to copy the result around.
+        # (data @ masks is faster than masks.T @ data.T for dense BLAS, even though
+        # both calculate the same thing)
+        if is_sparse:
+            # The sparse matrix has to be the left-hand side
+            return masks.T.dot(data.T)
+        elif self.use_torch:
+            return torch.mm(
+                torch.from_numpy(data),
+                torch.from_numpy(masks),
+            ).numpy().T
+        elif masks.dtype == data.dtype:
+            result = self._get_result_buffer(
+                num_frames=data.shape[0], num_masks=masks.shape[1], dtype=data.dtype,
+            )
+            np.dot(data, masks, out=result)
+            return result.T
+        else:
+            return data.dot(masks).T
+
+    def process_tile(self, data_tile):
+        flat_data = data_tile.flat_data
+        if flat_data.dtype != self._dest_dtype:
+            data = flat_data.astype(self._dest_dtype)
+        else:
+            data = flat_data
+        dest_slice = data_tile.tile_slice.shift(self.partition.slice)
+        nav_slice = dest_slice.get(nav_only=True)
+        for index, masks, is_sparse in self.masks.get_mask_groups(data_tile):
+            result = self._apply_masks(data, masks, is_sparse)
+            # splitting the frames axis into the nav dimensions doesn't need a copy,
+            # even for the transposed view:
+            reshaped = result.reshape((masks.shape[1],) + tuple(dest_slice.shape.nav))
+            # index to match the "number of masks" part of the result
+            self._part[(index,) + nav_slice] += reshaped
+
+    def get_result_tiles(self):
+        part, self._part = self._part, None
+        self._result_buffer = None
+        backend = self.masks.get_backend(num_frames=self.partition.shape.nav.size)
         return [
             MaskResultTile(
                 data=part,
                 dest_slice=self.partition.slice.get(nav_only=True),
+                diagnostics={"mask_backend": backend},
             )
         ]
 
 
 class MaskResultTile(ResultTile):
-    def __init__(self, data, dest_slice):
+    def __init__(self, data, dest_slice, diagnostics=None):
         self.data = data
         self.dest_slice = dest_slice
+        self.diagnostics = diagnostics
 
     def __repr__(self):
         return "<ResultTile for slice=%r>" % self.dest_slice
@@ -34,7 +34,7 @@ class PickFrameTask(Task):
 
     def __call__(self):
         result = np.zeros(self._slice.shape, dtype=self.partition.dtype)
-        for data_tile in self.partition.get_tiles(crop_to=self._slice):
+        for data_tile in self.partition.iter_tiles(crop_to=self._slice):
             intersection = data_tile.tile_slice.intersection_with(self._slice)
             # shift to data_tile relative coordinates:
             shifted = intersection.shift(data_tile.tile_slice)
@@ -1,35 +1,82 @@
 import numpy as np
 
-from .base import Job, Task, ResultTile
+from libertem.common.buffers import SharedResultBuffer
+from .base import Job, TileTask, ResultTile
 
 
 class SumFramesJob(Job):
+    supports_shared_result = True
+    supports_roi = True
+
+    def __init__(self, *args, roi=None, **kwargs):
+        """
+        Parameters
+        ----------
+        roi : numpy.ndarray or None
+            boolean mask of shape ``dataset.shape.nav``, only the selected frames are summed
+        """
+        super().__init__(*args, **kwargs)
+        self.set_roi(roi)
+
     def get_tasks(self):
-        for idx, partition in enumerate(self.dataset.get_partitions()):
-            yield SumFramesTask(partition=partition, idx=idx)
+        for idx, partition, partition_roi in self.get_partitions_in_roi():
+            shared_result = None
+            if self.shared_result is not None:
+                # partitions can't add into the same frame at the same time,
+                # so each one gets its own:
+                shared_result = self.shared_result.for_index(idx)
+            yield SumFramesTask(
+                partition=partition, idx=idx, shared_result=shared_result, roi=partition_roi,
+                max_gap=self.roi_max_gap,
+            )
 
     def get_result_shape(self):
         return self.dataset.shape.sig
 
+    def estimate_result(self, result, done, stride):
+        # scale the sum over the frames done so far to the whole dataset:
+        num_done = np.count_nonzero(done)
+        if num_done == 0:
+            return result
+        return result * (done.size / num_done)
 
-class SumFramesTask(Task):
-    def __call__(self):
-        """
-        sum frames over navigation axes
-        """
+    def make_shared_result(self):
+        num_partitions = len(list(self.dataset.get_partitions()))
+        self.shared_result = SharedResultBuffer.create(
+            shape=(num_partitions,) + tuple(self.get_result_shape()),
+            dtype=self.get_result_dtype(),
+        )
+        return self.shared_result
+
+    def get_shared_result(self):
+        return self.shared_result.get_array().sum(axis=0)
+
+
+class SumFramesTask(TileTask):
+    """
+    sum frames over navigation axes
+    """
+    consumer = "sum"
+
+    def init_result(self):
         dest_dtype = np.dtype(self.partition.dtype)
         if dest_dtype.kind not in ('c', 'f'):
             dest_dtype = 'float32'
-        part = np.zeros(self.partition.meta.shape.sig, dtype=dest_dtype)
-        for data_tile in self.partition.get_tiles():
-            if data_tile.data.dtype != dest_dtype:
-                data = data_tile.data.astype(dest_dtype)
-            else:
-                data = data_tile.data
-            # sum over all navigation axes; for 2d this would be (0, 1), for 1d (0,) etc.:
-            axis = tuple(range(data_tile.tile_slice.shape.nav.dims))
-            result = data.sum(axis=axis)
-            part[data_tile.tile_slice.get(sig_only=True)] += result
+        self._dest_dtype = dest_dtype
+        self._part = np.zeros(self.partition.meta.shape.sig, dtype=dest_dtype)
+
+    def process_tile(self, data_tile):
+        if data_tile.data.dtype != self._dest_dtype:
+            data = data_tile.data.astype(self._dest_dtype)
+        else:
+            data = data_tile.data
+        # sum over all navigation axes; for 2d this would be (0, 1), for 1d (0,) etc.:
+        axis = tuple(range(data_tile.tile_slice.shape.nav.dims))
+        result = data.sum(axis=axis)
+        self._part[data_tile.tile_slice.get(sig_only=True)] += result
+
+    def get_result_tiles(self):
+        part, self._part = self._part, None
         return [
             SumResultTile(
                 data=part,
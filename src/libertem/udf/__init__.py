@@ -1 +1 @@
-from .base import merge_assign, UDFTask, make_udf_tasks, check_cast  # NOQA
+from .base import merge_assign, UDFTask, make_udf_tasks, check_cast, is_tile_fn  # NOQA
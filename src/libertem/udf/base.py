@@ -1,6 +1,9 @@
+import inspect
+
 import numpy as np
 
 from libertem.job.base import Task
+from libertem.common.roi import get_raw_roi, get_partition_roi, iter_roi_tiles
 
 
 def check_cast(fromvar, tovar):
@@ -15,12 +18,49 @@ def merge_assign(dest, src):
         dest[k][:] = src[k]
 
 
+def is_tile_fn(fn):
+    """
+    A UDF declares that it wants to process whole tiles at once by accepting
+    a `tile` keyword argument instead of `frame`.
+    """
+    try:
+        params = inspect.signature(fn).parameters
+    except (TypeError, ValueError):
+        return False
+    return 'tile' in params
+
+
+def _get_runs(selection):
+    """
+    (start, stop) of the runs of selected frames in the flat boolean array ``selection``
+    """
+    edges = np.flatnonzero(np.diff(np.concatenate([[False], selection, [False]])))
+    return list(zip(edges[::2].tolist(), edges[1::2].tolist()))
+
+
 class UDFTask(Task):
-    def __init__(self, partition, idx, make_buffers, init, fn):
+    def __init__(self, partition, idx, make_buffers, init, fn, roi=None):
         super().__init__(partition=partition, idx=idx)
         self._make_buffers = make_buffers
         self._init = init
         self._fn = fn
+        self._roi = roi
+
+    def _iter_tiles(self):
+        """
+        Yields
+        ------
+        (DataTile, numpy.ndarray or None)
+            the tiles of the partition, with the flat selection of the frames to
+            process, or None if all of them should be processed
+        """
+        if self._roi is None:
+            for tile in self.partition.iter_tiles(full_frames=True, consumer="udf"):
+                yield tile, None
+        else:
+            yield from iter_roi_tiles(
+                self.partition, self._roi, full_frames=True, consumer="udf",
+            )
 
     def __call__(self):
         result_buffers = self._make_buffers()
@@ -32,23 +72,63 @@ class UDFTask(Task):
         else:
             kwargs = {}
         kwargs.update(result_buffers)
-        for tile in self.partition.get_tiles(full_frames=True):
+        if is_tile_fn(self._fn):
+            self._run_tiles(result_buffers, kwargs)
+        else:
+            self._run_frames(result_buffers, kwargs)
+        return result_buffers, self.partition
+
+    def _run_frames(self, result_buffers, kwargs):
+        for tile, selection in self._iter_tiles():
             data = tile.flat_nav
-            for frame_idx, frame in enumerate(data):
-                buffer_views = {}
-                for k, buf in result_buffers.items():
-                    buffer_views[k] = buf.get_view_for_frame(
-                        partition=self.partition,
-                        tile=tile,
-                        frame_idx=frame_idx
-                    )
+            frame_views = {
+                k: buf.get_frame_views_for_tile(partition=self.partition, tile=tile)
+                for k, buf in result_buffers.items()
+            }
+            if selection is None:
+                frame_indices = range(data.shape[0])
+            else:
+                frame_indices = np.flatnonzero(selection)
+            for frame_idx in frame_indices:
+                for k, views in frame_views.items():
+                    kwargs[k] = views[frame_idx]
+                self._fn(frame=data[frame_idx], **kwargs)
+
+    def _run_tiles(self, result_buffers, kwargs):
+        for tile, selection in self._iter_tiles():
+            buffer_views = {}
+            for k, buf in result_buffers.items():
+                buffer_views[k] = buf.get_view_for_tile(
+                    partition=self.partition,
+                    tile=tile,
+                )
+            data = tile.flat_nav
+            if selection is None:
                 kwargs.update(buffer_views)
-                self._fn(frame=frame, **kwargs)
-        return result_buffers, self.partition
+                self._fn(tile=data, **kwargs)
+                continue
+            # call the function once for each contiguous run of selected frames:
+            for start, stop in _get_runs(selection):
+                for k, view in buffer_views.items():
+                    if result_buffers[k].kind == "nav":
+                        view = view[start:stop]
+                    kwargs[k] = view
+                self._fn(tile=data[start:stop], **kwargs)
 
 
-def make_udf_tasks(dataset, fn, init, make_buffers):
-    return (
-        UDFTask(partition=partition, idx=idx, fn=fn, init=init, make_buffers=make_buffers)
-        for idx, partition in enumerate(dataset.get_partitions())
-    )
+def make_udf_tasks(dataset, fn, init, make_buffers, roi=None):
+    """
+    Create a UDFTask for each partition of ``dataset``. If ``roi`` is given, only for the
+    partitions that contain selected frames.
+    """
+    roi = get_raw_roi(roi, dataset)
+    for idx, partition in enumerate(dataset.get_partitions()):
+        partition_roi = None
+        if roi is not None:
+            partition_roi = get_partition_roi(roi, partition)
+            if not partition_roi.any():
+                continue
+        yield UDFTask(
+            partition=partition, idx=idx, fn=fn, init=init, make_buffers=make_buffers,
+            roi=partition_roi,
+        )
@@ -10,7 +10,7 @@ from PIL import Image
 
 __all__ = ['Colormap2D', 'ColormapCubehelix', 'ColormapPerception', 'ColormapHLS',
            'ColormapClassic', 'interpolate_color', 'cmaps', 'CMAP_CIRCULAR_DEFAULT',
-           'visualize_simple', 'encode_image']
+           'visualize_simple', 'encode_image', 'IncrementalVisualizer']
 _log = logging.getLogger(__name__)
 
 
@@ -391,6 +391,94 @@ def visualize_simple(result, colormap=None):
     return colored
 
 
+def _get_range(result):
+    """
+    max of ``result``, and min of its non-zero values or None if there are none,
+    like in ``_get_norm``
+    """
+    result = result.astype(np.float32)
+    result_ne_zero = result[result != 0]
+    min_ = None
+    if len(result_ne_zero) > 0:
+        min_ = np.min(result_ne_zero)
+    return min_, np.max(result)
+
+
+class IncrementalVisualizer(object):
+    """
+    Visualize a result like :func:`visualize_simple`, for results that are updated
+    while a job is running, for example by new partitions being reduced into them.
+
+    Instead of normalizing and coloring the whole result on each update, the running
+    min/max is updated from the rows (the first axis) that the caller reports as
+    changed since the last update, and only these rows are colored again, in the
+    RGBA buffer of the previous update. Only if the min/max changed, all rows need
+    to be colored again.
+
+    As the min/max is only updated from the changed rows, the range can be wider
+    than that of the current values, if values change in place. It is reset whenever
+    all rows change.
+
+    Parameters
+    ----------
+    colormap : matplotlib colormap or None
+        colormap used for visualizing intensity values, defaults to gist_earth
+    """
+    def __init__(self, colormap=None):
+        if colormap is None:
+            colormap = cm.gist_earth
+        self.colormap = colormap
+        self._rgba = None
+        self._min = None
+        self._max = None
+        # number of rows colored so far, to see how much work was saved:
+        self.rows_colored = 0
+
+    def _colorize(self, data):
+        norm = colors.Normalize(vmin=0 if self._min is None else self._min, vmax=self._max)
+        self.rows_colored += data.shape[0]
+        return self.colormap(norm(data), bytes=True)
+
+    def update(self, result, dirty_rows=None):
+        """
+        Parameters
+        ----------
+        result : numpy.ndarray
+            the current version of the result, with at least 2 dimensions
+
+        dirty_rows : numpy.ndarray or None
+            indices of the rows that changed since the last update, for example from the
+            slices of the result tiles reduced in between, or None if all rows changed
+
+        Returns
+        -------
+        numpy.ndarray
+            the colored result, as uint8 RGBA array. It is updated in place on the next
+            call, so make a copy to keep it.
+        """
+        result = np.asarray(result)
+        if (dirty_rows is None or self._rgba is None
+                or self._rgba.shape[:-1] != result.shape
+                or len(dirty_rows) == result.shape[0]):
+            self._min, self._max = _get_range(result)
+            self._rgba = self._colorize(result)
+            return self._rgba
+        if len(dirty_rows) == 0:
+            return self._rgba
+        dirty = result[dirty_rows]
+        dirty_min, dirty_max = _get_range(dirty)
+        new_min = self._min
+        if dirty_min is not None and (new_min is None or dirty_min < new_min):
+            new_min = dirty_min
+        new_max = max(self._max, dirty_max)
+        if (new_min, new_max) != (self._min, self._max):
+            self._min, self._max = new_min, new_max
+            self._rgba = self._colorize(result)
+        else:
+            self._rgba[dirty_rows] = self._colorize(dirty)
+        return self._rgba
+
+
 cmaps = {'cubehelix_standard': ColormapCubehelix(),
          'cubehelix_reverse': ColormapCubehelix(reverse=True),
          'cubehelix_circular': ColormapCubehelix(start=1, rot=1,
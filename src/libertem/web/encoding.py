@@ -0,0 +1,144 @@
+import zlib
+import asyncio
+import hashlib
+import threading
+import concurrent.futures
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+
+def _to_rgba(visualized):
+    """
+    uint8 RGBA version of ``visualized``, without copying if it already is one
+    """
+    visualized = np.asarray(visualized, dtype=np.uint8)
+    if visualized.ndim == 2:
+        visualized = np.stack([visualized] * 3, axis=-1)
+    if visualized.shape[-1] == 3:
+        alpha = np.full(visualized.shape[:-1] + (1,), 255, dtype=np.uint8)
+        visualized = np.concatenate([visualized, alpha], axis=-1)
+    return np.ascontiguousarray(visualized)
+
+
+def encode_png(visualized):
+    # PNG can store RGBA directly, so we don't need to convert to RGB first. compression
+    # level 1 is several times faster than the default, for slightly larger images:
+    buf = BytesIO()
+    Image.fromarray(_to_rgba(visualized)).save(buf, format="png", compress_level=1)
+    return buf.getvalue()
+
+
+def encode_jpeg(visualized):
+    buf = BytesIO()
+    rgb = np.ascontiguousarray(_to_rgba(visualized)[..., :3])
+    Image.fromarray(rgb).save(buf, format="jpeg", quality=90)
+    return buf.getvalue()
+
+
+def encode_rgba_zlib(visualized):
+    """
+    Raw uint8 RGBA pixels in row-major order, compressed with zlib. The client
+    needs the shape of the image from the image description to decode it.
+    """
+    return zlib.compress(_to_rgba(visualized).tobytes(), 1)
+
+
+# wire formats for result images, which clients can choose when connecting
+# to the events websocket:
+IMAGE_FORMATS = {
+    "png": encode_png,
+    "jpeg": encode_jpeg,
+    "rgba-zlib": encode_rgba_zlib,
+}
+
+DEFAULT_IMAGE_FORMAT = "png"
+
+
+def _digest(visualized):
+    visualized = np.ascontiguousarray(visualized)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str((visualized.shape, visualized.dtype.str)).encode("ascii"))
+    h.update(visualized.data)
+    return h.digest()
+
+
+class ImageEncoder(object):
+    """
+    Encodes result images for sending them to the client, on a thread pool of
+    its own, so encoding doesn't block the event loop or the threads that compute
+    the results. Pillow and zlib release the GIL while encoding.
+
+    The last encoded version of each image is kept, and sent again without
+    encoding if the image didn't change since the last update.
+
+    Parameters
+    ----------
+    max_workers : int or None
+        number of encoding threads
+    """
+    def __init__(self, max_workers=None):
+        self._pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="encode-image",
+        )
+        self._cache = {}
+        self._lock = threading.Lock()
+        self.num_encoded = 0
+
+    def _encode(self, key, visualized, image_format):
+        digest = _digest(visualized)
+        with self._lock:
+            cached = self._cache.get(key)
+        if cached is not None and cached[0] == digest:
+            return cached[1]
+        encoded = IMAGE_FORMATS[image_format](visualized)
+        with self._lock:
+            self._cache[key] = (digest, encoded)
+            self.num_encoded += 1
+        return encoded
+
+    async def encode(self, results, image_format, job_id=None):
+        """
+        Encode the ``visualized`` images of a list of ``AnalysisResult``
+
+        Parameters
+        ----------
+        results : list of AnalysisResult
+            the results to encode
+        image_format : str
+            one of the keys of ``IMAGE_FORMATS``
+        job_id : str or None
+            images of the same job and position in ``results`` are only encoded again
+            if they changed; None disables this
+
+        Returns
+        -------
+        list of bytes
+        """
+        loop = asyncio.get_event_loop()
+        futures = []
+        for idx, result in enumerate(results):
+            key = None if job_id is None else (job_id, idx, image_format)
+            if key is None:
+                future = loop.run_in_executor(
+                    self._pool, IMAGE_FORMATS[image_format], result.visualized,
+                )
+            else:
+                future = loop.run_in_executor(
+                    self._pool, self._encode, key, result.visualized, image_format,
+                )
+            futures.append(future)
+        return await asyncio.gather(*futures)
+
+    def forget(self, job_id):
+        """
+        drop the cached images of ``job_id``
+        """
+        with self._lock:
+            for key in [key for key in self._cache if key[0] == job_id]:
+                del self._cache[key]
+
+    def close(self):
+        self._pool.shutdown(wait=False)
+        self._cache = {}
@@ -6,6 +6,7 @@ import signal
 import psutil
 from functools import partial
 
+import numpy as np
 import tornado.web
 import tornado.gen
 import tornado.websocket
@@ -16,11 +17,14 @@ import libertem
 from libertem.io.fs import get_fs_listing, FSError
 from libertem.executor.dask import DaskJobExecutor
 from libertem.executor.base import JobCancelledError, AsyncAdapter, sync_to_async
+from libertem.job.base import SharedResultTile, iter_progressive_passes
+from libertem.job.fused import FusedResultTile
 from libertem.io.dataset.base import DataSetException
 from libertem.io import dataset
+from libertem.web.encoding import ImageEncoder, IMAGE_FORMATS, DEFAULT_IMAGE_FORMAT
 from libertem.analysis import (
     DiskMaskAnalysis, RingMaskAnalysis, PointMaskAnalysis,
-    COMAnalysis, SumAnalysis, PickFrameAnalysis
+    COMAnalysis, SumAnalysis, PickFrameAnalysis, FusedAnalysis
 )
 
 
@@ -39,16 +43,6 @@ def log_message(message, exception=False):
         log_fn("message: %s" % message["messageType"])
 
 
-async def result_images(results, save_kwargs=None):
-    futures = [
-        run_blocking(result.get_image, save_kwargs)
-        for result in results
-    ]
-
-    images = await asyncio.gather(*futures)
-    return images
-
-
 async def run_blocking(fn, *args, **kwargs):
     """
     run blocking function fn with args, kwargs in a thread and return a corresponding future
@@ -207,8 +201,99 @@ class Message(object):
         }
 
 
+def get_dirty_rows(tiles, ds):
+    """
+    Get the rows of the navigation grid of ``ds`` that ``tiles`` are reduced into,
+    as a set of row indices, or None if that is not known. Tiles that are not reduced
+    into the navigation grid, like those of sums over frames, don't add any rows.
+    """
+    raw_nav = tuple(ds.raw_shape.nav)
+    nav = tuple(ds.shape.nav)
+    row_size = int(np.prod(nav[1:], dtype=np.int64))
+    rows = set()
+    for tile in tiles:
+        if isinstance(tile, FusedResultTile):
+            for job_tiles in tile.results.values():
+                job_rows = get_dirty_rows(job_tiles, ds)
+                if job_rows is None:
+                    return None
+                rows |= job_rows
+            continue
+        if isinstance(tile, SharedResultTile):
+            return None
+        dest_slice = getattr(tile, "dest_slice", None)
+        if dest_slice is None:
+            continue
+        first = np.ravel_multi_index([s.start for s in dest_slice], raw_nav)
+        last = np.ravel_multi_index([s.stop - 1 for s in dest_slice], raw_nav)
+        rows.update(range(first // row_size, min(last // row_size + 1, nav[0])))
+    return rows
+
+
+def _as_rows(dirty_rows):
+    if dirty_rows is None:
+        return None
+    return np.array(sorted(dirty_rows), dtype=np.intp)
+
+
 class RunJobMixin(object):
-    async def run_job(self, uuid, ds, job, full_result):
+    async def send_results(self, uuid, results, finished=False):
+        """
+        Encode the images of ``results`` in the formats the connected clients asked for,
+        and send them as TASK_RESULT message, or FINISH_JOB message if ``finished``
+        """
+        encoder = self.data.image_encoder
+        images = {}
+        # clients may connect while we are encoding:
+        while True:
+            missing = self.event_registry.get_image_formats() - set(images)
+            if not missing:
+                break
+            for image_format in missing:
+                images[image_format] = await encoder.encode(
+                    results, image_format=image_format, job_id=uuid,
+                )
+        if finished and self.data.job_is_cancelled(uuid):
+            return
+
+        # NOTE: make sure the following messages are sent atomically!
+        # (that is: keep the code below synchronous, and only send the messages
+        # once the images have finished encoding, and then send all at once)
+        image_descriptions = [
+            {
+                "title": result.title,
+                "desc": result.desc,
+                "shape": [int(i) for i in np.asarray(result.visualized).shape[:2]],
+            }
+            for result in results
+        ]
+        if finished:
+            msg = Message(self.data).finish_job(
+                job_id=uuid,
+                num_images=len(results),
+                image_descriptions=image_descriptions,
+            )
+        else:
+            msg = Message(self.data).task_result(
+                job_id=uuid,
+                num_images=len(results),
+                image_descriptions=image_descriptions,
+            )
+        log_message(msg)
+        self.event_registry.broadcast_images(msg, images)
+
+    async def run_job(self, uuid, ds, job, full_result, progressive=False):
+        """
+        Run ``job``, reducing into ``full_result``. This is an async generator that
+        yields the job results to be visualized, together with the rows of the
+        navigation grid that changed since the previous yield (or None, if not known,
+        see :meth:`libertem.analysis.base.BaseAnalysis.get_preview_results`), and
+        expects the analysis results for them to be sent back.
+
+        In ``progressive`` mode, the job is run in coarse-to-fine passes over the
+        navigation grid (see :meth:`libertem.api.Context.run_progressive`), and the
+        results estimated from the frames done so far are sent after each pass.
+        """
         self.data.register_job(uuid=uuid, job=job)
         executor = self.data.get_executor()
         msg = Message(self.data).start_job(
@@ -219,55 +304,52 @@ class RunJobMixin(object):
         self.finish()
         self.event_registry.broadcast_event(msg)
 
+        nav_shape = tuple(ds.shape.nav)
+        if progressive:
+            passes = iter_progressive_passes(job)
+        else:
+            passes = [(1, None)]
+        done = np.zeros(nav_shape, dtype=bool)
+        dirty_rows = set()
         t = time.time()
         try:
-            async for result in executor.run_job(job):
-                for tile in result:
-                    tile.reduce_into_result(full_result)
-                if time.time() - t < 0.3:
+            for stride, roi in passes:
+                if self.data.job_is_cancelled(uuid):
+                    return
+                async for result in executor.run_job(job):
+                    for tile in result:
+                        tile.reduce_into_result(full_result)
+                        job.collect_diagnostics(tile)
+                    if dirty_rows is not None:
+                        tile_rows = get_dirty_rows(result, ds)
+                        dirty_rows = None if tile_rows is None else dirty_rows | tile_rows
+                    # in progressive mode, results are only sent after each pass:
+                    if roi is not None or time.time() - t < 0.3:
+                        continue
+                    t = time.time()
+                    results = yield full_result, _as_rows(dirty_rows)
+                    dirty_rows = set()
+                    await self.send_results(uuid, results)
+                if roi is None:
                     continue
-                t = time.time()
-                results = yield full_result
-                images = await result_images(results)
-
-                # NOTE: make sure the following broadcast_event messages are sent atomically!
-                # (that is: keep the code below synchronous, and only send the messages
-                # once the images have finished encoding, and then send all at once)
-                msg = Message(self.data).task_result(
-                    job_id=uuid,
-                    num_images=len(results),
-                    image_descriptions=[
-                        {"title": result.title, "desc": result.desc}
-                        for result in results
-                    ],
-                )
-                log_message(msg)
-                self.event_registry.broadcast_event(msg)
-                for image in images:
-                    raw_bytes = image.read()
-                    self.event_registry.broadcast_event(raw_bytes, binary=True)
+                done |= roi
+                if done.all():
+                    continue
+                results = yield job.estimate_result(full_result, done, stride), None
+                # the estimate filled in all rows, so all of them change again:
+                dirty_rows = None
+                await self.send_results(uuid, results)
         except JobCancelledError:
             return  # TODO: maybe write a message on the websocket?
+        finally:
+            job.set_roi(None)
 
-        results = yield full_result
+        results = yield full_result, _as_rows(dirty_rows)
         if self.data.job_is_cancelled(uuid):
             return
-        images = await result_images(results)
-        if self.data.job_is_cancelled(uuid):
-            return
-        msg = Message(self.data).finish_job(
-            job_id=uuid,
-            num_images=len(results),
-            image_descriptions=[
-                {"title": result.title, "desc": result.desc}
-                for result in results
-            ],
-        )
-        log_message(msg)
-        self.event_registry.broadcast_event(msg)
-        for image in images:
-            raw_bytes = image.read()
-            self.event_registry.broadcast_event(raw_bytes, binary=True)
+        await self.send_results(uuid, results, finished=True)
+        # no more updates for this job:
+        self.data.image_encoder.forget(uuid)
 
 
 class ResultEventHandler(tornado.websocket.WebSocketHandler):
@@ -280,6 +362,12 @@ class ResultEventHandler(tornado.websocket.WebSocketHandler):
         return super().check_origin(origin)
 
     async def open(self):
+        # the wire format of the result images, see libertem.web.encoding:
+        self.image_format = self.get_argument("format", DEFAULT_IMAGE_FORMAT)
+        if self.image_format not in IMAGE_FORMATS:
+            log.warning("unknown image format %r, using %r", self.image_format,
+                        DEFAULT_IMAGE_FORMAT)
+            self.image_format = DEFAULT_IMAGE_FORMAT
         self.registry.add_handler(self)
         if self.data.have_executor():
             await self.data.verify_datasets()
@@ -309,6 +397,23 @@ class EventRegistry(object):
         for handler in self.handlers:
             handler.write_message(message, *args, **kwargs)
 
+    def get_image_formats(self):
+        return {handler.image_format for handler in self.handlers}
+
+    def broadcast_images(self, message, images):
+        """
+        Send ``message``, followed by the images in the format each handler asked for
+
+        Parameters
+        ----------
+        images : dict
+            mapping image formats to lists of encoded images
+        """
+        for handler in self.handlers:
+            handler.write_message(message)
+            for image in images[handler.image_format]:
+                handler.write_message(image, binary=True)
+
     def broadcast_together(self, messages, *args, **kwargs):
         for handler in self.handlers:
             for message in messages:
@@ -347,28 +452,44 @@ class JobDetailHandler(CORSMixin, RunJobMixin, tornado.web.RequestHandler):
         }
         return analysis_by_type[type_]
 
+    def get_analysis(self, ds, analysis_params):
+        return self.get_analysis_by_type(analysis_params['type'])(
+            dataset=ds,
+            parameters=analysis_params['parameters']
+        )
+
     async def put(self, uuid):
         request_data = tornado.escape.json_decode(self.request.body)
         params = request_data['job']
         ds = self.data.get_dataset(params['dataset'])
-        analysis = self.get_analysis_by_type(params['analysis']['type'])(
-            dataset=ds,
-            parameters=params['analysis']['parameters']
-        )
+        if 'analyses' in params:
+            # run multiple analyses in a single pass over the data, the results
+            # of all analyses are sent together:
+            analysis = FusedAnalysis(
+                dataset=ds,
+                analyses=[
+                    self.get_analysis(ds, analysis_params)
+                    for analysis_params in params['analyses']
+                ],
+            )
+        else:
+            analysis = self.get_analysis(ds, params['analysis'])
         job = analysis.get_job()
         full_result = job.get_result_buffer()
         job_runner = self.run_job(
             full_result=full_result,
             uuid=uuid, ds=ds, job=job,
+            progressive=params.get("progressive", False),
         )
         try:
-            await job_runner.asend(None)
+            job_results, dirty_rows = await job_runner.asend(None)
             while True:
                 results = await run_blocking(
-                    analysis.get_results,
-                    job_results=full_result,
+                    analysis.get_preview_results,
+                    job_results=job_results,
+                    dirty_rows=dirty_rows,
                 )
-                await job_runner.asend(results)
+                job_results, dirty_rows = await job_runner.asend(results)
         except StopAsyncIteration:
             pass
         except Exception as e:
@@ -376,6 +497,8 @@ class JobDetailHandler(CORSMixin, RunJobMixin, tornado.web.RequestHandler):
             msg = Message(self.data).job_error(uuid, "error running job: %s" % str(e))
             self.event_registry.broadcast_event(msg)
             await self.data.remove_job(uuid)
+        finally:
+            analysis.end_preview()
 
     async def delete(self, uuid):
         result = await self.data.remove_job(uuid)
@@ -419,7 +542,7 @@ class DataSetDetailHandler(CORSMixin, tornado.web.RequestHandler):
         if params["type"].lower() == "hdfs":
             dataset_params = {
                 "index_path": params["path"],
-                "tileshape": params["tileshape"],
+                "tileshape": params.get("tileshape"),
                 "host": "localhost",  # FIXME: config param
                 "port": 8020,  # FIXME: config param
             }
@@ -427,7 +550,7 @@ class DataSetDetailHandler(CORSMixin, tornado.web.RequestHandler):
             dataset_params = {
                 "path": params["path"],
                 "ds_path": params["ds_path"],
-                "tileshape": params["tileshape"],
+                "tileshape": params.get("tileshape"),
             }
         elif params["type"].lower() == "raw":
             dataset_params = {
@@ -435,19 +558,19 @@ class DataSetDetailHandler(CORSMixin, tornado.web.RequestHandler):
                 "dtype": params["dtype"],
                 "detector_size_raw": params["detector_size_raw"],
                 "crop_detector_to": params["crop_detector_to"],
-                "tileshape": params["tileshape"],
+                "tileshape": params.get("tileshape"),
                 "scan_size": params["scan_size"],
             }
         elif params["type"].lower() == "mib":
             dataset_params = {
                 "path": params["path"],
-                "tileshape": params["tileshape"],
+                "tileshape": params.get("tileshape"),
                 "scan_size": params["scan_size"],
             }
         elif params["type"].lower() == "blo":
             dataset_params = {
                 "path": params["path"],
-                "tileshape": params["tileshape"],
+                "tileshape": params.get("tileshape"),
             }
         elif params["type"].lower() == "k2is":
             dataset_params = {
@@ -513,6 +636,7 @@ class SharedData(object):
         self.dataset_to_id = {}
         self.executor = None
         self.cluster_params = {}
+        self.image_encoder = ImageEncoder()
 
     def get_local_cores(self, default=2):
         cores = psutil.cpu_count(logical=False)
@@ -527,7 +651,10 @@ class SharedData(object):
             "localCores": self.get_local_cores(),
             "cwd": os.getcwd(),
             # '/' works on Windows, too.
-            "separator": '/'
+            "separator": '/',
+            # wire formats for result images, choose one with the "format"
+            # query parameter of the events websocket:
+            "imageFormats": sorted(IMAGE_FORMATS.keys()),
         }
 
     def get_executor(self):
@@ -596,6 +723,7 @@ class SharedData(object):
             await executor.cancel(job)
             del self.jobs[uuid]
             del self.job_to_id[job]
+            self.image_encoder.forget(uuid)
             return True
         except KeyError:
             return False
@@ -785,6 +913,7 @@ async def do_stop(shared_data):
     log.debug("closing executor")
     if shared_data.executor is not None:
         await shared_data.executor.close()
+    shared_data.image_encoder.close()
     loop = asyncio.get_event_loop()
     log.debug("shutting down async generators")
     await loop.shutdown_asyncgens()
@@ -1,3 +1,5 @@
+import itertools
+
 import numpy as np
 import pytest
 
@@ -52,3 +54,66 @@ async def test_run_job(aexecutor):
 
     assert out.shape == (16, 16)
     assert np.allclose(out, expected)
+
+
+@pytest.fixture(scope="module")
+def dynamic_executor():
+    executor = DaskJobExecutor.make_local(
+        cluster_kwargs={"n_workers": 2, "threads_per_worker": 1, "processes": False},
+        scheduling="dynamic",
+    )
+    yield executor
+    executor.close()
+
+
+def test_dynamic_scheduling(dynamic_executor):
+    data = _mk_random(size=(16, 16, 16, 16), dtype='<u2')
+    dataset = MemoryDataSet(data=data, tileshape=(1, 1, 16, 16), partition_shape=(1, 4, 16, 16))
+    expected = data.sum(axis=(0, 1))
+
+    job = SumFramesJob(dataset=dataset)
+    out = job.get_result_buffer()
+    for tiles in dynamic_executor.run_job(job):
+        for tile in tiles:
+            tile.reduce_into_result(out)
+
+    assert np.allclose(out, expected)
+    workers = job.diagnostics["workers"]
+    assert sum(stats["tasks"] for stats in workers.values()) == 64
+    assert sum(stats["bytes"] for stats in workers.values()) == data.nbytes
+    assert all(stats["throughput"] > 0 for stats in workers.values())
+
+
+def test_concurrent_jobs_have_own_stats(dynamic_executor):
+    data = _mk_random(size=(16, 16, 16, 16), dtype='<u2')
+    jobs = [
+        SumFramesJob(dataset=MemoryDataSet(
+            data=data, tileshape=(1, 1, 16, 16), partition_shape=partition_shape
+        ))
+        for partition_shape in [(1, 4, 16, 16), (2, 16, 16, 16)]
+    ]
+    runs = [dynamic_executor.run_job(job) for job in jobs]
+    # interleave the two runs:
+    for _ in itertools.zip_longest(*runs):
+        pass
+    stats = [job.diagnostics["workers"] for job in jobs]
+    assert stats[0] is not stats[1]
+    assert sum(s["tasks"] for s in stats[0].values()) == 64
+    assert sum(s["tasks"] for s in stats[1].values()) == 8
+
+
+def test_dynamic_scheduling_locations_are_hints(dynamic_executor):
+    data = _mk_random(size=(16, 16, 16, 16), dtype='<u2')
+    dataset = MemoryDataSet(data=data, tileshape=(1, 1, 16, 16), partition_shape=(1, 8, 16, 16))
+    job = SumFramesJob(dataset=dataset)
+    tasks = list(job.get_tasks())
+    worker = dynamic_executor.get_available_workers()[0]['name']
+    for task in tasks:
+        task.get_locations = lambda: [worker]
+    results = list(dynamic_executor.run_tasks(tasks, cancel_id="test"))
+    assert len(results) == len(tasks)
+
+
+def test_unknown_scheduling_mode():
+    with pytest.raises(ValueError):
+        DaskJobExecutor(client=None, scheduling="nope")
@@ -0,0 +1,155 @@
+import numpy as np
+import pytest
+
+from libertem.api import Context
+from libertem.executor import processpool
+from libertem.executor.processpool import (
+    ProcessPoolJobExecutor, AsyncProcessPoolJobExecutor, _encode_result, _decode_result,
+)
+from libertem.job.sum import SumFramesJob
+from libertem.job.base import SharedResultTile
+from libertem.common import buffers
+from libertem.common.buffers import SharedResultBuffer
+from utils import MemoryDataSet, _mk_random
+
+
+@pytest.fixture(scope="module")
+def executor():
+    executor = ProcessPoolJobExecutor(n_workers=2)
+    yield executor
+    executor.close()
+
+
+def test_encode_decode_small():
+    data = np.arange(16)
+    payload, shm_name, sizes = _encode_result([data, "meta"])
+    assert shm_name is None
+    result = _decode_result(payload, shm_name, sizes)
+    assert np.allclose(result[0], data)
+    assert result[1] == "meta"
+
+
+def test_encode_decode_shared_memory():
+    data = [np.random.random((128, 128)), np.arange(64*1024, dtype="uint16")]
+    payload, shm_name, sizes = _encode_result(data)
+    assert shm_name is not None
+    assert len(payload) < 1024
+    result = _decode_result(payload, shm_name, sizes)
+    assert np.allclose(result[0], data[0])
+    assert np.allclose(result[1], data[1])
+
+
+def test_encode_decode_without_shared_memory(monkeypatch):
+    # like on Python < 3.8:
+    monkeypatch.setattr(processpool, "shared_memory", None)
+    data = [np.random.random((128, 128)), "meta"]
+    payload, shm_name, sizes = _encode_result(data)
+    assert shm_name is None
+    result = _decode_result(payload, shm_name, sizes)
+    assert np.allclose(result[0], data[0])
+    assert result[1] == "meta"
+
+
+def test_run_job(executor):
+    data = _mk_random(size=(4, 4, 256, 256), dtype='float32')
+    dataset = MemoryDataSet(data=data, tileshape=(1, 2, 256, 256), partition_shape=(1, 4, 256, 256))
+    ctx = Context(executor=executor)
+    result = ctx.run(SumFramesJob(dataset=dataset))
+    assert np.allclose(result, data.sum(axis=(0, 1)))
+
+
+def test_run_mask_job(executor):
+    data = _mk_random(size=(16, 16, 16, 16), dtype='float32')
+    dataset = MemoryDataSet(data=data, tileshape=(1, 4, 16, 16), partition_shape=(2, 16, 16, 16))
+    ctx = Context(executor=executor)
+    # lambdas need to be sent to the workers:
+    job = ctx.create_mask_job(dataset=dataset, factories=[lambda: np.ones((16, 16))])
+    result = ctx.run(job)
+    assert np.allclose(result[0], data.sum(axis=(2, 3)))
+
+
+def test_run_function(executor):
+    assert executor.run_function(lambda x: x + 1, 41) == 42
+
+
+@pytest.mark.asyncio
+async def test_async_run_job():
+    executor = await AsyncProcessPoolJobExecutor.make_local(n_workers=1)
+    try:
+        data = _mk_random(size=(4, 4, 16, 16), dtype='<u2')
+        dataset = MemoryDataSet(data=data, tileshape=(1, 4, 16, 16), partition_shape=(1, 4, 16, 16))
+        job = SumFramesJob(dataset=dataset)
+        out = job.get_result_buffer()
+        async for tiles in executor.run_job(job):
+            for tile in tiles:
+                tile.reduce_into_result(out)
+        assert np.allclose(out, data.sum(axis=(0, 1)))
+    finally:
+        await executor.close()
+
+
+def test_stop_early(executor):
+    data = _mk_random(size=(4, 4, 256, 256), dtype='float32')
+    dataset = MemoryDataSet(data=data, tileshape=(1, 4, 256, 256), partition_shape=(1, 4, 256, 256))
+    results = executor.run_job(SumFramesJob(dataset=dataset))
+    next(results)
+    results.close()
+    # the executor is still usable afterwards:
+    assert executor.run_function(lambda: 1) == 1
+
+
+def test_shared_result_only_sends_tokens(executor):
+    data = _mk_random(size=(16, 16, 16, 16), dtype='float32')
+    dataset = MemoryDataSet(data=data, tileshape=(1, 4, 16, 16), partition_shape=(2, 16, 16, 16))
+    ctx = Context(executor=executor)
+    job = ctx.create_mask_job(dataset=dataset, factories=[lambda: np.ones((16, 16))])
+    job.make_shared_result()
+    try:
+        for tiles in executor.run_job(job):
+            assert len(tiles) == 1
+            assert isinstance(tiles[0], SharedResultTile)
+            job.collect_diagnostics(tiles[0])
+        result = job.get_shared_result()
+    finally:
+        job.close_shared_result()
+    assert np.allclose(result[0], data.sum(axis=(2, 3)))
+    assert job.diagnostics["mask_backend"]["dense"]
+
+
+def test_shared_sum_result(executor):
+    data = _mk_random(size=(16, 16, 16, 16), dtype='uint16')
+    dataset = MemoryDataSet(data=data, tileshape=(1, 4, 16, 16), partition_shape=(2, 16, 16, 16))
+    job = SumFramesJob(dataset=dataset)
+    shared = job.make_shared_result()
+    try:
+        assert shared.shape == (8, 16, 16)
+        for tiles in executor.run_job(job):
+            assert isinstance(tiles[0], SharedResultTile)
+        result = job.get_shared_result()
+    finally:
+        job.close_shared_result()
+    assert np.allclose(result, data.sum(axis=(0, 1)))
+
+
+def test_run_iter_shared_result(executor):
+    data = _mk_random(size=(16, 16, 16, 16), dtype='float32')
+    dataset = MemoryDataSet(data=data, tileshape=(1, 4, 16, 16), partition_shape=(4, 16, 16, 16))
+    ctx = Context(executor=executor)
+    partials = list(ctx.run_iter(SumFramesJob(dataset=dataset)))
+    assert [p.partitions_done for p in partials] == [1, 2, 3, 4]
+    assert np.allclose(partials[-1].result, data.sum(axis=(0, 1)))
+
+
+def test_shared_result_unavailable(executor, monkeypatch):
+    # like on Python < 3.8:
+    monkeypatch.setattr(buffers, "shared_memory", None)
+    monkeypatch.setattr(executor, "supports_shared_result", False)
+    assert not SharedResultBuffer.is_available()
+    with pytest.raises(RuntimeError):
+        SharedResultBuffer.create(shape=(16, 16), dtype="float32")
+    data = _mk_random(size=(16, 16, 16, 16), dtype='float32')
+    dataset = MemoryDataSet(data=data, tileshape=(1, 4, 16, 16), partition_shape=(2, 16, 16, 16))
+    ctx = Context(executor=executor)
+    # falls back to sending back the results:
+    result = ctx.run(SumFramesJob(dataset=dataset))
+    assert np.allclose(result, data.sum(axis=(0, 1)))
@@ -0,0 +1,114 @@
+import numpy as np
+import pytest
+
+from libertem.common import Slice, Shape
+from libertem.io.dataset.frms6 import (
+    FRMS6DataSet, file_header_dtype, frame_header_dtype,
+)
+
+SCAN_SIZE = (4, 3)
+RAW_FRAME = (8, 12)  # (height, width)
+FRAMES_PER_FILE = 5
+NUM_DARK = 3
+
+
+def _write_frms6(path, frames):
+    header = np.zeros(1, dtype=file_header_dtype)
+    header['header_size'] = 1024
+    header['frame_header_size'] = 64
+    header['version'] = 6
+    header['height'], header['width'] = frames.shape[1:]
+    header['num_frames'] = frames.shape[0]
+    with open(path, "wb") as f:
+        f.write(header.tobytes().ljust(1024, b"\0"))
+        for frame in frames:
+            f.write(np.zeros(1, dtype=frame_header_dtype).tobytes())
+            f.write(frame.astype("<u2").tobytes())
+
+
+def _reference(raw, dark_frame, gain_map, bin_factor):
+    """
+    pre-process ``raw`` step by step, like the previous implementation
+    """
+    data = raw.astype(np.float32)
+    if dark_frame is not None:
+        data -= dark_frame
+    half_width = data.shape[2] // 2
+    lp = data[..., :half_width]
+    rp = data[..., half_width:][:, ::-1, ::-1]
+    if gain_map is not None:
+        lp = lp * gain_map[:data.shape[1]]
+        rp = rp * gain_map[data.shape[1]:]
+    lp = lp.repeat(bin_factor, axis=1)
+    rp = rp.repeat(bin_factor, axis=1)
+    return np.concatenate([lp, rp], axis=1)
+
+
+@pytest.fixture(params=[1, 2])
+def frms6(request, tmpdir):
+    bin_factor = request.param
+    num_frames = SCAN_SIZE[0] * SCAN_SIZE[1]
+    raw = np.random.randint(0, 1024, size=(num_frames,) + RAW_FRAME)
+    dark = np.random.randint(0, 16, size=(NUM_DARK,) + RAW_FRAME)
+    _write_frms6(str(tmpdir.join("test_000.frms6")), dark)
+    for idx, start in enumerate(range(0, num_frames, FRAMES_PER_FILE)):
+        _write_frms6(
+            str(tmpdir.join("test_%03d.frms6" % (idx + 1))),
+            raw[start:start + FRAMES_PER_FILE],
+        )
+    gain_map = np.random.random((2 * RAW_FRAME[0], RAW_FRAME[1] // 2)) + 0.5
+    with open(str(tmpdir.join("gain.csv")), "w") as f:
+        for row in gain_map.T:
+            f.write(";".join("%r" % v for v in row) + "\n")
+    with open(str(tmpdir.join("test.hdr")), "w") as f:
+        f.write("\n".join([
+            "[measurementInfo]",
+            "darkframes=%d" % NUM_DARK,
+            "dwelltimemicroseconds=1",
+            "gain=1",
+            "signalframes=%d" % num_frames,
+            "stemimagesize=%dx%d" % SCAN_SIZE,
+            'readoutmode="bin: %d, windowing: %d x %d"' % ((bin_factor,) + RAW_FRAME),
+        ]) + "\n")
+    ds = FRMS6DataSet(
+        path=str(tmpdir.join("test.hdr")),
+        gain_map_path=str(tmpdir.join("gain.csv")),
+    ).initialize()
+    dark_frame = dark.astype(np.float32).sum(axis=0) / NUM_DARK
+    expected = _reference(raw, dark_frame, gain_map, bin_factor)
+    return ds, expected
+
+
+def test_read(frms6):
+    ds, expected = frms6
+    assert tuple(ds.shape.sig) == expected.shape[1:]
+    result = np.zeros(expected.shape, dtype=np.float32)
+    for partition in ds.get_partitions():
+        for tile in partition.get_tiles():
+            result[tile.tile_slice.get()[:1]] = tile.data
+    assert np.allclose(result, expected)
+
+
+def test_read_across_files(frms6):
+    ds, expected = frms6
+    fileset = ds._get_fileset()
+    out = np.zeros((4,) + expected.shape[1:], dtype=np.float32)
+    fileset.read_images(start=3, stop=7, out=out)
+    assert np.allclose(out, expected[3:7])
+
+
+def test_read_cropped(frms6):
+    ds, expected = frms6
+    partition = next(ds.get_partitions())
+    sig_shape = tuple(ds.shape.sig)
+    crop_to = Slice(
+        origin=(2, sig_shape[0] // 2 - 3, 1),
+        shape=Shape((4, 6, 3), sig_dims=2),
+    )
+    result = np.zeros((4, 6, 3), dtype=np.float32)
+    for tile in partition.get_tiles(crop_to=crop_to):
+        assert tuple(tile.tile_slice.shape.sig) == (6, 3)
+        intersection = tile.tile_slice.intersection_with(crop_to)
+        in_tile = intersection.shift(tile.tile_slice).get()
+        result[intersection.shift(crop_to).get()] = tile.data[in_tile]
+    assert np.allclose(result, expected[2:6, sig_shape[0] // 2 - 3:sig_shape[0] // 2 + 3, 1:4])
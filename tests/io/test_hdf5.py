@@ -2,6 +2,8 @@ import pickle
 import cloudpickle
 import numpy as np
 from libertem.io.dataset.hdf5 import H5DataSet
+from libertem.io.dataset.base import min_num_partitions_hint
+from libertem.common.buffers import tile_buffer_pool
 
 from utils import _naive_mask_apply, _mk_random
 
@@ -58,3 +60,29 @@ def test_cloudpickle(lt_ctx, hdf5):
 
     # let's keep the pickled dataset size small-ish:
     assert len(pickled) < 1 * 1024
+
+
+def test_hdf5_no_allocations_after_warmup(lt_ctx, hdf5):
+    ds = H5DataSet(
+        path=hdf5.filename, ds_path="data", tileshape=(1, 3, 16, 16), target_size=512*1024*1024
+    )
+    ds.initialize()
+    tile_buffer_pool.clear()
+
+    job = lt_ctx.create_mask_job(dataset=ds, factories=[lambda: np.ones((16, 16))])
+    lt_ctx.run(job)
+    # one full tile buffer, and one for the tiles at the border:
+    assert job.diagnostics["tile_buffer_allocations"] == 2
+
+    job = lt_ctx.create_mask_job(dataset=ds, factories=[lambda: np.ones((16, 16))])
+    lt_ctx.run(job)
+    assert job.diagnostics["tile_buffer_allocations"] == 0
+
+
+def test_hdf5_min_num_partitions_hint(hdf5):
+    ds = H5DataSet(path=hdf5.filename, ds_path="data", tileshape=(1, 5, 16, 16))
+    ds.initialize()
+    with min_num_partitions_hint(10):
+        partitions = list(ds.get_partitions())
+    assert len(partitions) == 10
+    assert sum(p.shape.nav.size for p in partitions) == 25
@@ -0,0 +1,29 @@
+import os
+
+from libertem.io.index import load_index, save_index
+
+
+def test_save_index_falls_back(tmpdir):
+    # the first path can't be written, as it is a directory:
+    blocked = tmpdir.mkdir("blocked")
+    blocked.join("something").write("")
+    fallback = str(tmpdir.join("fallback", "index.json"))
+
+    index = {"version": 1, "files": []}
+    assert save_index([str(blocked), fallback], index) == fallback
+    assert load_index([str(blocked), fallback], version=1) == index
+    # no temporary files are left behind:
+    assert sorted(os.listdir(str(tmpdir))) == ["blocked", "fallback"]
+    assert os.listdir(os.path.join(str(tmpdir), "fallback")) == ["index.json"]
+
+
+def test_load_index_skips_other_files(tmpdir):
+    first = str(tmpdir.join("first.json"))
+    second = str(tmpdir.join("second.json"))
+    save_index([first], {"version": 1, "files": [{"name": "a"}], "which": "first"})
+    save_index([second], {"version": 1, "files": [{"name": "b"}], "which": "second"})
+
+    assert load_index([first, second], version=1)["which"] == "first"
+    index = load_index([first, second], version=1, file_keys=[{"name": "b"}])
+    assert index["which"] == "second"
+    assert load_index([first, second], version=1, file_keys=[]) is None
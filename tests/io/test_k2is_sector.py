@@ -0,0 +1,228 @@
+import numpy as np
+import pytest
+
+from libertem.io.dataset.k2is import (
+    Sector, K2ISPartition, decode_uint12_le, release_mappings, BLOCK_SIZE, HEADER_SIZE,
+    DATA_SIZE, BLOCK_SHAPE, BLOCKS_PER_SECTOR_PER_FRAME, NUM_SECTORS, SECTOR_SIZE,
+)
+from libertem.io.dataset import k2is
+from libertem.io.dataset.base import DataSetMeta, DataTile
+from libertem.common import Slice, Shape
+from libertem.common.roi import get_progressive_rois
+from libertem.job.base import iter_tiles_in_roi
+
+
+NUM_FRAMES = 6
+
+
+@pytest.fixture(scope="module")
+def sector_file(tmpdir_factory):
+    """
+    a sector file with random pixel data and empty headers
+    """
+    path = tmpdir_factory.mktemp("k2is").join("sector_0.bin")
+    data = np.random.randint(
+        0, 256, size=(NUM_FRAMES * BLOCKS_PER_SECTOR_PER_FRAME, BLOCK_SIZE), dtype=np.uint8
+    )
+    data[:, :HEADER_SIZE] = 0
+    data.tofile(str(path))
+    # one more block, as get_blocks expects more data after the last block:
+    with open(str(path), "ab") as f:
+        f.write(bytes(BLOCK_SIZE))
+    return str(path), data
+
+
+@pytest.fixture(scope="module")
+def sector_files(tmpdir_factory):
+    """
+    a whole dataset of sector files with the same content, enough for more than
+    one stack of frames
+    """
+    num_frames = 20
+    tmpdir = tmpdir_factory.mktemp("k2is_sectors")
+    data = np.random.randint(
+        0, 256, size=(num_frames * BLOCKS_PER_SECTOR_PER_FRAME, BLOCK_SIZE), dtype=np.uint8
+    )
+    data[:, :HEADER_SIZE] = 0
+    first = tmpdir.join("sector_0.bin")
+    data.tofile(str(first))
+    with open(str(first), "ab") as f:
+        f.write(bytes(BLOCK_SIZE))
+    paths = [str(first)]
+    for idx in range(1, NUM_SECTORS):
+        path = tmpdir.join("sector_%d.bin" % idx)
+        path.mksymlinkto(first)
+        paths.append(str(path))
+    return paths, data, num_frames
+
+
+def _expected_block(data, frame, blockidx):
+    out = np.zeros(BLOCK_SHAPE[0] * BLOCK_SHAPE[1], dtype=np.uint16)
+    decode_uint12_le(
+        inp=data[frame * BLOCKS_PER_SECTOR_PER_FRAME + blockidx, HEADER_SIZE:],
+        out=out,
+    )
+    return out.reshape(BLOCK_SHAPE)
+
+
+def _check_tile(tile, data):
+    start_frame = tile.tile_slice.origin[0]
+    start_y, start_x = tile.tile_slice.origin[1:]
+    blockidx = (start_y // 930) * 16 + (256 - start_x) // 16 - 1
+    assert tile.data.shape == (tile.tile_slice.shape[0],) + BLOCK_SHAPE
+    for i in range(tile.data.shape[0]):
+        assert np.allclose(
+            tile.data[i],
+            _expected_block(data, start_frame + i, blockidx),
+        )
+
+
+@pytest.mark.parametrize("parallel", [False, True])
+def test_read_stacked(sector_file, parallel):
+    path, data = sector_file
+    assert data.shape[1] - HEADER_SIZE == DATA_SIZE
+    num_tiles = 0
+    with Sector(path, idx=0) as sector:
+        tiles = sector.read_stacked(
+            start_at_frame=1, num_frames=5, stackheight=3, parallel=parallel,
+        )
+        # the tile buffers are re-used, so we check them one by one:
+        for tile in tiles:
+            num_tiles += 1
+            _check_tile(tile, data)
+    assert num_tiles == 2 * BLOCKS_PER_SECTOR_PER_FRAME
+
+
+def test_read_stacked_crop_to(sector_file):
+    path, data = sector_file
+    crop_to = Slice(origin=(0, 0, 0), shape=Shape((NUM_FRAMES, 930, 16), sig_dims=2))
+    with Sector(path, idx=0) as sector:
+        origins = []
+        for tile in sector.read_stacked(
+            start_at_frame=0, num_frames=NUM_FRAMES, stackheight=4, crop_to=crop_to,
+        ):
+            origins.append(tile.tile_slice.origin)
+            _check_tile(tile, data)
+    # only the top-left block intersects:
+    assert origins == [(0, 0, 0), (4, 0, 0)]
+
+
+@pytest.mark.parametrize("dtype", ["float32", "uint16"])
+def test_read_full_frame(sector_file, dtype):
+    path, data = sector_file
+    # a strided view, like the sector part of a full frame:
+    frame_buf = np.zeros((1, 1860, 2 * 256), dtype=dtype)
+    buf = frame_buf[:, :, 256:]
+    with Sector(path, idx=1) as sector:
+        sector.read_full_frame(frame=2, buf=buf)
+    for blockidx in range(BLOCKS_PER_SECTOR_PER_FRAME):
+        block_x = 256 - (16 * (blockidx % 16 + 1))
+        block_y = 930 * (blockidx // 16)
+        assert np.allclose(
+            buf[0, block_y:block_y + 930, block_x:block_x + 16],
+            _expected_block(data, 2, blockidx),
+        )
+    assert np.allclose(frame_buf[:, :, :256], 0)
+
+
+def test_mapping_is_reused(sector_file):
+    path, data = sector_file
+    release_mappings()
+    mapping = Sector(path, idx=0).get_mapping()
+    assert Sector(path, idx=0).get_mapping() is mapping
+    assert np.allclose(mapping[:data.size], data.reshape((-1,)))
+    del mapping
+    release_mappings([path])
+    assert Sector(path, idx=0).get_mapping() is not None
+
+
+def test_mapping_changed_file_evicted(tmpdir):
+    release_mappings()
+    path = str(tmpdir.join("sector_0.bin"))
+    np.zeros(4 * BLOCK_SIZE, dtype=np.uint8).tofile(path)
+    Sector(path, idx=0).get_mapping()
+    np.ones(5 * BLOCK_SIZE, dtype=np.uint8).tofile(path)
+    mapping = Sector(path, idx=0).get_mapping()
+    assert mapping.size == 5 * BLOCK_SIZE
+    assert np.all(mapping == 1)
+    # the mapping of the old version of the file was closed:
+    assert [key[0] for key in k2is._mappings] == [path]
+    del mapping
+    release_mappings()
+
+
+def test_mappings_bounded(tmpdir, monkeypatch):
+    release_mappings()
+    monkeypatch.setattr(k2is, "_MAX_MAPPINGS", 2)
+    paths = []
+    for idx in range(3):
+        path = str(tmpdir.join("sector_%d.bin" % idx))
+        np.zeros(BLOCK_SIZE, dtype=np.uint8).tofile(path)
+        paths.append(path)
+        Sector(path, idx=idx).get_mapping()
+    # the least recently used mapping was closed:
+    assert [key[0] for key in k2is._mappings] == paths[1:]
+    release_mappings()
+
+
+def _mk_partition(paths, num_frames, num_threads):
+    sig_shape = (SECTOR_SIZE[0], NUM_SECTORS * SECTOR_SIZE[1])
+    meta = DataSetMeta(
+        shape=Shape((num_frames,) + sig_shape, sig_dims=2),
+        raw_shape=Shape((num_frames,) + sig_shape, sig_dims=2),
+        dtype="uint16",
+    )
+    return K2ISPartition(
+        meta=meta,
+        partition_slice=Slice(origin=(0, 0, 0), shape=meta.raw_shape),
+        sectors=[Sector(path, idx=idx) for idx, path in enumerate(paths)],
+        start_frame=0,
+        num_frames=num_frames,
+        num_threads=num_threads,
+    )
+
+
+@pytest.mark.parametrize("num_threads", [1, 3, NUM_SECTORS])
+def test_partition_threads(sector_files, num_threads):
+    paths, data, num_frames = sector_files
+    partition = _mk_partition(paths, num_frames, num_threads)
+    seen = set()
+    for tile in partition.get_tiles():
+        origin = tile.tile_slice.origin
+        assert origin not in seen
+        seen.add(origin)
+        # all sectors have the same data, so we can check the tile like one of sector 0:
+        local_slice = Slice(
+            origin=(origin[0], origin[1], origin[2] % SECTOR_SIZE[1]),
+            shape=tile.tile_slice.shape,
+        )
+        _check_tile(DataTile(data=tile.data, tile_slice=local_slice), data)
+    # two stacks for each block of each sector:
+    assert len(seen) == 2 * BLOCKS_PER_SECTOR_PER_FRAME * NUM_SECTORS
+
+
+def test_partition_threads_stop_early(sector_files):
+    paths, data, num_frames = sector_files
+    partition = _mk_partition(paths, num_frames, num_threads=4)
+    tiles = partition.get_tiles()
+    for i in range(3):
+        next(tiles)
+    # should not block on the threads that wait for their tiles to be consumed:
+    tiles.close()
+
+
+def test_progressive_decodes_each_frame_once(sector_files, monkeypatch):
+    paths, data, num_frames = sector_files
+    partition = _mk_partition(paths, num_frames, num_threads=1)
+    frames_decoded = []
+    decode_stack = k2is.decode_stack
+
+    def _decode_stack(out, **kwargs):
+        frames_decoded.append(out.shape[1])
+        return decode_stack(out=out, **kwargs)
+
+    monkeypatch.setattr(k2is, "decode_stack", _decode_stack)
+    for stride, roi in get_progressive_rois((num_frames,)):
+        for tile in iter_tiles_in_roi(partition, roi, max_gap=0):
+            pass
+    assert sum(frames_decoded) == num_frames * NUM_SECTORS
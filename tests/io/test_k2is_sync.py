@@ -0,0 +1,110 @@
+import os
+import json
+
+import numpy as np
+import pytest
+
+from libertem.io.dataset.k2is import (
+    K2ISDataSet, K2FileSet, DataBlock, load_sync_index, BLOCK_SIZE, HEADER_SIZE,
+    BLOCKS_PER_SECTOR_PER_FRAME, NUM_SECTORS, _get_sync_index_paths,
+)
+
+NUM_FRAMES = 3
+
+
+def _write_sector(path, idx):
+    """
+    a sector file that starts with the last ``idx`` blocks of an incomplete frame,
+    followed by NUM_FRAMES complete frames, and only contains headers
+    """
+    num_blocks = idx + NUM_FRAMES * BLOCKS_PER_SECTOR_PER_FRAME
+    data = np.zeros((num_blocks + 1, BLOCK_SIZE), dtype=np.uint8)
+    headers = np.zeros(num_blocks, dtype=DataBlock.header_dtype)
+    headers['sync'] = 0xFFFF0055
+    headers['flags'] = 1
+    headers['width'] = 256
+    headers['height'] = 1860
+    headers['block_size'] = BLOCK_SIZE
+    block_count = np.arange(num_blocks) + BLOCKS_PER_SECTOR_PER_FRAME - idx
+    headers['block_count'] = block_count
+    headers['frame_id'] = block_count // BLOCKS_PER_SECTOR_PER_FRAME
+    data[:num_blocks, :HEADER_SIZE] = headers.view(np.uint8).reshape((num_blocks, HEADER_SIZE))
+    data.tofile(path)
+
+
+@pytest.fixture
+def k2is_files(tmpdir):
+    paths = []
+    for idx in range(NUM_SECTORS):
+        path = str(tmpdir.join("test_%d.bin" % (idx + 1)))
+        _write_sector(path, idx)
+        paths.append(path)
+    return paths
+
+
+def _mk_ds(paths):
+    ds = K2ISDataSet(path=paths[0])
+    ds._files = ds._get_files()
+    return ds
+
+
+def test_sync_index(k2is_files, monkeypatch):
+    assert load_sync_index(k2is_files) is None
+    ds = _mk_ds(k2is_files)
+    ds.check_valid()
+    sidecar = os.path.join(os.path.dirname(k2is_files[0]), ".test_.libertem-sync.json")
+    assert os.path.exists(sidecar)
+    expected = [idx * BLOCK_SIZE for idx in range(NUM_SECTORS)]
+    assert load_sync_index(k2is_files) == {
+        "start_offsets": expected,
+        "num_frames": NUM_FRAMES,
+    }
+
+    def _fail(self):
+        raise AssertionError("should not need to sync")
+
+    monkeypatch.setattr(K2FileSet, "sync", _fail)
+    ds = _mk_ds(k2is_files)
+    ds.check_valid()
+    fs = ds._get_fileset()
+    assert [s.first_block_offset for s in fs.sectors] == [
+        o + BLOCK_SIZE * ds._skip_frames * BLOCKS_PER_SECTOR_PER_FRAME for o in expected
+    ]
+
+
+def test_sync_index_outdated(k2is_files, monkeypatch):
+    _mk_ds(k2is_files).check_valid()
+    stat = os.stat(k2is_files[3])
+    os.utime(k2is_files[3], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert load_sync_index(k2is_files) is None
+
+    num_syncs = []
+    sync = K2FileSet.sync
+
+    def _sync(self):
+        num_syncs.append(1)
+        return sync(self)
+
+    monkeypatch.setattr(K2FileSet, "sync", _sync)
+    _mk_ds(k2is_files).check_valid()
+    assert len(num_syncs) == 1
+    assert load_sync_index(k2is_files) is not None
+
+
+def test_sync_index_outdated_sidecar(k2is_files, tmpdir, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmpdir.join("home")))
+    sidecar, home_path = _get_sync_index_paths(k2is_files)
+    _mk_ds(k2is_files).check_valid()
+    valid = load_sync_index(k2is_files)
+
+    # as if the sidecar could not be updated, and the index was written to
+    # the home directory instead:
+    os.makedirs(os.path.dirname(home_path))
+    os.rename(sidecar, home_path)
+    with open(home_path) as f:
+        index = json.load(f)
+    index["files"][0]["size"] += 1
+    with open(sidecar, "w") as f:
+        json.dump(index, f)
+
+    assert load_sync_index(k2is_files) == valid
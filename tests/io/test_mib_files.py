@@ -0,0 +1,145 @@
+import os
+
+import numpy as np
+import pytest
+
+from libertem.common import Slice, Shape
+from libertem.io.dataset import mib
+from libertem.io.dataset.mib import MIBDataSet, MIBFileSet, scan_headers
+from libertem.job.sum import SumFramesJob
+
+SCAN_SIZE = (4, 5)
+FRAME_SHAPE = (16, 16)
+HEADER_SIZE = 384
+
+
+def _write_mib(path, first_frame, frames):
+    with open(path, "wb") as f:
+        for idx, frame in enumerate(frames):
+            header = "MQ1,%06d,%05d,01,%04d,%04d,U16,   1x1,01" % (
+                first_frame + idx, HEADER_SIZE, frame.shape[1], frame.shape[0],
+            )
+            f.write(header.encode("ascii").ljust(HEADER_SIZE, b"\0"))
+            f.write(frame.astype(">u2").tobytes())
+
+
+@pytest.fixture(params=[1, 7])
+def mib_files(request, tmpdir):
+    frames_per_file = request.param
+    num_frames = SCAN_SIZE[0] * SCAN_SIZE[1]
+    data = np.random.randint(0, 4096, size=(num_frames,) + FRAME_SHAPE).astype(np.uint16)
+    paths = []
+    for idx, start in enumerate(range(0, num_frames, frames_per_file)):
+        path = str(tmpdir.join("default%d.mib" % (idx + 1)))
+        _write_mib(path, start + 1, data[start:start + frames_per_file])
+        paths.append(path)
+    return paths, data
+
+
+def _mk_ds(paths, **kwargs):
+    return MIBDataSet(
+        path=paths[0], tileshape=(1, 8) + FRAME_SHAPE, scan_size=SCAN_SIZE, **kwargs
+    ).initialize()
+
+
+def test_read(mib_files):
+    paths, data = mib_files
+    ds = _mk_ds(paths, num_threads=4)
+    ds.check_valid()
+    result = np.zeros_like(data)
+    partitions = list(ds.get_partitions())
+    assert len(partitions) <= len(paths)
+    for partition in partitions:
+        for tile in partition.get_tiles():
+            result[tile.tile_slice.get()] = tile.data
+    assert np.all(result == data)
+
+
+def test_read_cropped(mib_files):
+    paths, data = mib_files
+    ds = _mk_ds(paths)
+    crop_to = Slice(origin=(5, 2, 3), shape=Shape((10, 8, 4), sig_dims=2))
+    result = np.zeros((10, 8, 4), dtype=data.dtype)
+    for partition in ds.get_partitions():
+        for tile in partition.get_tiles(crop_to=crop_to):
+            intersection = tile.tile_slice.intersection_with(crop_to)
+            in_tile = intersection.shift(tile.tile_slice).get()
+            result[intersection.shift(crop_to).get()] = tile.data[in_tile]
+    assert np.all(result == data[5:15, 2:10, 3:7])
+
+
+def test_header_index(mib_files, monkeypatch):
+    paths, data = mib_files
+    prefix = os.path.join(os.path.dirname(paths[0]), "default")
+    headers = scan_headers(prefix, paths)
+    assert len(headers) == len(paths)
+
+    read = []
+    read_headers = mib.read_headers
+
+    def _read_headers(paths, num_threads=None):
+        read.extend(paths)
+        return read_headers(paths, num_threads)
+
+    monkeypatch.setattr(mib, "read_headers", _read_headers)
+    assert scan_headers(prefix, paths) == headers
+    assert read == []
+    _mk_ds(paths).check_valid()
+    assert read == []
+
+    stat = os.stat(paths[-1])
+    os.utime(paths[-1], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert scan_headers(prefix, paths) == headers
+    assert read == [paths[-1]]
+
+
+def test_zero_copy(tmpdir):
+    data = np.random.randint(0, 4096, size=(20,) + FRAME_SHAPE).astype(np.uint16)
+    path = str(tmpdir.join("default1.mib"))
+    _write_mib(path, 1, data)
+    ds = _mk_ds([path])
+    result = np.zeros_like(data)
+    for partition in ds.get_partitions():
+        for tile in partition.get_tiles():
+            # a strided view of the file, skipping the headers:
+            assert isinstance(tile.data, np.memmap)
+            assert tile.data.strides[0] == HEADER_SIZE + data[0].nbytes
+            result[tile.tile_slice.get()] = tile.data
+    assert np.all(result == data)
+
+
+def test_many_files_few_maps(mib_files, monkeypatch):
+    paths, data = mib_files
+    monkeypatch.setattr(mib.MIBFileSet, "max_open_maps", 2)
+    ds = _mk_ds(paths)
+    result = np.zeros_like(data)
+    for partition in ds.get_partitions():
+        for tile in partition.get_tiles():
+            result[tile.tile_slice.get()] = tile.data
+        assert len(partition._fileset._maps) == 0
+    assert np.all(result == data)
+
+
+def test_progressive_reads_each_frame_once(mib_files, lt_ctx, monkeypatch):
+    paths, data = mib_files
+    frames_read = []
+    get_view = MIBFileSet.get_view
+    read_images = MIBFileSet.read_images
+
+    def _get_view(self, start, stop, *args, **kwargs):
+        view = get_view(self, start, stop, *args, **kwargs)
+        if view is not None:
+            frames_read.append(stop - start)
+        return view
+
+    def _read_images(self, start, stop, *args, **kwargs):
+        frames_read.append(stop - start)
+        return read_images(self, start, stop, *args, **kwargs)
+
+    monkeypatch.setattr(MIBFileSet, "get_view", _get_view)
+    monkeypatch.setattr(MIBFileSet, "read_images", _read_images)
+
+    ds = _mk_ds(paths)
+    partials = list(lt_ctx.run_progressive(SumFramesJob(dataset=ds)))
+    assert sum(frames_read) == data.shape[0]
+    assert np.allclose(partials[-1].result, data.sum(axis=0))
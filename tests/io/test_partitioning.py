@@ -0,0 +1,77 @@
+import pytest
+import numpy as np
+
+from libertem.io.utils import get_num_partitions, get_partition_ranges, get_partition_shape
+from libertem.common import Slice, Shape
+
+
+def test_num_partitions_multiple_of_workers():
+    # 10 partitions by size, rounded up to a multiple of 4 workers:
+    assert get_num_partitions(
+        num_frames=100, framesize=1, dtype="uint8", target_size=10, min_num_partitions=4
+    ) == 12
+    # no more partitions than frames:
+    assert get_num_partitions(
+        num_frames=3, framesize=1, dtype="uint8", target_size=1, min_num_partitions=4
+    ) == 3
+
+
+def test_ranges_are_balanced():
+    ranges = get_partition_ranges(
+        num_frames=10, framesize=1, dtype="uint8", target_size=100, min_num_partitions=4
+    )
+    assert ranges[0][0] == 0
+    assert ranges[-1][1] == 10
+    assert all(a[1] == b[0] for a, b in zip(ranges, ranges[1:]))
+    lengths = [stop - start for start, stop in ranges]
+    assert len(lengths) == 4
+    assert max(lengths) - min(lengths) <= 1
+
+
+def test_whole_rows():
+    pshape = get_partition_shape(
+        datashape=(16, 16, 128, 128), framesize=128*128, dtype="float32",
+        target_size=256*1024*1024, min_num_partitions=4,
+    )
+    assert pshape == (4, 16, 128, 128)
+
+
+def test_split_rows():
+    datashape = (2, 256, 16, 16)
+    pshape = get_partition_shape(
+        datashape=datashape, framesize=16*16, dtype="float32",
+        target_size=256*1024*1024, min_num_partitions=8,
+    )
+    assert pshape == (1, 64, 16, 16)
+    ds_slice = Slice(origin=(0, 0, 0, 0), shape=Shape(datashape, sig_dims=2))
+    assert len(list(ds_slice.subslices(pshape))) == 8
+
+
+def test_split_rows_covers_dataset():
+    datashape = (3, 10, 16, 16)
+    pshape = get_partition_shape(
+        datashape=datashape, framesize=16*16, dtype="float32",
+        target_size=256*1024*1024, min_num_partitions=7,
+    )
+    ds_slice = Slice(origin=(0, 0, 0, 0), shape=Shape(datashape, sig_dims=2))
+    covered = np.zeros(datashape[:2], dtype=int)
+    for pslice in ds_slice.subslices(pshape):
+        covered[pslice.get(nav_only=True)] += 1
+    assert np.all(covered == 1)
+
+
+@pytest.mark.parametrize("datashape,min_num_partitions", [
+    ((12, 16, 16, 16), 8),
+    ((15, 16, 16, 16), 8),
+    ((16, 16, 16, 16), 3),
+    ((2, 10, 16, 16), 12),
+    ((3, 10, 16, 16), 7),
+    ((5, 5, 16, 16), 25),
+])
+def test_at_least_min_num_partitions(datashape, min_num_partitions):
+    pshape = get_partition_shape(
+        datashape=datashape, framesize=16*16, dtype="float32",
+        target_size=256*1024*1024, min_num_partitions=min_num_partitions,
+    )
+    ds_slice = Slice(origin=(0, 0, 0, 0), shape=Shape(datashape, sig_dims=2))
+    assert len(list(ds_slice.subslices(pshape))) >= min_num_partitions
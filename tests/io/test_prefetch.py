@@ -0,0 +1,78 @@
+import threading
+
+import numpy as np
+import pytest
+
+from libertem.io.dataset.base import DataTile, prefetch_tiles
+from libertem.common import Slice, Shape
+
+from utils import MemoryDataSet, _mk_random
+
+
+def _reusing_tiles(data):
+    """
+    yields tiles for each frame of ``data``, re-using a single buffer like the readers do
+    """
+    buf = np.zeros(data.shape[1:], dtype=data.dtype)
+    for idx in range(data.shape[0]):
+        buf[:] = data[idx]
+        yield DataTile(
+            data=buf.reshape((1,) + buf.shape),
+            tile_slice=Slice(
+                origin=(idx, 0, 0),
+                shape=Shape((1,) + data.shape[1:], sig_dims=2),
+            ),
+        )
+
+
+@pytest.mark.parametrize("depth", [1, 2, 3])
+def test_prefetch_tiles(depth):
+    data = _mk_random(size=(16, 8, 8))
+    num_tiles = 0
+    for tile in prefetch_tiles(_reusing_tiles(data), depth=depth):
+        idx = tile.tile_slice.origin[0]
+        assert np.allclose(tile.data[0], data[idx])
+        assert idx == num_tiles
+        num_tiles += 1
+    assert num_tiles == 16
+
+
+def test_prefetch_tiles_error():
+    def _failing():
+        yield from _reusing_tiles(_mk_random(size=(2, 8, 8)))
+        raise ValueError("read error")
+
+    tiles = prefetch_tiles(_failing(), depth=2)
+    next(tiles)
+    next(tiles)
+    with pytest.raises(ValueError):
+        next(tiles)
+
+
+def test_prefetch_tiles_stop_early():
+    closed = threading.Event()
+
+    def _tiles():
+        try:
+            yield from _reusing_tiles(_mk_random(size=(16, 8, 8)))
+        finally:
+            closed.set()
+
+    tiles = prefetch_tiles(_tiles(), depth=2)
+    next(tiles)
+    tiles.close()
+    assert closed.is_set()
+
+
+def test_dataset_prefetch(lt_ctx):
+    data = _mk_random(size=(16, 16, 16, 16))
+    dataset = MemoryDataSet(data=data, tileshape=(1, 4, 16, 16), partition_shape=(4, 16, 16, 16))
+    dataset.set_prefetch_depth(2)
+    mask = _mk_random(size=(16, 16))
+    job = lt_ctx.create_mask_job(dataset=dataset, factories=[lambda: mask])
+    results = lt_ctx.run(job)
+    assert np.allclose(
+        results[0],
+        np.sum(data * mask, axis=(2, 3)),
+        rtol=1e-4,
+    )
@@ -0,0 +1,107 @@
+import json
+
+import numpy as np
+import pytest
+
+from libertem.common import Shape
+from libertem.io import tiling
+from libertem.io.dataset.hdf5 import H5DataSet
+from utils import MemoryDataSet
+from libertem.job.sum import SumFramesJob
+
+
+def test_stack_frames():
+    shape = Shape((16, 16, 128, 128), sig_dims=2)
+    # 128*128*4 bytes per frame -> 8 frames
+    tileshape = tiling.negotiate_tileshape(shape, "float32", target_size=8*64*1024)
+    assert tuple(tileshape) == (1, 8, 128, 128)
+
+
+def test_cross_rows():
+    shape = Shape((16, 16, 128, 128), sig_dims=2)
+    tileshape = tiling.negotiate_tileshape(shape, "float32", target_size=40*64*1024)
+    assert tuple(tileshape) == (2, 16, 128, 128)
+    tileshape = tiling.negotiate_tileshape(
+        shape, "float32", target_size=40*64*1024, cross_rows=False
+    )
+    assert tuple(tileshape) == (1, 16, 128, 128)
+
+
+def test_integer_data_is_sized_as_float():
+    shape = Shape((16, 16, 128, 128), sig_dims=2)
+    tileshape = tiling.negotiate_tileshape(shape, "uint8", target_size=8*64*1024)
+    assert tuple(tileshape) == (1, 8, 128, 128)
+
+
+def test_split_large_frames():
+    shape = Shape((16, 16, 1024, 1024), sig_dims=2)
+    tileshape = tiling.negotiate_tileshape(shape, "float32", target_size=1024*1024)
+    assert tuple(tileshape) == (1, 1, 256, 1024)
+    tileshape = tiling.negotiate_tileshape(
+        shape, "float32", target_size=1024*1024, whole_frames=True
+    )
+    assert tuple(tileshape) == (1, 1, 1024, 1024)
+
+
+def test_align_to_chunks():
+    shape = Shape((16, 16, 128, 128), sig_dims=2)
+    # stack of 12 frames is cut down to the chunk boundary:
+    tileshape = tiling.negotiate_tileshape(
+        shape, "float32", target_size=12*64*1024, chunks=(1, 8, 128, 128),
+    )
+    assert tuple(tileshape) == (1, 8, 128, 128)
+    # don't read partial chunks:
+    tileshape = tiling.negotiate_tileshape(
+        shape, "float32", target_size=2*64*1024, chunks=(2, 4, 128, 128),
+    )
+    assert tuple(tileshape) == (2, 4, 128, 128)
+
+
+def test_target_size_by_consumer():
+    cache_sizes = {"L2": 1024*1024, "L3": 16*1024*1024}
+    assert tiling.get_target_size("sum", cache_sizes=cache_sizes, calibration={}) == 512*1024
+    assert tiling.get_target_size("mask", cache_sizes=cache_sizes, calibration={}) == 4*1024*1024
+    assert tiling.get_target_size(
+        "mask", cache_sizes=cache_sizes, calibration={"mask": 1234}
+    ) == 1234
+    with pytest.raises(ValueError):
+        tiling.get_target_size("nope", cache_sizes=cache_sizes, calibration={})
+
+
+def test_calibration_roundtrip(tmpdir):
+    path = str(tmpdir.join("tiling.json"))
+    assert tiling.load_calibration(path=path, host="a") == {}
+    tiling.save_calibration({"sum": 1024, "mask": 2048}, path=path, host="a")
+    tiling.save_calibration({"sum": 4096}, path=path, host="b")
+    assert tiling.load_calibration(path=path, host="a") == {"sum": 1024, "mask": 2048}
+    assert tiling.load_calibration(path=path, host="b") == {"sum": 4096}
+    with open(path) as f:
+        assert set(json.load(f).keys()) == {"a", "b"}
+
+
+def test_hdf5_without_tileshape(lt_ctx, hdf5):
+    ds = H5DataSet(path=hdf5.filename, ds_path="data")
+    ds.initialize()
+    job = SumFramesJob(dataset=ds)
+    result = lt_ctx.run(job)
+    assert np.allclose(result, hdf5["data"][:].sum(axis=(0, 1)))
+
+    p = next(ds.get_partitions())
+    tiles = list(p.get_tiles(consumer="sum"))
+    assert sum(t.tile_slice.shape.nav.size for t in tiles) == p.shape.nav.size
+
+
+def test_memory_dataset_keeps_tileshape():
+    data = np.ones((4, 4, 16, 16))
+    ds = MemoryDataSet(data=data, tileshape=(1, 2, 16, 16), partition_shape=(4, 4, 16, 16))
+    p = next(ds.get_partitions())
+    assert tuple(next(p.iter_tiles(consumer="sum")).tile_slice.shape) == (1, 2, 16, 16)
+
+
+def test_raw_consumer_is_not_stored(default_raw):
+    p = next(default_raw.get_partitions())
+    tiles = list(p.iter_tiles(consumer="sum"))
+    assert sum(t.tile_slice.shape.nav.size for t in tiles) == p.shape.nav.size
+    # without a consumer, the default tileshape is the whole partition:
+    assert not hasattr(p, "consumer")
+    assert tuple(next(p.get_tiles()).tile_slice.shape) == tuple(p.shape)
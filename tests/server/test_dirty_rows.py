@@ -0,0 +1,33 @@
+import numpy as np
+
+from libertem.job.base import SharedResultTile
+from libertem.job.fused import FusedResultTile
+from libertem.job.masks import MaskResultTile
+from libertem.job.sum import SumResultTile
+from libertem.web.server import get_dirty_rows
+
+from utils import MemoryDataSet
+
+
+def test_dirty_rows_from_mask_tiles():
+    data = np.zeros((4, 8, 4, 4), dtype=np.float32)
+    dataset = MemoryDataSet(data=data, tileshape=(1, 4, 4), partition_shape=(1, 8, 4, 4))
+    tiles = [
+        MaskResultTile(data=None, dest_slice=(slice(1, 2), slice(0, 8))),
+        MaskResultTile(data=None, dest_slice=(slice(3, 4), slice(0, 8))),
+        SumResultTile(data=None),
+    ]
+    assert get_dirty_rows(tiles, dataset) == {1, 3}
+    assert get_dirty_rows([FusedResultTile(results={0: tiles})], dataset) == {1, 3}
+    assert get_dirty_rows(tiles + [SharedResultTile()], dataset) is None
+
+
+def test_dirty_rows_reshaped_nav():
+    # the raw navigation grid is flat, the dataset has rows of 8 frames:
+    data = np.zeros((32, 4, 4), dtype=np.float32)
+    dataset = MemoryDataSet(
+        data=data, tileshape=(1, 4, 4), partition_shape=(4, 4, 4),
+        effective_shape=(4, 8, 4, 4),
+    )
+    tiles = [MaskResultTile(data=None, dest_slice=(slice(6, 10),))]
+    assert get_dirty_rows(tiles, dataset) == {0, 1}
@@ -0,0 +1,63 @@
+import zlib
+from io import BytesIO
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from libertem.analysis.base import AnalysisResult
+from libertem.viz import visualize_simple
+from libertem.web.encoding import ImageEncoder, IMAGE_FORMATS
+
+
+def _mk_result(data):
+    return AnalysisResult(
+        raw_data=data, visualized=visualize_simple(data),
+        title="intensity", desc="", key="intensity",
+    )
+
+
+@pytest.mark.parametrize("image_format", sorted(IMAGE_FORMATS.keys()))
+def test_formats(image_format):
+    visualized = visualize_simple(np.random.random((32, 48)))
+    encoded = IMAGE_FORMATS[image_format](visualized)
+    if image_format == "rgba-zlib":
+        decoded = np.frombuffer(zlib.decompress(encoded), dtype=np.uint8).reshape((32, 48, 4))
+        assert np.all(decoded == visualized)
+    else:
+        im = Image.open(BytesIO(encoded))
+        assert im.size == (48, 32)
+        if image_format == "png":
+            assert np.all(np.asarray(im) == visualized)
+
+
+def test_rgb_input():
+    rgb = np.random.randint(0, 255, size=(8, 8, 3), dtype=np.uint8)
+    decoded = np.frombuffer(
+        zlib.decompress(IMAGE_FORMATS["rgba-zlib"](rgb)), dtype=np.uint8
+    ).reshape((8, 8, 4))
+    assert np.all(decoded[..., :3] == rgb)
+    assert np.all(decoded[..., 3] == 255)
+
+
+@pytest.mark.asyncio
+async def test_skip_unchanged():
+    encoder = ImageEncoder(max_workers=2)
+    try:
+        data = np.random.random((16, 16))
+        results = [_mk_result(data), _mk_result(data * 2 + 1)]
+        first = await encoder.encode(results, image_format="png", job_id="job")
+        assert encoder.num_encoded == 2
+
+        # only the changed image is encoded again:
+        results[1] = _mk_result(np.random.random((16, 16)))
+        second = await encoder.encode(results, image_format="png", job_id="job")
+        assert encoder.num_encoded == 3
+        assert second[0] == first[0]
+        assert second[1] != first[1]
+
+        encoder.forget("job")
+        await encoder.encode(results, image_format="png", job_id="job")
+        assert encoder.num_encoded == 5
+    finally:
+        encoder.close()
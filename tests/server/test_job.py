@@ -1,4 +1,5 @@
 import json
+import zlib
 
 import pytest
 import websockets
@@ -104,6 +105,94 @@ async def test_run_job_1_sum(default_raw, base_url, http_client, server_port):
             assert_msg(await resp.json(), 'CANCEL_JOB')
 
 
+@pytest.mark.asyncio
+async def test_run_job_fused(default_raw, base_url, http_client, server_port):
+    conn_url = "{}/api/config/connection/".format(base_url)
+    conn_details = {
+        'connection': {
+            'type': 'local',
+            'numWorkers': 2,
+        }
+    }
+    async with http_client.put(conn_url, json=conn_details) as response:
+        assert response.status == 200
+        assert (await response.json())['status'] == 'ok'
+
+    # connect to ws endpoint:
+    ws_url = "ws://127.0.0.1:{}/api/events/".format(server_port)
+    async with websockets.connect(ws_url) as ws:
+        initial_msg = json.loads(await ws.recv())
+        assert_msg(initial_msg, 'INITIAL_STATE')
+
+        ds_uuid = "ae5d23bd-1f2a-4c57-bab2-dfc59a1219f3"
+        ds_url = "{}/api/datasets/{}/".format(
+            base_url, ds_uuid
+        )
+        ds_data = _get_raw_params(default_raw._path)
+        async with http_client.put(ds_url, json=ds_data) as resp:
+            assert resp.status == 200
+            resp_json = await resp.json()
+            assert_msg(resp_json, 'CREATE_DATASET')
+
+        # same msg via ws:
+        msg = json.loads(await ws.recv())
+        assert_msg(msg, 'CREATE_DATASET')
+
+        job_uuid = "229faa20-d146-46c1-af8c-32e303531322"
+        job_url = "{}/api/jobs/{}/".format(base_url, job_uuid)
+        job_data = {
+            "job": {
+                "dataset": ds_uuid,
+                "analyses": [
+                    {
+                        "type": "SUM_FRAMES",
+                        "parameters": {}
+                    },
+                    {
+                        "type": "APPLY_DISK_MASK",
+                        "parameters": {"cx": 64, "cy": 64, "r": 20}
+                    },
+                ]
+            }
+        }
+        async with http_client.put(job_url, json=job_data) as resp:
+            assert resp.status == 200
+            resp_json = await resp.json()
+            assert resp_json['status'] == "ok"
+
+        msg = json.loads(await ws.recv())
+        assert_msg(msg, 'JOB_STARTED')
+        assert msg['job'] == job_uuid
+        assert msg['details']['dataset'] == ds_uuid
+        assert msg['details']['id'] == job_uuid
+
+        done = False
+        while not done:
+            msg = json.loads(await ws.recv())
+            if msg['messageType'] == 'TASK_RESULT':
+                assert_msg(msg, 'TASK_RESULT')
+                assert msg['job'] == job_uuid
+            elif msg['messageType'] == 'FINISH_JOB':
+                done = True  # but we still need to check followup messages below
+                # one result image for each analysis:
+                assert msg['followup']['numMessages'] == 2
+            elif msg['messageType'] == 'JOB_ERROR':
+                raise Exception('JOB_ERROR: {}'.format(msg['msg']))
+            else:
+                raise Exception("invalid message type: {}".format(msg['messageType']))
+
+            if 'followup' in msg:
+                for i in range(msg['followup']['numMessages']):
+                    msg = await ws.recv()
+                    # followups should be PNG encoded:
+                    assert msg[:8] == b'\x89\x50\x4E\x47\x0D\x0A\x1A\x0A'
+
+        # we are done with this job, clean up:
+        async with http_client.delete(job_url) as resp:
+            assert resp.status == 200
+            assert_msg(await resp.json(), 'CANCEL_JOB')
+
+
 @pytest.mark.asyncio
 async def test_cancel_unknown_job(default_raw, base_url, http_client, server_port):
     conn_url = "{}/api/config/connection/".format(base_url)
@@ -130,3 +219,136 @@ async def test_cancel_unknown_job(default_raw, base_url, http_client, server_por
         async with http_client.delete(job_url) as resp:
             assert resp.status == 200
             assert_msg(await resp.json(), 'CANCEL_JOB_FAILED', status='error')
+
+
+@pytest.mark.asyncio
+async def test_run_job_progressive(default_raw, base_url, http_client, server_port):
+    conn_url = "{}/api/config/connection/".format(base_url)
+    conn_details = {
+        'connection': {
+            'type': 'local',
+            'numWorkers': 2,
+        }
+    }
+    async with http_client.put(conn_url, json=conn_details) as response:
+        assert response.status == 200
+
+    ws_url = "ws://127.0.0.1:{}/api/events/".format(server_port)
+    async with websockets.connect(ws_url) as ws:
+        initial_msg = json.loads(await ws.recv())
+        assert_msg(initial_msg, 'INITIAL_STATE')
+
+        ds_uuid = "ae5d23bd-1f2a-4c57-bab2-dfc59a1219f3"
+        ds_url = "{}/api/datasets/{}/".format(
+            base_url, ds_uuid
+        )
+        ds_data = _get_raw_params(default_raw._path)
+        async with http_client.put(ds_url, json=ds_data) as resp:
+            assert resp.status == 200
+        msg = json.loads(await ws.recv())
+        assert_msg(msg, 'CREATE_DATASET')
+
+        job_uuid = "229faa20-d146-46c1-af8c-32e303531322"
+        job_url = "{}/api/jobs/{}/".format(base_url, job_uuid)
+        job_data = {
+            "job": {
+                "dataset": ds_uuid,
+                "progressive": True,
+                "analysis": {
+                    "type": "APPLY_RING_MASK",
+                    "parameters": {
+                        "cx": 64,
+                        "cy": 64,
+                        "ri": 0,
+                        "ro": 32,
+                    }
+                }
+            }
+        }
+        async with http_client.put(job_url, json=job_data) as resp:
+            assert resp.status == 200
+            assert (await resp.json())['status'] == "ok"
+
+        msg = json.loads(await ws.recv())
+        assert_msg(msg, 'JOB_STARTED')
+
+        num_task_results = 0
+        done = False
+        while not done:
+            msg = json.loads(await ws.recv())
+            if msg['messageType'] == 'TASK_RESULT':
+                num_task_results += 1
+            elif msg['messageType'] == 'FINISH_JOB':
+                done = True
+            elif msg['messageType'] == 'JOB_ERROR':
+                raise Exception('JOB_ERROR: {}'.format(msg['msg']))
+            if 'followup' in msg:
+                for i in range(msg['followup']['numMessages']):
+                    await ws.recv()
+        # one preview after each of the passes with strides 8, 4 and 2:
+        assert num_task_results == 3
+
+        async with http_client.delete(job_url) as resp:
+            assert resp.status == 200
+
+
+@pytest.mark.asyncio
+async def test_run_job_rgba_zlib(default_raw, base_url, http_client, server_port):
+    conn_url = "{}/api/config/connection/".format(base_url)
+    conn_details = {
+        'connection': {
+            'type': 'local',
+            'numWorkers': 2,
+        }
+    }
+    async with http_client.put(conn_url, json=conn_details) as response:
+        assert response.status == 200
+
+    ws_url = "ws://127.0.0.1:{}/api/events/?format=rgba-zlib".format(server_port)
+    async with websockets.connect(ws_url) as ws:
+        initial_msg = json.loads(await ws.recv())
+        assert_msg(initial_msg, 'INITIAL_STATE')
+
+        ds_uuid = "ae5d23bd-1f2a-4c57-bab2-dfc59a1219f3"
+        ds_url = "{}/api/datasets/{}/".format(
+            base_url, ds_uuid
+        )
+        ds_data = _get_raw_params(default_raw._path)
+        async with http_client.put(ds_url, json=ds_data) as resp:
+            assert resp.status == 200
+        msg = json.loads(await ws.recv())
+        assert_msg(msg, 'CREATE_DATASET')
+
+        job_uuid = "229faa20-d146-46c1-af8c-32e303531322"
+        job_url = "{}/api/jobs/{}/".format(base_url, job_uuid)
+        job_data = {
+            "job": {
+                "dataset": ds_uuid,
+                "analysis": {
+                    "type": "SUM_FRAMES",
+                    "parameters": {}
+                }
+            }
+        }
+        async with http_client.put(job_url, json=job_data) as resp:
+            assert resp.status == 200
+
+        msg = json.loads(await ws.recv())
+        assert_msg(msg, 'JOB_STARTED')
+
+        done = False
+        while not done:
+            msg = json.loads(await ws.recv())
+            if msg['messageType'] == 'FINISH_JOB':
+                done = True
+            elif msg['messageType'] == 'JOB_ERROR':
+                raise Exception('JOB_ERROR: {}'.format(msg['msg']))
+            for description in msg['followup']['descriptions']:
+                raw = zlib.decompress(await ws.recv())
+                height, width = description['shape']
+                assert len(raw) == height * width * 4
+        # the sum over frames has the shape of the detector:
+        assert description['shape'] == [128, 128]
+
+        async with http_client.delete(job_url) as resp:
+            assert resp.status == 200
@@ -26,7 +26,7 @@ async def test_get_config(base_url, http_client):
         config = await response.json()
         assert set(config.keys()) == set(["status", "messageType", "config"])
         assert set(config['config'].keys()) == set([
-            "version", "revision", "localCores", "cwd", "separator"
+            "version", "revision", "localCores", "cwd", "separator", "imageFormats"
         ])
 
 
@@ -1,7 +1,10 @@
 import pytest
+import numpy as np
 
 from libertem.analysis.base import AnalysisResultSet, AnalysisResult
 
+from utils import MemoryDataSet, _mk_random
+
 
 def test_result_set():
     result = AnalysisResult(
@@ -22,3 +25,21 @@ def test_result_set():
     assert results.test == result
     assert len(results) == 1
     assert results[0] == result
+
+
+def test_visualizers_only_kept_for_previews(lt_ctx):
+    data = _mk_random(size=(16, 16, 16, 16), dtype="float32")
+    dataset = MemoryDataSet(data=data, tileshape=(1, 1, 16, 16), partition_shape=(4, 16, 16, 16))
+    analysis = lt_ctx.create_ring_analysis(dataset=dataset)
+
+    job = analysis.get_job()
+    job_results = lt_ctx.run(job)
+    results = analysis.get_results(job_results)
+    assert analysis._visualizers is None
+
+    preview = analysis.get_preview_results(job_results, dirty_rows=np.arange(4))
+    assert analysis._visualizers is not None
+    np.testing.assert_equal(preview.intensity.visualized, results.intensity.visualized)
+
+    analysis.end_preview()
+    assert analysis._visualizers is None
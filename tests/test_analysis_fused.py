@@ -0,0 +1,105 @@
+import numpy as np
+
+from libertem.analysis import FusedAnalysis
+
+from utils import MemoryDataSet, _mk_random
+
+
+class CountingMemoryDataSet(MemoryDataSet):
+    """
+    MemoryDataSet that counts how often tiles are read
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.tiles_read = 0
+
+    def get_partitions(self):
+        for partition in super().get_partitions():
+            partition.get_tiles = self._counting(partition.get_tiles)
+            yield partition
+
+    def _counting(self, get_tiles):
+        def _get_tiles(*args, **kwargs):
+            for tile in get_tiles(*args, **kwargs):
+                self.tiles_read += 1
+                yield tile
+        return _get_tiles
+
+
+def test_run_many_matches_run(lt_ctx):
+    data = _mk_random(size=(16, 16, 16, 16), dtype='<u2')
+    dataset = MemoryDataSet(data=data, tileshape=(1, 8, 16, 16), partition_shape=(4, 16, 16, 16))
+
+    analyses = [
+        lt_ctx.create_sum_analysis(dataset=dataset),
+        lt_ctx.create_com_analysis(dataset=dataset, cx=8, cy=8, mask_radius=6),
+        lt_ctx.create_ring_analysis(dataset=dataset, cx=8, cy=8, ri=2, ro=6),
+        lt_ctx.create_disk_analysis(dataset=dataset, cx=8, cy=8, r=4),
+        lt_ctx.create_pick_analysis(dataset=dataset, x=3, y=7),
+    ]
+
+    fused_results = lt_ctx.run_many(analyses)
+    assert len(fused_results) == len(analyses)
+
+    for analysis, fused_result in zip(analyses, fused_results):
+        expected = lt_ctx.run(analysis)
+        assert len(expected) == len(fused_result)
+        for expected_item, fused_item in zip(expected, fused_result):
+            assert expected_item.key == fused_item.key
+            assert np.allclose(expected_item.raw_data, fused_item.raw_data)
+
+
+def test_run_many_jobs(lt_ctx):
+    data = _mk_random(size=(16, 16, 16, 16), dtype='float32')
+    dataset = MemoryDataSet(data=data, tileshape=(1, 8, 16, 16), partition_shape=(4, 16, 16, 16))
+    mask = _mk_random(size=(16, 16), dtype='float32')
+
+    mask_job = lt_ctx.create_mask_job(factories=[lambda: mask], dataset=dataset)
+    pick_job = lt_ctx.create_pick_job(dataset=dataset, origin=(5, 5))
+
+    mask_result, pick_result = lt_ctx.run_many([mask_job, pick_job])
+
+    assert np.allclose(mask_result[0], np.sum(data * mask, axis=(2, 3)), rtol=1e-5)
+    assert np.allclose(pick_result, data[5, 5])
+
+
+def test_run_many_reads_tiles_once(lt_ctx):
+    data = _mk_random(size=(16, 16, 16, 16), dtype='float32')
+    dataset = CountingMemoryDataSet(
+        data=data, tileshape=(1, 8, 16, 16), partition_shape=(4, 16, 16, 16)
+    )
+
+    analyses = [
+        lt_ctx.create_sum_analysis(dataset=dataset),
+        lt_ctx.create_disk_analysis(dataset=dataset, cx=8, cy=8, r=4),
+        lt_ctx.create_ring_analysis(dataset=dataset, cx=8, cy=8, ri=2, ro=6),
+    ]
+    lt_ctx.run_many(analyses)
+    # 16 * 16 frames, 8 frames per tile:
+    assert dataset.tiles_read == 32
+
+
+def test_fused_analysis_concatenates_results(lt_ctx):
+    data = _mk_random(size=(16, 16, 16, 16), dtype='float32')
+    dataset = MemoryDataSet(data=data, tileshape=(1, 8, 16, 16), partition_shape=(4, 16, 16, 16))
+
+    analysis = FusedAnalysis(dataset=dataset, analyses=[
+        lt_ctx.create_sum_analysis(dataset=dataset),
+        lt_ctx.create_disk_analysis(dataset=dataset, cx=8, cy=8, r=4),
+    ])
+    results = lt_ctx.run(analysis)
+    assert [r.key for r in results] == ["intensity", "intensity"]
+    assert np.allclose(results[0].raw_data, data.sum(axis=(0, 1)))
+
+
+def test_run_many_diagnostics(lt_ctx):
+    data = _mk_random(size=(16, 16, 16, 16), dtype='<u2')
+    dataset = MemoryDataSet(data=data, tileshape=(1, 8, 16, 16), partition_shape=(4, 16, 16, 16))
+    mask = _mk_random(size=(16, 16))
+    jobs = [
+        lt_ctx.create_mask_job(dataset=dataset, factories=[lambda: mask], use_sparse=False),
+        lt_ctx.create_mask_job(dataset=dataset, factories=[lambda: mask], use_sparse=True),
+    ]
+    lt_ctx.run_many(jobs)
+    assert jobs[0].diagnostics["mask_backend"]["dense"] == [0]
+    assert jobs[1].diagnostics["mask_backend"]["sparse"] == [0]
@@ -2,6 +2,7 @@ import pytest
 import numpy as np
 import scipy.sparse as sp
 from libertem.masks import to_dense, to_sparse
+from libertem.job.masks import choose_mask_backend
 from utils import MemoryDataSet, _naive_mask_apply, _mk_random
 
 
@@ -409,3 +410,87 @@ def test_numerics(lt_ctx):
 
     assert np.allclose(expected, naive)
     assert np.allclose(expected[0], results.mask_0.raw_data)
+
+
+def test_choose_mask_backend():
+    # single frames with very sparse masks: sparse is cheaper
+    backend = choose_mask_backend(nnz=[1, 2], sig_size=1024*1024, num_frames=1)
+    assert backend["sparse"] == [0, 1]
+    assert backend["dense"] == []
+
+    # stacks of frames with full masks: dense is cheaper
+    backend = choose_mask_backend(nnz=[1024*1024] * 3, sig_size=1024*1024, num_frames=16)
+    assert backend["sparse"] == []
+    assert backend["dense"] == [0, 1, 2]
+
+    # mixed: split into groups
+    backend = choose_mask_backend(nnz=[1024*1024, 1, 1024*1024], sig_size=1024*1024, num_frames=1)
+    assert backend["sparse"] == [1]
+    assert backend["dense"] == [0, 2]
+
+
+def test_uses_sparse_auto_split(lt_ctx):
+    data = _mk_random(size=(2, 2, 512, 512), dtype="float32")
+    mask0 = _mk_random(size=(512, 512))
+    points = []
+    for idx in range(4):
+        point = np.zeros((512, 512))
+        point[idx, idx] = 1
+        points.append(point)
+    masks = [mask0] + points
+    expected = _naive_mask_apply(masks, data)
+
+    dataset = MemoryDataSet(
+        data=data, tileshape=(1, 1, 512, 512), partition_shape=(2, 2, 512, 512)
+    )
+    job = lt_ctx.create_mask_job(
+        dataset=dataset, factories=[lambda m=m: m for m in masks], use_sparse="auto"
+    )
+    results = lt_ctx.run(job)
+
+    assert np.allclose(results, expected)
+    backend = job.diagnostics["mask_backend"]
+    assert backend["auto"]
+    assert backend["dense"] == [0]
+    assert backend["sparse"] == [1, 2, 3, 4]
+
+
+def test_mask_backend_diagnostics(lt_ctx):
+    data = _mk_random(size=(16, 16, 16, 16), dtype="<u2")
+    mask0 = _mk_random(size=(16, 16))
+    dataset = MemoryDataSet(data=data, tileshape=(4, 4, 16, 16), partition_shape=(16, 16, 16, 16))
+    job = lt_ctx.create_mask_job(
+        dataset=dataset, factories=[lambda: mask0], use_sparse=False
+    )
+    lt_ctx.run(job)
+    assert job.diagnostics["mask_backend"] == {"auto": False, "dense": [0], "sparse": []}
+
+
+def test_uses_sparse_auto_sparse_factories(lt_ctx):
+    data = _mk_random(size=(4, 4, 32, 32), dtype="float32")
+    masks = [
+        sp.csr_matrix(((1,), ((3,), (7,))), shape=(32, 32), dtype=np.float32),
+        sp.csr_matrix(_mk_random(size=(32, 32), dtype="float32")),
+    ]
+    expected = _naive_mask_apply([to_dense(m) for m in masks], data)
+    dataset = MemoryDataSet(
+        data=data, tileshape=(1, 4, 32, 32), partition_shape=(2, 4, 32, 32)
+    )
+    job = lt_ctx.create_mask_job(
+        dataset=dataset, factories=[lambda m=m: m for m in masks], use_sparse="auto"
+    )
+    assert job.masks.shape == (32 * 32, 2)
+    results = lt_ctx.run(job)
+    assert np.allclose(results, expected)
+    backend = job.diagnostics["mask_backend"]
+    assert sorted(backend["dense"] + backend["sparse"]) == [0, 1]
+
+
+def test_mask_analysis_default_backend(lt_ctx):
+    data = _mk_random(size=(4, 4, 32, 32), dtype="float32")
+    dataset = MemoryDataSet(data=data, tileshape=(1, 4, 32, 32), partition_shape=(2, 4, 32, 32))
+    analysis = lt_ctx.create_ring_analysis(dataset=dataset, cx=16, cy=16, ri=2, ro=8)
+    job = analysis.get_job()
+    assert job.masks.use_sparse is False
+    lt_ctx.run(job)
+    assert job.diagnostics["mask_backend"]["auto"] is False
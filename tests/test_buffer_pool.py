@@ -0,0 +1,47 @@
+import numpy as np
+
+from libertem.common.buffers import BufferPool
+
+
+def test_reuse():
+    pool = BufferPool()
+    buf = pool.get((16, 16), dtype="float32")
+    pool.put(buf)
+    assert pool.get((16, 16), dtype="float32") is buf
+    assert pool.get((16, 16), dtype="float32") is not buf
+    assert pool.get((16, 16), dtype="float64").dtype == np.dtype("float64")
+    assert pool.allocations == 3
+
+
+def test_checked_out_buffers_are_exclusive():
+    pool = BufferPool()
+    with pool.buffer((4,), dtype="uint16") as buf1:
+        with pool.buffer((4,), dtype="uint16") as buf2:
+            assert buf1 is not buf2
+    with pool.buffer((4,), dtype="uint16") as buf3:
+        assert buf3 is buf1 or buf3 is buf2
+    assert pool.allocations == 2
+
+
+def test_max_free():
+    pool = BufferPool(max_free_per_key=1)
+    bufs = [pool.get((4,), dtype="uint16") for i in range(3)]
+    for buf in bufs:
+        pool.put(buf)
+    pool.get((4,), dtype="uint16")
+    assert pool.allocations == 3
+    pool.get((4,), dtype="uint16")
+    assert pool.allocations == 4
+
+
+def test_count_allocations():
+    pool = BufferPool()
+    with pool.count_allocations() as counter:
+        with pool.buffer((4,), dtype="uint16"):
+            pass
+        with pool.buffer((4,), dtype="uint16"):
+            pass
+        pool.get((8,), dtype="uint16")
+    pool.get((8,), dtype="uint16")
+    assert counter.count == 2
+    assert counter.nbytes == 24
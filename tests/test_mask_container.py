@@ -2,10 +2,22 @@ import numpy as np
 import scipy.sparse as sp
 import pytest
 
-from libertem.job.masks import MaskContainer
+from libertem.job.masks import MaskContainer, MaskCache, mask_cache
 from libertem.io.dataset.base import DataTile
 from libertem.common import Slice, Shape
 from libertem.masks import gradient_x
+from utils import _mk_random
+
+factory_calls = []
+
+
+def _counting_factory(value):
+    factory_calls.append(value)
+    return np.full((16, 16), value)
+
+
+def _mk_factory(value):
+    return lambda: _counting_factory(value)
 
 
 @pytest.fixture
@@ -129,3 +141,109 @@ def test_for_datatile_with_frame_origin(masks):
 
 def test_merge_masks(masks):
     assert masks.shape == (128 * 128, 5)
+
+
+def test_mask_cache_across_containers():
+    mask_cache.clear()
+    factory_calls.clear()
+    shape = Shape((16, 16, 16, 16), sig_dims=2)
+    slice_ = Slice(origin=(0, 0, 0, 0), shape=shape)
+    factories = [_mk_factory(1)]
+
+    first = MaskContainer(mask_factories=factories, dtype="float32")[slice_]
+    assert factory_calls == [1]
+
+    # same factories: neither calls the factory nor slices again
+    second = MaskContainer(mask_factories=factories, dtype="float32")[slice_]
+    assert factory_calls == [1]
+    assert second is first
+
+    # equivalent, but different factory objects: cache miss
+    MaskContainer(mask_factories=[_mk_factory(1)], dtype="float32")[slice_]
+    assert factory_calls == [1, 1]
+
+    # different dtype: cache miss, too
+    MaskContainer(mask_factories=factories, dtype="float64")[slice_]
+    assert factory_calls == [1, 1, 1]
+
+
+def test_mask_cache_explicit_key():
+    mask_cache.clear()
+    factory_calls.clear()
+    slice_ = Slice(origin=(0, 0, 0, 0), shape=Shape((16, 16, 16, 16), sig_dims=2))
+
+    def _mk_container(value):
+        return MaskContainer(
+            mask_factories=[_mk_factory(value)],
+            dtype="float32",
+            cache_key=("test", value),
+        )
+
+    first = _mk_container(1)[slice_]
+    assert factory_calls == [1]
+
+    # same key: the new factory is not called
+    second = _mk_container(1)[slice_]
+    assert factory_calls == [1]
+    assert second is first
+
+    # different key: cache miss
+    third = _mk_container(2)[slice_]
+    assert factory_calls == [1, 2]
+    assert np.allclose(third, 2)
+
+
+def test_mask_cache_use_sparse_from_cache():
+    mask_cache.clear()
+    factory_calls.clear()
+    slice_ = Slice(origin=(0, 0, 0, 0), shape=Shape((16, 16, 16, 16), sig_dims=2))
+    factories = [_mk_factory(1)]
+    MaskContainer(mask_factories=factories, dtype="float32")[slice_]
+    container = MaskContainer(mask_factories=factories, dtype="float32")
+    assert container.use_sparse is None
+    container[slice_]
+    assert container.use_sparse is False
+
+
+def test_mask_cache_lru_eviction():
+    cache = MaskCache(max_bytes=100)
+    cache.put("a", 1, nbytes=40)
+    cache.put("b", 2, nbytes=40)
+    assert cache.get("a") == 1
+    cache.put("c", 3, nbytes=40)
+    # "b" was used least recently:
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.nbytes == 80
+    cache.put("d", 4, nbytes=101)
+    assert cache.get("d") is None
+    assert len(cache) == 2
+
+
+def test_auto_sparse_factories():
+    input_masks = [
+        lambda: sp.csr_matrix(((1,), ((64,), (64,))), shape=(128, 128), dtype=np.float32),
+        lambda: sp.csr_matrix(((1,), ((1,), (2,))), shape=(128, 128), dtype=np.float32),
+    ]
+    container = MaskContainer(mask_factories=input_masks, dtype=np.float32, use_sparse="auto")
+    assert container.shape == (128 * 128, 2)
+    slice_ = Slice(origin=(0, 0, 0, 0), shape=Shape((1, 1, 128, 128), sig_dims=2))
+    stacked = container[slice_]
+    assert sp.issparse(stacked)
+    assert stacked.shape == (128 * 128, 2)
+
+
+def test_auto_mixed_factories():
+    dense = _mk_random(size=(128, 128), dtype=np.float32)
+    input_masks = [
+        lambda: sp.csr_matrix(((1,), ((64,), (64,))), shape=(128, 128), dtype=np.float32),
+        lambda: dense,
+    ]
+    container = MaskContainer(mask_factories=input_masks, dtype=np.float32, use_sparse="auto")
+    assert container.shape == (128 * 128, 2)
+    slice_ = Slice(origin=(0, 0, 0, 0), shape=Shape((1, 1, 128, 128), sig_dims=2))
+    stacked = container[slice_]
+    assert not sp.issparse(stacked)
+    assert stacked[64 * 128 + 64, 0] == 1
+    assert np.allclose(stacked[:, 1], dense.reshape((-1,)))
@@ -0,0 +1,142 @@
+import numpy as np
+
+from libertem.job.sum import SumFramesJob
+from libertem.job.masks import ApplyMasksJob
+from libertem.job.raw import PickFrameJob
+from libertem.job.fused import FusedJob
+from libertem.job.base import iter_progressive_passes
+from libertem.common import Slice, Shape
+from libertem.common.buffers import tile_buffer_pool
+from libertem.common.roi import get_progressive_rois, upsample_nav
+from utils import MemoryDataSet, MemoryPartition, _mk_random
+
+
+def test_progressive_rois_cover_once():
+    rois = list(get_progressive_rois((13, 16)))
+    assert [stride for stride, roi in rois] == [8, 4, 2, 1]
+    assert np.all(sum(roi.astype(int) for stride, roi in rois) == 1)
+    assert np.count_nonzero(rois[0][1]) == 2 * 2
+
+
+def test_upsample_nav():
+    data = np.arange(2 * 4 * 4).reshape((2, 4, 4))
+    upsampled = upsample_nav(data, stride=2, nav_dims=2)
+    assert upsampled.shape == data.shape
+    assert np.all(upsampled[:, 1, 1] == data[:, 0, 0])
+    assert np.all(upsampled[:, 2, 3] == data[:, 2, 2])
+    assert np.all(upsampled[:, ::2, ::2] == data[:, ::2, ::2])
+
+
+def test_progressive_masks(lt_ctx, monkeypatch):
+    data = _mk_random(size=(16, 16, 16, 16), dtype='<u2')
+    mask = _mk_random(size=(16, 16))
+    dataset = MemoryDataSet(data=data, tileshape=(1, 4, 16, 16), partition_shape=(4, 16, 16, 16))
+    job = ApplyMasksJob(dataset=dataset, mask_factories=[lambda: mask])
+
+    frames_read = []
+    get_tiles = MemoryPartition.get_tiles
+
+    def _get_tiles(self, *args, **kwargs):
+        for tile in get_tiles(self, *args, **kwargs):
+            frames_read.append(tile.tile_slice.shape.nav.size)
+            yield tile
+    monkeypatch.setattr(MemoryPartition, "get_tiles", _get_tiles)
+
+    partials = list(lt_ctx.run_progressive(job))
+    assert [p.stride for p in partials] == [8, 4, 2, 1]
+    assert [p.frames_done for p in partials] == [4, 16, 64, 256]
+    assert partials[-1].done
+
+    expected = (data * mask).sum(axis=(2, 3))
+    # the first preview is upsampled from every 8th frame:
+    assert np.allclose(partials[0].result[0], upsample_nav(expected, 8, nav_dims=2))
+    assert np.allclose(partials[-1].result[0], expected)
+    # each frame is read exactly once:
+    assert sum(frames_read) == 256
+    assert job.roi is None
+
+
+def test_progressive_reads_each_frame_once(lt_ctx, monkeypatch):
+    data = _mk_random(size=(64, 64, 4, 4), dtype='float32')
+    dataset = MemoryDataSet(data=data, tileshape=(1, 8, 4, 4), partition_shape=(16, 64, 4, 4))
+    job = SumFramesJob(dataset=dataset)
+
+    frames_read = []
+    get_tiles = MemoryPartition.get_tiles
+
+    def _get_tiles(self, *args, **kwargs):
+        for tile in get_tiles(self, *args, **kwargs):
+            frames_read.append(tile.tile_slice.shape.nav.size)
+            yield tile
+    monkeypatch.setattr(MemoryPartition, "get_tiles", _get_tiles)
+
+    partials = list(lt_ctx.run_progressive(job))
+    assert sum(frames_read) == 64 * 64
+    assert np.allclose(partials[-1].result, data.sum(axis=(0, 1)))
+
+
+def test_progressive_sum_analysis(lt_ctx):
+    data = _mk_random(size=(16, 16, 16, 16), dtype='<u2')
+    dataset = MemoryDataSet(data=data, tileshape=(1, 8, 16, 16), partition_shape=(4, 16, 16, 16))
+    partials = list(lt_ctx.run_progressive(lt_ctx.create_sum_analysis(dataset=dataset)))
+    first = partials[0].result.intensity.raw_data
+    # estimated from every 8th frame, scaled to the whole dataset:
+    assert np.allclose(first, data[::8, ::8].sum(axis=(0, 1)) * 64)
+    assert np.allclose(partials[-1].result.intensity.raw_data, data.sum(axis=(0, 1)))
+
+
+def test_progressive_fused(lt_ctx):
+    data = _mk_random(size=(16, 16, 16, 16), dtype='<u2')
+    mask = _mk_random(size=(16, 16))
+    dataset = MemoryDataSet(data=data, tileshape=(1, 8, 16, 16), partition_shape=(4, 16, 16, 16))
+    job = FusedJob(jobs=[
+        SumFramesJob(dataset=dataset),
+        ApplyMasksJob(dataset=dataset, mask_factories=[lambda: mask]),
+    ])
+    partials = list(lt_ctx.run_progressive(job))
+    assert len(partials) == 4
+    sum_result, mask_result = partials[-1].result
+    assert np.allclose(sum_result, data.sum(axis=(0, 1)))
+    assert np.allclose(mask_result[0], (data * mask).sum(axis=(2, 3)))
+
+
+def test_progressive_without_roi_support(lt_ctx):
+    data = _mk_random(size=(16, 16, 16, 16), dtype='<u2')
+    dataset = MemoryDataSet(data=data, tileshape=(1, 8, 16, 16), partition_shape=(4, 16, 16, 16))
+    slice_ = Slice(origin=(5, 5, 0, 0), shape=Shape((1, 1, 16, 16), sig_dims=2))
+    job = PickFrameJob(dataset=dataset, slice_=slice_)
+    partials = list(lt_ctx.run_progressive(job))
+    assert len(partials) == 1
+    assert partials[0].done
+
+
+def test_progressive_passes_dont_read_gaps():
+    data = _mk_random(size=(16, 16, 4, 4), dtype='float32')
+    dataset = MemoryDataSet(data=data, tileshape=(1, 8, 4, 4), partition_shape=(4, 16, 4, 4))
+    job = SumFramesJob(dataset=dataset)
+    passes = iter_progressive_passes(job)
+    for stride, roi in passes:
+        assert job.roi_max_gap == 0
+        assert np.all(job.roi == roi)
+        break
+    passes.close()
+    assert job.roi is None
+
+
+def test_roi_no_allocations_after_warmup(lt_ctx):
+    data = _mk_random(size=(16, 16, 16, 16), dtype='<u2')
+    mask = _mk_random(size=(16, 16))
+    dataset = MemoryDataSet(data=data, tileshape=(1, 8, 16, 16), partition_shape=(4, 16, 16, 16))
+    # every other frame, so all tiles are only partly selected:
+    roi = np.zeros((16, 16), dtype=bool)
+    roi[:, ::2] = True
+    tile_buffer_pool.clear()
+
+    # the crops end after the last selected frame, so the last tile of each
+    # partition is one frame shorter, and needs a buffer of its own:
+    for allocations in [2, 0]:
+        job = ApplyMasksJob(dataset=dataset, mask_factories=[lambda: mask])
+        job.set_roi(roi)
+        result = lt_ctx.run(job)
+        assert job.diagnostics["tile_buffer_allocations"] == allocations
+        assert np.allclose(result[0], np.where(roi, (data * mask).sum(axis=(2, 3)), 0))
@@ -0,0 +1,143 @@
+import numpy as np
+import pytest
+
+from libertem.job.sum import SumFramesJob
+from libertem.job.masks import ApplyMasksJob
+from libertem.common.buffers import BufferWrapper
+from libertem.common.roi import get_crops, get_raw_roi, iter_roi_tiles
+from utils import MemoryDataSet, MemoryPartition, _mk_random
+
+
+def _count_tiles(monkeypatch):
+    tiles_read = []
+    get_tiles = MemoryPartition.get_tiles
+
+    def _get_tiles(self, *args, **kwargs):
+        for tile in get_tiles(self, *args, **kwargs):
+            tiles_read.append(tile.tile_slice)
+            yield tile
+    monkeypatch.setattr(MemoryPartition, "get_tiles", _get_tiles)
+    return tiles_read
+
+
+def _mk_roi(shape, selected):
+    roi = np.zeros(shape, dtype=bool)
+    roi[selected] = True
+    return roi
+
+
+def test_sum_roi(lt_ctx):
+    data = _mk_random(size=(16, 16, 16, 16), dtype='<u2')
+    dataset = MemoryDataSet(data=data, tileshape=(1, 8, 16, 16), partition_shape=(4, 16, 16, 16))
+    roi = _mk_roi((16, 16), np.s_[5:7, 3:12])
+    job = SumFramesJob(dataset=dataset, roi=roi)
+    result = lt_ctx.run(job)
+    assert np.allclose(result, data[roi].sum(axis=0))
+
+
+def test_masks_roi(lt_ctx):
+    data = _mk_random(size=(16, 16, 16, 16), dtype='<u2')
+    mask = _mk_random(size=(16, 16))
+    dataset = MemoryDataSet(data=data, tileshape=(4, 4, 4, 16), partition_shape=(4, 16, 16, 16))
+    roi = _mk_random(size=(16, 16)) > 0.7
+    job = ApplyMasksJob(dataset=dataset, mask_factories=[lambda: mask], roi=roi)
+    result = lt_ctx.run(job)
+    expected = np.where(roi, (data * mask).sum(axis=(2, 3)), 0)
+    assert np.allclose(result[0], expected)
+
+
+def test_roi_skips_partitions(lt_ctx, monkeypatch):
+    data = _mk_random(size=(16, 16, 16, 16), dtype='<u2')
+    dataset = MemoryDataSet(data=data, tileshape=(1, 4, 16, 16), partition_shape=(4, 16, 16, 16))
+    roi = _mk_roi((16, 16), np.s_[5, 4:8])
+    job = SumFramesJob(dataset=dataset, roi=roi)
+    assert len(list(job.get_tasks())) == 1
+
+    tiles_read = _count_tiles(monkeypatch)
+    result = lt_ctx.run(job)
+    assert np.allclose(result, data[5, 4:8].sum(axis=0))
+    assert len(tiles_read) == 1
+
+
+def test_roi_empty(lt_ctx):
+    data = _mk_random(size=(16, 16, 16, 16), dtype='<u2')
+    dataset = MemoryDataSet(data=data, tileshape=(1, 4, 16, 16), partition_shape=(4, 16, 16, 16))
+    job = SumFramesJob(dataset=dataset, roi=np.zeros((16, 16), dtype=bool))
+    assert len(list(job.get_tasks())) == 0
+    assert np.allclose(lt_ctx.run(job), 0)
+
+
+def test_roi_wrong_shape():
+    data = _mk_random(size=(16, 16, 16, 16), dtype='<u2')
+    dataset = MemoryDataSet(data=data, tileshape=(1, 4, 16, 16), partition_shape=(4, 16, 16, 16))
+    with pytest.raises(ValueError):
+        SumFramesJob(dataset=dataset, roi=np.ones((16, 8), dtype=bool))
+
+
+def test_roi_flat_nav():
+    data = _mk_random(size=(16 * 16, 16, 16), dtype='<u2')
+    dataset = MemoryDataSet(data=data, tileshape=(4, 16, 16), partition_shape=(64, 16, 16),
+                            effective_shape=(16, 16, 16, 16))
+    roi = _mk_roi((16, 16), np.s_[2, 3])
+    raw_roi = get_raw_roi(roi, dataset)
+    assert raw_roi.shape == (256,)
+    assert np.flatnonzero(raw_roi).tolist() == [2 * 16 + 3]
+
+
+def test_crops_cover_roi_once():
+    data = _mk_random(size=(16, 16, 16, 16), dtype='<u2')
+    dataset = MemoryDataSet(data=data, tileshape=(2, 3, 16, 16), partition_shape=(8, 16, 16, 16))
+    roi = _mk_random(size=(16, 16)) > 0.8
+    roi[9, :] = True
+    for partition in dataset.get_partitions():
+        partition_roi = roi[partition.slice.get(nav_only=True)]
+        crops = get_crops(partition_roi, partition, max_gap=2)
+        covered = np.zeros(partition_roi.shape, dtype=int)
+        for crop in crops:
+            covered[crop.shift(partition.slice).get(nav_only=True)] += 1
+        assert covered.max() <= 1
+        assert np.all(covered[partition_roi] == 1)
+
+        seen = np.zeros(partition_roi.shape, dtype=int)
+        for tile, selection in iter_roi_tiles(partition, partition_roi):
+            local = tile.tile_slice.shift(partition.slice)
+            rows, cols = np.unravel_index(np.flatnonzero(selection), tuple(local.shape.nav))
+            np.add.at(seen, (rows + local.origin[0], cols + local.origin[1]), 1)
+        assert np.all(seen == partition_roi)
+
+
+@pytest.mark.parametrize("tile_fn", [False, True])
+def test_udf_roi(lt_ctx, tile_fn):
+    data = _mk_random(size=(16, 16, 16, 16), dtype="float32")
+    dataset = MemoryDataSet(data=data, tileshape=(1, 8, 16, 16), partition_shape=(4, 16, 16, 16))
+    roi = _mk_random(size=(16, 16)) > 0.5
+    roi[8:, :] = False
+
+    def my_buffers():
+        return {
+            'pixelsum': BufferWrapper(kind="nav", dtype="float32"),
+            'sigsum': BufferWrapper(kind="sig", dtype="float32"),
+        }
+
+    def my_frame_fn(frame, pixelsum, sigsum):
+        pixelsum[:] = np.sum(frame)
+        sigsum[:] += frame
+
+    def my_tile_fn(tile, pixelsum, sigsum):
+        pixelsum[:] = np.sum(tile, axis=(1, 2))
+        sigsum[:] += np.sum(tile, axis=0)
+
+    def my_merge(dest, src):
+        dest['pixelsum'][:] = src['pixelsum']
+        dest['sigsum'][:] += src['sigsum']
+
+    res = lt_ctx.run_udf(
+        dataset=dataset,
+        fn=my_tile_fn if tile_fn else my_frame_fn,
+        make_buffers=my_buffers,
+        merge=my_merge,
+        roi=roi,
+    )
+    expected = np.where(roi, np.sum(data, axis=(2, 3)), 0)
+    assert np.allclose(res['pixelsum'].data, expected)
+    assert np.allclose(res['sigsum'].data, data[roi].sum(axis=0))
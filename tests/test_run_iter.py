@@ -0,0 +1,82 @@
+import numpy as np
+
+from libertem.job.sum import SumFramesJob
+from libertem.executor.inline import InlineJobExecutor
+from libertem.api import Context
+from utils import MemoryDataSet, _mk_random
+
+
+def test_run_iter_job(lt_ctx):
+    data = _mk_random(size=(16, 16, 16, 16), dtype='<u2')
+    dataset = MemoryDataSet(data=data, tileshape=(1, 8, 16, 16), partition_shape=(2, 16, 16, 16))
+    job = SumFramesJob(dataset=dataset)
+
+    partials = []
+    for partial in lt_ctx.run_iter(job):
+        partials.append((partial.partitions_done, partial.progress, partial.result.copy()))
+
+    assert [p[0] for p in partials] == list(range(1, 9))
+    assert [p[1] for p in partials] == [i / 8 for i in range(1, 9)]
+    assert np.allclose(partials[0][2], data[:2].sum(axis=(0, 1)))
+    assert np.allclose(partials[-1][2], data.sum(axis=(0, 1)))
+    assert partial.done
+
+
+def test_run_iter_analysis(lt_ctx):
+    data = _mk_random(size=(16, 16, 16, 16), dtype='<u2')
+    dataset = MemoryDataSet(data=data, tileshape=(1, 8, 16, 16), partition_shape=(2, 16, 16, 16))
+    analysis = lt_ctx.create_sum_analysis(dataset=dataset)
+    partials = list(lt_ctx.run_iter(analysis))
+    assert len(partials) == 8
+    assert np.allclose(partials[-1].result.intensity.raw_data, data.sum(axis=(0, 1)))
+
+
+def test_run_iter_min_interval(lt_ctx):
+    data = _mk_random(size=(16, 16, 16, 16), dtype='<u2')
+    dataset = MemoryDataSet(data=data, tileshape=(1, 8, 16, 16), partition_shape=(2, 16, 16, 16))
+    partials = list(lt_ctx.run_iter(SumFramesJob(dataset=dataset), min_interval=3600))
+    # only the complete result:
+    assert len(partials) == 1
+    assert partials[0].progress == 1
+    assert np.allclose(partials[0].result, data.sum(axis=(0, 1)))
+
+
+class RecordingExecutor(InlineJobExecutor):
+    def __init__(self):
+        self.cancelled = []
+
+    def cancel(self, cancel_id):
+        self.cancelled.append(cancel_id)
+
+
+def test_run_iter_stop_early():
+    executor = RecordingExecutor()
+    ctx = Context(executor=executor)
+    data = _mk_random(size=(16, 16, 16, 16), dtype='<u2')
+    dataset = MemoryDataSet(data=data, tileshape=(1, 8, 16, 16), partition_shape=(2, 16, 16, 16))
+    job = SumFramesJob(dataset=dataset)
+    for partial in ctx.run_iter(job):
+        if partial.progress >= 0.5:
+            break
+    assert partial.partitions_done == 4
+    assert executor.cancelled == [job]
+
+
+class CountingSumFramesJob(SumFramesJob):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.get_tasks_calls = 0
+
+    def get_tasks(self):
+        self.get_tasks_calls += 1
+        return super().get_tasks()
+
+
+def test_run_iter_creates_tasks_once(lt_ctx):
+    data = _mk_random(size=(16, 16, 16, 16), dtype='<u2')
+    dataset = MemoryDataSet(data=data, tileshape=(1, 8, 16, 16), partition_shape=(2, 16, 16, 16))
+    job = CountingSumFramesJob(dataset=dataset)
+    partials = list(lt_ctx.run_iter(job))
+    assert job.get_tasks_calls == 1
+    assert partials[-1].partitions_done == 8
+    assert np.allclose(partials[-1].result, data.sum(axis=(0, 1)))
@@ -24,3 +24,46 @@ def test_interpolate_color():
 def test_norm_negative():
     data = -1 * np.ones((16, 16))
     viz.visualize_simple(data)
+
+
+def test_incremental_same_as_simple():
+    data = np.zeros((16, 16), dtype=np.float32)
+    visualizer = viz.IncrementalVisualizer()
+    for start in range(0, 16, 4):
+        data[start:start + 4] = np.random.random((4, 16)) * (start + 1)
+        np.testing.assert_equal(
+            visualizer.update(data, dirty_rows=np.arange(start, start + 4)),
+            viz.visualize_simple(data)
+        )
+
+
+def test_incremental_only_colors_changed_rows():
+    data = np.zeros((16, 16), dtype=np.float32)
+    data[0, 0] = 1
+    data[1, 0] = 10
+    visualizer = viz.IncrementalVisualizer()
+    visualizer.update(data)
+    assert visualizer.rows_colored == 16
+
+    # inside of the current range, only the changed row is colored again:
+    data[4, 3] = 5
+    np.testing.assert_equal(
+        visualizer.update(data, dirty_rows=np.array([4])),
+        viz.visualize_simple(data)
+    )
+    assert visualizer.rows_colored == 17
+
+    visualizer.update(data, dirty_rows=np.array([], dtype=int))
+    assert visualizer.rows_colored == 17
+
+    # extending the range needs all rows to be colored again:
+    data[5, 3] = 20
+    np.testing.assert_equal(
+        visualizer.update(data, dirty_rows=np.array([5])),
+        viz.visualize_simple(data)
+    )
+    assert visualizer.rows_colored == 33
+
+    # without dirty rows, all rows are colored again:
+    visualizer.update(data)
+    assert visualizer.rows_colored == 49
@@ -111,3 +111,80 @@ def test_bad_merge(lt_ctx):
             merge=bad_merge,
             make_buffers=my_buffers,
         )
+
+
+def test_sum_tiles(lt_ctx):
+    data = _mk_random(size=(16, 16, 16, 16), dtype="float32")
+    dataset = MemoryDataSet(data=data, tileshape=(1, 4, 16, 16),
+                            partition_shape=(4, 16, 16, 16), sig_dims=2)
+
+    def my_buffers():
+        return {
+            'pixelsum': BufferWrapper(
+                kind="nav", dtype="float32"
+            )
+        }
+
+    def my_tile_fn(tile, pixelsum):
+        assert tile.shape == (4, 16, 16)
+        assert pixelsum.shape == (4,)
+        pixelsum[:] = np.sum(tile, axis=(1, 2))
+
+    res = lt_ctx.run_udf(
+        dataset=dataset,
+        fn=my_tile_fn,
+        make_buffers=my_buffers,
+    )
+    assert 'pixelsum' in res
+    assert np.allclose(res['pixelsum'].data, np.sum(data, axis=(2, 3)))
+
+
+def test_tiles_extra_shape_3d_ds(lt_ctx):
+    data = _mk_random(size=(16 * 16, 16, 16), dtype="float32")
+    dataset = MemoryDataSet(data=data, tileshape=(8, 16, 16),
+                            partition_shape=(32, 16, 16), sig_dims=2)
+
+    def my_buffers():
+        return {
+            'minmax': BufferWrapper(
+                kind="nav", extra_shape=(2,), dtype="float32"
+            )
+        }
+
+    def my_tile_fn(tile, minmax):
+        minmax[:, 0] = np.min(tile, axis=(1, 2))
+        minmax[:, 1] = np.max(tile, axis=(1, 2))
+
+    res = lt_ctx.run_udf(
+        dataset=dataset,
+        fn=my_tile_fn,
+        make_buffers=my_buffers,
+    )
+    assert res['minmax'].data.shape == (16 * 16, 2)
+    assert np.allclose(res['minmax'].data[:, 0], np.min(data, axis=(1, 2)))
+    assert np.allclose(res['minmax'].data[:, 1], np.max(data, axis=(1, 2)))
+
+
+def test_frames_extra_shape(lt_ctx):
+    data = _mk_random(size=(16, 16, 16, 16), dtype="float32")
+    dataset = MemoryDataSet(data=data, tileshape=(1, 8, 16, 16),
+                            partition_shape=(4, 16, 16, 16), sig_dims=2)
+
+    def my_buffers():
+        return {
+            'minmax': BufferWrapper(
+                kind="nav", extra_shape=(2,), dtype="float32"
+            )
+        }
+
+    def my_frame_fn(frame, minmax):
+        assert minmax.shape == (2,)
+        minmax[:] = (np.min(frame), np.max(frame))
+
+    res = lt_ctx.run_udf(
+        dataset=dataset,
+        fn=my_frame_fn,
+        make_buffers=my_buffers,
+    )
+    assert np.allclose(res['minmax'].data[..., 0], np.min(data, axis=(2, 3)))
+    assert np.allclose(res['minmax'].data[..., 1], np.max(data, axis=(2, 3)))
@@ -58,7 +58,7 @@ class MemoryPartition(Partition):
         self.reader = reader
         super().__init__(*args, **kwargs)
 
-    def get_tiles(self, crop_to=None, full_frames=False):
+    def get_tiles(self, crop_to=None, full_frames=False, consumer=None):
         if full_frames:
             tileshape = (
                 tuple(self.tileshape[:self.meta.shape.nav.dims]) + tuple(self.meta.shape.sig)
@@ -71,6 +71,7 @@ class MemoryPartition(Partition):
                 intersection = tile_slice.intersection_with(crop_to)
                 if intersection.is_null():
                     continue
+                tile_slice = intersection
             yield DataTile(
                 data=self.reader.data[tile_slice.get()],
                 tile_slice=tile_slice